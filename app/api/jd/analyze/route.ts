@@ -1,7 +1,7 @@
 import { NextRequest } from 'next/server'
 import { createClient } from '@supabase/supabase-js'
 import OpenAI from 'openai'
-import { matchTranscriptChunks } from '@/app/lib/vectorSearch'
+import { chunkEmbeddingParams, matchTranscriptChunks } from '@/app/lib/vectorSearch'
 
 export const dynamic = 'force-dynamic'
 export const maxDuration = 60
@@ -32,10 +32,7 @@ export async function POST(request: NextRequest) {
 
   try {
     // 1. Embed the JD
-    const embeddingRes = await openai.embeddings.create({
-      model: 'text-embedding-3-small',
-      input: jd.slice(0, 8000),
-    })
+    const embeddingRes = await openai.embeddings.create(chunkEmbeddingParams(jd.slice(0, 8000)))
     const jdEmbedding = embeddingRes.data[0].embedding
 
     // 2. Vector search transcript chunks for expert context
@@ -1,6 +1,6 @@
 import { NextRequest } from 'next/server'
 import OpenAI from 'openai'
-import { matchTranscriptChunks } from '@/app/lib/vectorSearch'
+import { chunkEmbeddingParams, matchTranscriptChunks } from '@/app/lib/vectorSearch'
 
 export const dynamic = 'force-dynamic'
 export const maxDuration = 60
@@ -20,10 +20,7 @@ export async function POST(request: NextRequest) {
 
   try {
     // 1. Embed the question
-    const embRes = await openai.embeddings.create({
-      model: 'text-embedding-3-small',
-      input: question,
-    })
+    const embRes = await openai.embeddings.create(chunkEmbeddingParams(question))
 
     // 2. Vector search transcript chunks
     const chunks = await matchTranscriptChunks(embRes.data[0].embedding, 8, 0.1)
@@ -1,7 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { createClient } from '@supabase/supabase-js'
 import OpenAI from 'openai'
-import { matchTranscriptChunks } from '@/app/lib/vectorSearch'
+import { chunkEmbeddingParams, matchTranscriptChunks } from '@/app/lib/vectorSearch'
 
 export const dynamic = 'force-dynamic'
 
@@ -54,10 +54,7 @@ export async function POST(
 
     // 3. Embed the question for vector search
     const openai = getOpenAI()
-    const embeddingResponse = await openai.embeddings.create({
-      model: 'text-embedding-3-small',
-      input: questionText,
-    })
+    const embeddingResponse = await openai.embeddings.create(chunkEmbeddingParams(questionText))
     const queryEmbedding = embeddingResponse.data[0].embedding
 
     // 4. Retrieve relevant transcript chunks via pgvector similarity search
@@ -1,6 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { createClient } from '@supabase/supabase-js'
 import OpenAI from 'openai'
+import { chunkEmbeddingParams } from '@/app/lib/vectorSearch'
 
 export const dynamic = 'force-dynamic'
 
@@ -56,10 +57,7 @@ export async function POST(request: NextRequest) {
 
     // 2. Embed the question for vector search
     const openai = getOpenAI()
-    const embeddingResponse = await openai.embeddings.create({
-      model: 'text-embedding-3-small',
-      input: questionText,
-    })
+    const embeddingResponse = await openai.embeddings.create(chunkEmbeddingParams(questionText))
     const queryEmbedding = embeddingResponse.data[0].embedding
 
     // 3. Retrieve relevant transcript chunks via pgvector similarity search
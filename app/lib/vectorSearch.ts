@@ -10,6 +10,18 @@ export interface ChunkResult {
   video_url: string
 }
 
+// Must match the width transcript_chunks.embedding was built with
+// (CHUNK_EMBEDDING_DIMENSIONS for chunk_and_embed.py); 0 = full 1536 dims
+const CHUNK_EMBEDDING_DIMENSIONS = Number(process.env.CHUNK_EMBEDDING_DIMENSIONS || 0)
+
+export function chunkEmbeddingParams(input: string) {
+  return {
+    model: 'text-embedding-3-small',
+    input,
+    ...(CHUNK_EMBEDDING_DIMENSIONS ? { dimensions: CHUNK_EMBEDDING_DIMENSIONS } : {}),
+  }
+}
+
 export async function matchTranscriptChunks(
   embedding: number[],
   matchCount = 10,
@@ -0,0 +1,59 @@
+-- Admin Stats: per-channel AI Pulse pipeline progress for /api/admin/stats
+-- Precomputed so the admin page reads one row per channel instead of
+-- downloading youtube_videos, video_transcripts and video_summaries.
+-- Refreshed by the youtube pipeline and summarize_transcripts.py
+-- (REFRESH MATERIALIZED VIEW CONCURRENTLY admin_channel_stats).
+-- Run this in Supabase SQL Editor (or `python -m database.migrations` in scrapers/).
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS admin_channel_stats AS
+WITH videos AS (
+  SELECT
+    COALESCE(yv.channel_name, 'Unknown') AS channel_name,
+    yv.video_id, yv.title, yv.views, yv.published_at,
+    COALESCE(yv.is_relevant, false) AS is_relevant,
+    EXISTS (SELECT 1 FROM video_transcripts vt WHERE vt.video_id = yv.id) AS has_transcript,
+    vs.video_id IS NOT NULL AS has_summary,
+    vs.relevance_category
+  FROM youtube_videos yv
+  LEFT JOIN video_summaries vs ON vs.video_id = yv.id
+),
+ranked AS (
+  SELECT videos.*,
+         ROW_NUMBER() OVER (
+           PARTITION BY channel_name, (is_relevant AND NOT has_transcript)
+           ORDER BY views DESC NULLS LAST
+         ) AS views_rank
+  FROM videos
+)
+SELECT
+  channel_name,
+  COUNT(*) AS total,
+  COUNT(*) FILTER (WHERE is_relevant) AS relevant,
+  COUNT(*) FILTER (WHERE has_transcript) AS has_transcript,
+  COUNT(*) FILTER (WHERE has_summary) AS has_summary,
+  COUNT(*) FILTER (WHERE relevance_category = 'high') AS high_relevance,
+  COUNT(*) FILTER (WHERE relevance_category = 'medium') AS medium_relevance,
+  COUNT(*) FILTER (WHERE relevance_category = 'low') AS low_relevance,
+  MIN(published_at) AS earliest_published,
+  MAX(published_at) AS latest_published,
+  -- Top 5 relevant videos by views still waiting for a transcript
+  COALESCE(
+    jsonb_agg(jsonb_build_object('title', title, 'views', views, 'video_id', video_id)
+              ORDER BY views DESC NULLS LAST)
+      FILTER (WHERE is_relevant AND NOT has_transcript AND views_rank <= 5),
+    '[]'::jsonb
+  ) AS pending_transcript,
+  NOW() AS refreshed_at
+FROM ranked
+GROUP BY channel_name;
+
+-- Required by REFRESH ... CONCURRENTLY (readers are never blocked)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_admin_channel_stats_channel ON admin_channel_stats (channel_name);
+
+-- Materialized views have no RLS; let the Supabase API roles read it
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+    GRANT SELECT ON admin_channel_stats TO anon, authenticated;
+  END IF;
+END $$;
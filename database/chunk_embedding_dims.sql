@@ -0,0 +1,89 @@
+-- Reduced-width transcript chunk embeddings
+-- Search functions for transcript_chunks.embedding at any width, plus its
+-- HNSW index. Applied by database.migrations.ensure_chunk_embedding_column
+-- (run by `python -m database.migrations` and chunk_and_embed.py) whenever
+-- the column width differs from CHUNK_EMBEDDING_DIMENSIONS; that step first
+-- drops the index and converts the column. Narrowing cuts stored vectors to
+-- their first N components and re-normalizes them, which is exactly what
+-- text-embedding-3 returns for `dimensions = N`, so nothing needs
+-- re-embedding.
+-- Requires pgvector >= 0.7 (subvector, l2_normalize).
+-- Set the same CHUNK_EMBEDDING_DIMENSIONS for the scrapers, the app and the
+-- vector-search edge function.
+
+CREATE INDEX IF NOT EXISTS idx_transcript_chunks_embedding ON transcript_chunks
+  USING hnsw (embedding vector_cosine_ops);
+
+DROP FUNCTION IF EXISTS match_transcript_chunks(text, integer, double precision);
+
+CREATE OR REPLACE FUNCTION match_transcript_chunks(
+  query_embedding text,
+  match_count integer DEFAULT 10,
+  similarity_threshold double precision DEFAULT 0.3
+)
+RETURNS TABLE(
+  id uuid,
+  video_id uuid,
+  chunk_index integer,
+  chunk_text text,
+  token_count integer,
+  similarity double precision,
+  video_title text,
+  channel_name varchar,
+  video_url text
+)
+LANGUAGE plpgsql
+AS $fn$
+BEGIN
+  RETURN QUERY EXECUTE
+    'SELECT tc.id, tc.video_id, tc.chunk_index, tc.chunk_text, tc.token_count,
+            (1 - (tc.embedding <=> $1::vector))::double precision AS similarity,
+            yv.title AS video_title, yv.channel_name, yv.url AS video_url
+     FROM transcript_chunks tc
+     JOIN youtube_videos yv ON tc.video_id = yv.id
+     WHERE (1 - (tc.embedding <=> $1::vector)) > $2
+     ORDER BY tc.embedding <=> $1::vector
+     LIMIT $3'
+  USING query_embedding, similarity_threshold, match_count;
+END;
+$fn$;
+
+DROP FUNCTION IF EXISTS search_chunks(text, integer, double precision);
+
+CREATE OR REPLACE FUNCTION search_chunks(
+  query_vec text,
+  k integer DEFAULT 10,
+  min_similarity double precision DEFAULT 0.1
+)
+RETURNS TABLE(
+  id uuid,
+  video_id uuid,
+  chunk_index integer,
+  chunk_text text,
+  token_count integer,
+  similarity double precision,
+  video_title text,
+  channel_name varchar,
+  video_url text
+)
+LANGUAGE plpgsql STABLE
+AS $fn$
+DECLARE
+  v vector;
+BEGIN
+  v := query_vec::vector;
+  RETURN QUERY
+    SELECT tc.id, tc.video_id, tc.chunk_index, tc.chunk_text, tc.token_count,
+           (1 - (tc.embedding <=> v))::double precision AS similarity,
+           yv.title AS video_title, yv.channel_name, yv.url AS video_url
+    FROM transcript_chunks tc
+    JOIN youtube_videos yv ON tc.video_id = yv.id
+    WHERE (1 - (tc.embedding <=> v)) > min_similarity
+    ORDER BY tc.embedding <=> v
+    LIMIT k;
+END;
+$fn$;
+
+GRANT EXECUTE ON FUNCTION search_chunks(text, integer, double precision) TO anon, authenticated, service_role;
+
+NOTIFY pgrst, 'reload schema';
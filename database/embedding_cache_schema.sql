@@ -0,0 +1,16 @@
+-- Embedding Cache: content-addressed store for OpenAI embeddings
+-- Keyed by (model, sha256(text)) so unchanged text is never re-embedded.
+-- Run this in Supabase SQL Editor (or `python -m database.migrations` in scrapers/).
+
+CREATE TABLE IF NOT EXISTS embedding_cache (
+  model VARCHAR(100) NOT NULL,
+  text_hash CHAR(64) NOT NULL,           -- sha256 hex of the embedded text
+  dims INT NOT NULL,
+  embedding BYTEA NOT NULL,              -- little-endian float32 array
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  last_used_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (model, text_hash)
+);
+
+-- Supports evicting entries not used recently
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used_at);
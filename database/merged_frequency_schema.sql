@@ -0,0 +1,55 @@
+-- Merged question frequency triggers
+-- Replaces the original row-level trigger_update_frequency, which ran one
+-- recount UPDATE per mapping row: bulk mapping writes (write_merged_groups,
+-- apply_merged_diff) now cost one recount per statement.
+-- Run this in Supabase SQL Editor (or `python -m database.migrations` in scrapers/).
+
+-- Function: Recount frequency for a set of merged questions
+CREATE OR REPLACE FUNCTION recount_merged_frequency(ids UUID[])
+RETURNS VOID AS $$
+  UPDATE merged_questions mq
+  SET
+    frequency = c.n,
+    updated_at = NOW()
+  FROM (
+    SELECT t.id, (
+      SELECT COUNT(*)
+      FROM question_mappings qm
+      WHERE qm.merged_question_id = t.id
+    ) AS n
+    FROM unnest(ids) AS t(id)
+  ) c
+  WHERE mq.id = c.id
+    AND mq.frequency IS DISTINCT FROM c.n;
+$$ LANGUAGE sql;
+
+-- Function: Update merged_question frequency, once per statement for every
+-- merged question it touched (bulk mapping writes stay one UPDATE)
+CREATE OR REPLACE FUNCTION update_merged_question_frequency()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    PERFORM recount_merged_frequency(ARRAY(SELECT DISTINCT merged_question_id FROM new_rows));
+  ELSE
+    PERFORM recount_merged_frequency(ARRAY(SELECT DISTINCT merged_question_id FROM old_rows));
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers: Auto-update frequency on new / deleted mappings
+DROP TRIGGER IF EXISTS trigger_update_frequency ON question_mappings;
+DROP TRIGGER IF EXISTS trigger_update_frequency_insert ON question_mappings;
+DROP TRIGGER IF EXISTS trigger_update_frequency_delete ON question_mappings;
+
+CREATE TRIGGER trigger_update_frequency_insert
+AFTER INSERT ON question_mappings
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_merged_question_frequency();
+
+CREATE TRIGGER trigger_update_frequency_delete
+AFTER DELETE ON question_mappings
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT
+EXECUTE FUNCTION update_merged_question_frequency();
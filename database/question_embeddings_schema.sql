@@ -0,0 +1,72 @@
+-- Question Embeddings: pgvector columns + ANN indexes + candidate search
+-- Run this in Supabase SQL Editor (requires rag_schema.sql for the vector extension)
+
+-- ==============================================
+-- 1. Embedding columns
+-- ==============================================
+CREATE EXTENSION IF NOT EXISTS vector;
+
+ALTER TABLE raw_questions ADD COLUMN IF NOT EXISTS embedding vector(1536);
+ALTER TABLE merged_questions ADD COLUMN IF NOT EXISTS embedding vector(1536);
+
+-- ==============================================
+-- 2. ANN index (HNSW keeps recall without retraining as rows grow)
+--    Only merged_questions is searched; raw embeddings are query vectors,
+--    so an index on raw_questions.embedding would only slow down writes.
+-- ==============================================
+CREATE INDEX IF NOT EXISTS idx_merged_questions_embedding ON merged_questions
+  USING hnsw (embedding vector_cosine_ops);
+
+-- ==============================================
+-- 3. Candidate search for a single embedding
+-- ==============================================
+CREATE OR REPLACE FUNCTION match_merged_questions(
+  query_embedding text,
+  match_count integer DEFAULT 5,
+  similarity_threshold double precision DEFAULT 0.8
+)
+RETURNS TABLE(
+  id uuid,
+  canonical_content text,
+  similarity double precision
+)
+LANGUAGE sql STABLE
+AS $fn$
+  SELECT mq.id, mq.canonical_content,
+         (1 - (mq.embedding <=> query_embedding::vector(1536)))::double precision AS similarity
+  FROM merged_questions mq
+  WHERE mq.embedding IS NOT NULL
+    AND (1 - (mq.embedding <=> query_embedding::vector(1536))) >= similarity_threshold
+  ORDER BY mq.embedding <=> query_embedding::vector(1536)
+  LIMIT match_count;
+$fn$;
+
+-- ==============================================
+-- 4. Nearest merged question for a batch of raw questions
+--    (uses raw_questions.embedding; one index probe per raw row)
+-- ==============================================
+CREATE OR REPLACE FUNCTION match_raw_to_merged(
+  raw_ids uuid[],
+  similarity_threshold double precision DEFAULT 0.8
+)
+RETURNS TABLE(
+  raw_question_id uuid,
+  merged_question_id uuid,
+  similarity double precision
+)
+LANGUAGE sql STABLE
+AS $fn$
+  SELECT rq.id, nearest.id, nearest.similarity
+  FROM raw_questions rq
+  CROSS JOIN LATERAL (
+    SELECT mq.id,
+           (1 - (mq.embedding <=> rq.embedding))::double precision AS similarity
+    FROM merged_questions mq
+    WHERE mq.embedding IS NOT NULL
+    ORDER BY mq.embedding <=> rq.embedding
+    LIMIT 1
+  ) nearest
+  WHERE rq.id = ANY(raw_ids)
+    AND rq.embedding IS NOT NULL
+    AND nearest.similarity >= similarity_threshold;
+$fn$;
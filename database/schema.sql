@@ -161,28 +161,9 @@ GROUP BY mq.id, mq.canonical_content, mq.frequency, mq.question_type, mq.updated
 -- 7. Utility Functions
 -- ==============================================
 
--- Function: Update merged_question frequency
-CREATE OR REPLACE FUNCTION update_merged_question_frequency()
-RETURNS TRIGGER AS $$
-BEGIN
-  UPDATE merged_questions
-  SET
-    frequency = (
-      SELECT COUNT(*)
-      FROM question_mappings
-      WHERE merged_question_id = NEW.merged_question_id
-    ),
-    updated_at = NOW()
-  WHERE id = NEW.merged_question_id;
-  RETURN NEW;
-END;
-$$ LANGUAGE plpgsql;
-
--- Trigger: Auto-update frequency on new mapping
-CREATE TRIGGER trigger_update_frequency
-AFTER INSERT OR DELETE ON question_mappings
-FOR EACH ROW
-EXECUTE FUNCTION update_merged_question_frequency();
+-- merged_questions.frequency is kept in sync with question_mappings by the
+-- statement-level triggers in merged_frequency_schema.sql (applied by
+-- `python -m database.migrations` in scrapers/).
 
 -- ==============================================
 -- 8. Row Level Security (RLS) - Optional for Supabase
@@ -0,0 +1,12 @@
+-- Similarity Verdicts: cached GPT similarity scores for question pairs
+-- Keyed by (model, sha256 of the sorted pair + prompt version), so a pair
+-- is only ever sent to GPT once per model and prompt.
+-- Run this in Supabase SQL Editor (or `python -m database.migrations` in scrapers/).
+
+CREATE TABLE IF NOT EXISTS similarity_verdicts (
+  model VARCHAR(100) NOT NULL,
+  pair_hash CHAR(64) NOT NULL,           -- sha256 hex of the question pair
+  score REAL NOT NULL,                   -- GPT similarity score, 0..1
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (model, pair_hash)
+);
@@ -0,0 +1,182 @@
+-- Table Counters: row counts kept up to date by triggers
+-- Stats readers (DatabaseManager.get_stats, VideoDB.get_stats, the admin
+-- stats API) read a few rows here instead of COUNT(*) / GROUP BY scans.
+-- metric is the table name (key '') for the total, or '<table>.<column>'
+-- with the column value as key for per-group counts.
+-- Each count is spread over up to 16 shards: every write statement adds its
+-- delta to a random shard, so concurrent writers to the same table rarely
+-- queue on one counter row. A count is SUM(value) over its shards;
+-- compact_table_counters() folds them back into shard 0.
+-- Run this in Supabase SQL Editor (or `python -m database.migrations` in scrapers/).
+
+CREATE TABLE IF NOT EXISTS table_counters (
+  metric TEXT NOT NULL,
+  key TEXT NOT NULL DEFAULT '',
+  shard SMALLINT NOT NULL DEFAULT 0,
+  value BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (metric, key, shard)
+);
+
+ALTER TABLE table_counters ENABLE ROW LEVEL SECURITY;
+DROP POLICY IF EXISTS "Allow public read on table_counters" ON table_counters;
+CREATE POLICY "Allow public read on table_counters" ON table_counters FOR SELECT USING (true);
+
+-- Trigger body shared by every counted table; TG_ARGV = grouping columns.
+--   INSERT / DELETE  statement level, one upsert per distinct key from the
+--                    transition table (bulk writes stay one round of upserts)
+--   UPDATE           row level, only when a grouping column changed
+--   TRUNCATE         resets the table's counters
+-- Deltas go to one random shard per statement (per row for UPDATE).
+-- SECURITY DEFINER so writers without rights on table_counters (e.g. the
+-- app's anon role) can still fire it.
+CREATE OR REPLACE FUNCTION count_rows_trigger() RETURNS trigger
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+  col TEXT;
+  cols TEXT;
+  rows_sql TEXT;
+  deltas TEXT[];
+  old_key TEXT;
+  new_key TEXT;
+  slot SMALLINT := floor(random() * 16)::SMALLINT;
+BEGIN
+  IF TG_OP = 'TRUNCATE' THEN
+    UPDATE table_counters SET value = 0 WHERE metric = TG_TABLE_NAME;
+    DELETE FROM table_counters WHERE starts_with(metric, TG_TABLE_NAME || '.');
+    RETURN NULL;
+  END IF;
+
+  IF TG_LEVEL = 'ROW' THEN
+    FOR col IN SELECT unnest(TG_ARGV) LOOP
+      old_key := to_jsonb(OLD) ->> col;
+      new_key := to_jsonb(NEW) ->> col;
+      IF old_key IS DISTINCT FROM new_key THEN
+        INSERT INTO table_counters AS c (metric, key, shard, value)
+        SELECT TG_TABLE_NAME || '.' || col, k, slot, n
+        FROM (VALUES (old_key, -1), (new_key, 1)) AS v(k, n)
+        WHERE k IS NOT NULL
+        ORDER BY k
+        ON CONFLICT (metric, key, shard) DO UPDATE SET value = c.value + EXCLUDED.value;
+      END IF;
+    END LOOP;
+    RETURN NULL;
+  END IF;
+
+  cols := COALESCE((SELECT string_agg(format('%I, ', c), '') FROM unnest(TG_ARGV) c), '');
+  IF TG_OP = 'INSERT' THEN
+    rows_sql := format('SELECT %s1 AS n FROM new_rows', cols);
+  ELSE
+    rows_sql := format('SELECT %s-1 AS n FROM old_rows', cols);
+  END IF;
+
+  deltas := ARRAY[format('SELECT %L AS metric, %L AS key, n FROM d', TG_TABLE_NAME, '')];
+  FOR col IN SELECT unnest(TG_ARGV) LOOP
+    deltas := deltas || format(
+      'SELECT %L, %I::TEXT, n FROM d WHERE %I IS NOT NULL', TG_TABLE_NAME || '.' || col, col, col
+    );
+  END LOOP;
+
+  -- Keys are upserted in sorted order so concurrent writers cannot deadlock
+  EXECUTE format($sql$
+    WITH d AS (%s)
+    INSERT INTO table_counters AS c (metric, key, shard, value)
+    SELECT metric, key, %s, SUM(n) FROM (%s) AS deltas
+    GROUP BY metric, key
+    HAVING SUM(n) <> 0
+    ORDER BY metric, key
+    ON CONFLICT (metric, key, shard) DO UPDATE SET value = c.value + EXCLUDED.value
+  $sql$, rows_sql, slot, array_to_string(deltas, ' UNION ALL '));
+  RETURN NULL;
+END;
+$$;
+
+-- Install the counting triggers on `tbl` and seed its counters with one
+-- scan. Re-running it recounts from scratch (repairs drift).
+--   SELECT track_row_counts('raw_questions', 'source');
+CREATE OR REPLACE FUNCTION track_row_counts(tbl REGCLASS, VARIADIC group_cols TEXT[] DEFAULT '{}')
+RETURNS VOID LANGUAGE plpgsql AS $$
+DECLARE
+  tbl_name TEXT := (SELECT relname FROM pg_class WHERE oid = tbl);
+  args TEXT := COALESCE((SELECT string_agg(quote_literal(c), ', ') FROM unnest(group_cols) c), '');
+  col TEXT;
+BEGIN
+  -- Block writers so the seed counts and the triggers line up
+  EXECUTE format('LOCK TABLE %s IN SHARE ROW EXCLUSIVE MODE', tbl);
+
+  EXECUTE format('DROP TRIGGER IF EXISTS count_rows_insert ON %s', tbl);
+  EXECUTE format('DROP TRIGGER IF EXISTS count_rows_delete ON %s', tbl);
+  EXECUTE format('DROP TRIGGER IF EXISTS count_rows_update ON %s', tbl);
+  EXECUTE format('DROP TRIGGER IF EXISTS count_rows_truncate ON %s', tbl);
+
+  EXECUTE format(
+    'CREATE TRIGGER count_rows_insert AFTER INSERT ON %s REFERENCING NEW TABLE AS new_rows '
+    'FOR EACH STATEMENT EXECUTE FUNCTION count_rows_trigger(%s)', tbl, args);
+  EXECUTE format(
+    'CREATE TRIGGER count_rows_delete AFTER DELETE ON %s REFERENCING OLD TABLE AS old_rows '
+    'FOR EACH STATEMENT EXECUTE FUNCTION count_rows_trigger(%s)', tbl, args);
+  EXECUTE format(
+    'CREATE TRIGGER count_rows_truncate AFTER TRUNCATE ON %s '
+    'FOR EACH STATEMENT EXECUTE FUNCTION count_rows_trigger()', tbl);
+  IF cardinality(group_cols) > 0 THEN
+    EXECUTE format(
+      'CREATE TRIGGER count_rows_update AFTER UPDATE OF %s ON %s FOR EACH ROW WHEN (%s) '
+      'EXECUTE FUNCTION count_rows_trigger(%s)',
+      (SELECT string_agg(format('%I', c), ', ') FROM unnest(group_cols) c),
+      tbl,
+      (SELECT string_agg(format('OLD.%1$I IS DISTINCT FROM NEW.%1$I', c), ' OR ') FROM unnest(group_cols) c),
+      args);
+  END IF;
+
+  DELETE FROM table_counters WHERE metric = tbl_name OR starts_with(metric, tbl_name || '.');
+  EXECUTE format('INSERT INTO table_counters (metric, key, value) SELECT %L, %L, COUNT(*) FROM %s',
+                 tbl_name, '', tbl);
+  FOR col IN SELECT unnest(group_cols) LOOP
+    EXECUTE format(
+      'INSERT INTO table_counters (metric, key, value) '
+      'SELECT %L, %I::TEXT, COUNT(*) FROM %s WHERE %I IS NOT NULL GROUP BY 2',
+      tbl_name || '.' || col, col, tbl, col);
+  END LOOP;
+END;
+$$;
+
+-- Fold every count's shards into shard 0 and drop empty group rows, so
+-- readers sum a handful of rows. The fold is one statement, so each delta
+-- is moved exactly once. Shards that an in-flight write holds are skipped
+-- (SKIP LOCKED) and left for the next run. Run it periodically; the
+-- pipelines call it before reading their stats. Returns the shard rows
+-- folded.
+CREATE OR REPLACE FUNCTION compact_table_counters() RETURNS BIGINT
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = public AS $$
+DECLARE
+  folded_rows BIGINT;
+BEGIN
+  WITH locked AS (
+    SELECT metric, key, shard FROM table_counters
+    WHERE shard <> 0
+    ORDER BY metric, key, shard
+    FOR UPDATE SKIP LOCKED
+  ), folded AS (
+    DELETE FROM table_counters AS c
+    USING locked
+    WHERE (c.metric, c.key, c.shard) = (locked.metric, locked.key, locked.shard)
+    RETURNING c.metric, c.key, c.value
+  ), summed AS (
+    INSERT INTO table_counters AS c (metric, key, shard, value)
+    SELECT metric, key, 0, SUM(value) FROM folded
+    GROUP BY metric, key
+    ORDER BY metric, key
+    ON CONFLICT (metric, key, shard) DO UPDATE SET value = c.value + EXCLUDED.value
+  )
+  SELECT COUNT(*) INTO folded_rows FROM folded;
+
+  DELETE FROM table_counters AS c
+  USING (
+    SELECT metric, key FROM table_counters
+    WHERE key <> '' AND shard = 0 AND value = 0
+    ORDER BY metric, key
+    FOR UPDATE SKIP LOCKED
+  ) AS empty
+  WHERE (c.metric, c.key, c.shard) = (empty.metric, empty.key, 0);
+  RETURN folded_rows;
+END;
+$$;
@@ -0,0 +1,83 @@
+"""
+Recall-vs-exact report for the ANN dedup backends.
+
+Searches the memory-mapped embedding snapshot the merge job saves
+(EMBEDDING_SNAPSHOT_PATH) when there is one for the current model, so no
+raw question is re-embedded or even read from the database. Without a
+snapshot it embeds all raw questions (through the embedding cache). Each
+candidate index configuration is then compared against exact top-k search
+at the merge threshold. Use it to pick ANN_BACKEND and its parameters.
+
+Usage:
+    python ann_recall_report.py
+    python ann_recall_report.py --threshold 0.85 --k 20 --limit 20000
+    python ann_recall_report.py --snapshot ''    # ignore the snapshot
+"""
+import argparse
+import logging
+
+import numpy as np
+
+from config import EMBEDDING_SNAPSHOT_PATH
+from processors.ann import ANN_TOP_K, recall_report
+from processors.embedding_snapshot import EmbeddingSnapshot
+from processors.embeddings import EmbeddingProcessor, SIMILARITY_THRESHOLD
+
+CANDIDATES = {
+    'ivf probe=4': {'backend': 'ivf', 'n_probe': 4},
+    'ivf probe=8': {'backend': 'ivf', 'n_probe': 8},
+    'ivf probe=16': {'backend': 'ivf', 'n_probe': 16},
+    'ivf probe=32': {'backend': 'ivf', 'n_probe': 32},
+    'hnsw ef=50': {'backend': 'hnsw', 'ef': 50},
+    'hnsw ef=100': {'backend': 'hnsw', 'ef': 100},
+    'hnsw ef=200': {'backend': 'hnsw', 'ef': 200},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN recall-vs-exact report")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--k", type=int, default=ANN_TOP_K, help="Neighbours per question")
+    parser.add_argument("--limit", type=int, default=0, help="Only use the first N raw questions")
+    parser.add_argument("--snapshot", default=EMBEDDING_SNAPSHOT_PATH,
+                        help="Embedding snapshot to search ('' = embed from the database)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(message)s')
+
+    embedder = EmbeddingProcessor(snapshot_path=args.snapshot)
+    snapshot = EmbeddingSnapshot.open(args.snapshot, model=embedder.model_key)
+    if snapshot is not None:
+        rows = len(snapshot) if not args.limit else min(args.limit, len(snapshot))
+        print(f"Using {rows} rows of embedding snapshot {args.snapshot}")
+        matrix = np.asarray(snapshot.matrix[:rows], dtype=np.float32)
+    else:
+        from database.db import DatabaseManager
+        questions = DatabaseManager.get_all_raw_questions()
+        if args.limit:
+            questions = questions[:args.limit]
+        print(f"Embedding {len(questions)} raw questions...")
+        matrix = embedder.embed_questions(questions)
+
+    candidates = {}
+    for label, config in CANDIDATES.items():
+        if config['backend'] == 'hnsw':
+            try:
+                import hnswlib  # noqa: F401
+            except ImportError:
+                continue
+        candidates[label] = config
+
+    report = recall_report(matrix, args.threshold, k=args.k, candidates=candidates)
+
+    print(f"\n{'='*72}")
+    print(f"ANN RECALL REPORT (n={matrix.shape[0]}, threshold={args.threshold}, k={args.k})")
+    print(f"{'='*72}")
+    print(f"{'config':<16} {'recall':>8} {'edges':>10} {'exact':>10} {'build s':>10} {'query s':>10}")
+    for label, row in report.items():
+        print(f"{label:<16} {row['recall']:>8.4f} {row['edges']:>10} {row['exact_edges']:>10} "
+              f"{row['build_s']:>10.2f} {row['query_s']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -25,15 +25,37 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from openai import OpenAI
 
+from config import CHUNK_EMBEDDING_DIMENSIONS
+from processors.dim_reduction import FULL_DIMENSIONS, model_key
+from database.migrations import ensure_chunk_embedding_column
+from processors.embedding_cache import EmbeddingCache
+
 # Configuration
 DATABASE_URL = os.getenv('DATABASE_URL')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 EMBEDDING_MODEL = "text-embedding-3-small"  # 1536 dimensions
+# Chunk width comes from config.CHUNK_EMBEDDING_DIMENSIONS (0 = full);
+# ensure_chunk_embedding_column() converts transcript_chunks.embedding to
+# match, and the app must use the same value.
 CHUNK_SIZE_WORDS = 500
 CHUNK_OVERLAP_WORDS = 50
 EMBEDDING_BATCH_SIZE = 100
+# Transcripts fetched per round trip from the server-side cursor
+TRANSCRIPT_ITERSIZE = int(os.getenv('TRANSCRIPT_ITERSIZE', '20'))
+
+# Relevant videos with a transcript but no chunks yet
+NEW_TRANSCRIPTS_QUERY = '''
+    SELECT yv.id as video_uuid, yv.video_id, yv.title, yv.channel_name,
+           yv.views, vt.full_text, vt.token_count
+    FROM youtube_videos yv
+    JOIN video_transcripts vt ON yv.id = vt.video_id
+    WHERE yv.is_relevant = true
+      AND NOT EXISTS (SELECT 1 FROM transcript_chunks tc WHERE tc.video_id = yv.id)
+    ORDER BY yv.views DESC
+'''
 
 client = OpenAI(api_key=OPENAI_API_KEY)
+embedding_cache = EmbeddingCache(model_key(EMBEDDING_MODEL, CHUNK_EMBEDDING_DIMENSIONS))
 
 
 def chunk_transcript(full_text, chunk_size=CHUNK_SIZE_WORDS, overlap=CHUNK_OVERLAP_WORDS):
@@ -54,20 +76,21 @@ def chunk_transcript(full_text, chunk_size=CHUNK_SIZE_WORDS, overlap=CHUNK_OVERL
     return chunks
 
 
-def generate_embeddings_batch(texts):
-    """Generate embeddings for a list of texts in batches."""
-    all_embeddings = []
+def request_embeddings(batch):
+    """Call the embedding API for a single batch of texts."""
+    params = {'dimensions': CHUNK_EMBEDDING_DIMENSIONS} if CHUNK_EMBEDDING_DIMENSIONS else {}
+    response = client.embeddings.create(
+        model=EMBEDDING_MODEL,
+        input=batch,
+        **params
+    )
+    return [item.embedding for item in response.data]
 
-    for i in range(0, len(texts), EMBEDDING_BATCH_SIZE):
-        batch = texts[i:i + EMBEDDING_BATCH_SIZE]
-        response = client.embeddings.create(
-            model=EMBEDDING_MODEL,
-            input=batch,
-        )
-        batch_embeddings = [item.embedding for item in response.data]
-        all_embeddings.extend(batch_embeddings)
 
-    return all_embeddings
+def generate_embeddings_batch(texts):
+    """Generate embeddings for a list of texts in batches.
+    Texts already in embedding_cache are not sent to the API."""
+    return embedding_cache.embed(texts, request_embeddings, EMBEDDING_BATCH_SIZE)
 
 
 def main():
@@ -75,10 +98,33 @@ def main():
     parser.add_argument("--rebuild", action="store_true", help="Drop and rebuild all chunks")
     args = parser.parse_args()
 
+    # Only the chunk column; question migrations belong to main.py and
+    # python -m database.migrations. --rebuild may widen (it deletes chunks anyway)
+    try:
+        ensure_chunk_embedding_column(truncate_existing=args.rebuild)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
     print("Connecting to database...")
     conn = psycopg2.connect(DATABASE_URL)
     cur = conn.cursor(cursor_factory=RealDictCursor)
 
+    # Refuse to mix vector widths in transcript_chunks
+    cur.execute("""
+        SELECT atttypmod FROM pg_attribute
+        WHERE attrelid = 'transcript_chunks'::regclass AND attname = 'embedding'
+    """)
+    column_dims = cur.fetchone()['atttypmod']
+    expected_dims = CHUNK_EMBEDDING_DIMENSIONS or FULL_DIMENSIONS
+    if column_dims != expected_dims:
+        print(f"ERROR: transcript_chunks.embedding is vector({column_dims}) but "
+              f"CHUNK_EMBEDDING_DIMENSIONS gives {expected_dims}. "
+              f"Run python chunk_and_embed.py --rebuild")
+        cur.close()
+        conn.close()
+        sys.exit(1)
+
     # Rebuild mode: clear all existing chunks
     if args.rebuild:
         print("REBUILD mode: deleting all existing chunks...")
@@ -86,37 +132,40 @@ def main():
         conn.commit()
         print("  Cleared.")
 
-    # Fetch all transcripts with video info
+    # Count work up front; the transcripts themselves are streamed below
     cur.execute('''
-        SELECT yv.id as video_uuid, yv.video_id, yv.title, yv.channel_name,
-               yv.views, vt.full_text, vt.token_count
-        FROM youtube_videos yv
+        SELECT COUNT(*) AS n FROM youtube_videos yv
         JOIN video_transcripts vt ON yv.id = vt.video_id
         WHERE yv.is_relevant = true
-        ORDER BY yv.views DESC
     ''')
-    all_videos = cur.fetchall()
-
-    # Check which videos already have chunks (incremental)
-    cur.execute('SELECT DISTINCT video_id FROM transcript_chunks')
-    existing_ids = {row['video_id'] for row in cur.fetchall()}
-
-    videos = [v for v in all_videos if v['video_uuid'] not in existing_ids]
-    print(f"Total videos with transcripts: {len(all_videos)}")
-    print(f"Already chunked: {len(existing_ids)}")
-    print(f"New to process: {len(videos)}\n")
-
-    if not videos:
+    total_videos = cur.fetchone()['n']
+    cur.execute('SELECT COUNT(DISTINCT video_id) AS n FROM transcript_chunks')
+    already_chunked = cur.fetchone()['n']
+    cur.execute(f'SELECT COUNT(*) AS n FROM ({NEW_TRANSCRIPTS_QUERY}) new_videos')
+    new_count = cur.fetchone()['n']
+    print(f"Total videos with transcripts: {total_videos}")
+    print(f"Already chunked: {already_chunked}")
+    print(f"New to process: {new_count}\n")
+
+    if not new_count:
         print("Nothing new to chunk!")
         cur.close()
         conn.close()
         return
 
+    # Server-side cursor: only TRANSCRIPT_ITERSIZE transcripts in memory at a
+    # time. WITH HOLD keeps it open across the per-video commits.
+    videos = conn.cursor(name='new_transcripts', cursor_factory=RealDictCursor, withhold=True)
+    videos.itersize = TRANSCRIPT_ITERSIZE
+    videos.execute(NEW_TRANSCRIPTS_QUERY)
+    conn.commit()
+
     total_chunks = 0
     total_tokens = 0
-
+    processed = 0
     for i, v in enumerate(videos, 1):
-        print(f"[{i}/{len(videos)}] {v['title'][:60]}...", end=" ", flush=True)
+        processed = i
+        print(f"[{i}/{new_count}] {v['title'][:60]}...", end=" ", flush=True)
 
         # Chunk the transcript
         chunks = chunk_transcript(v['full_text'])
@@ -136,7 +185,7 @@ def main():
         # Insert chunks + embeddings into DB
         for idx, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
             token_count = len(chunk_text) // 4
-            embedding_str = json.dumps(embedding)
+            embedding_str = json.dumps(embedding.tolist())
 
             cur.execute('''
                 INSERT INTO transcript_chunks (video_id, chunk_index, chunk_text, token_count, embedding)
@@ -156,16 +205,19 @@ def main():
         # Small delay to respect rate limits
         time.sleep(0.5)
 
+    videos.close()
     cur.close()
     conn.close()
 
     print(f"\n{'='*60}")
     print(f"CHUNKING COMPLETE")
     print(f"{'='*60}")
-    print(f"Videos processed: {len(videos)}")
+    print(f"Videos processed: {processed}")
     print(f"Total chunks created: {total_chunks}")
     print(f"Total tokens: ~{total_tokens:,}")
-    print(f"Avg chunks per video: {total_chunks / len(videos):.1f}")
+    print(f"Avg chunks per video: {total_chunks / max(1, processed):.1f}")
+    cache_stats = embedding_cache.stats()
+    print(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
     print(f"\nNext: update the API routes to use vector search!")
 
 
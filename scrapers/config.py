@@ -30,6 +30,60 @@ SIMILARITY_THRESHOLD = 0.8  # 80%
 GPT_TEMPERATURE = 0.0  # Deterministic
 GPT_MAX_TOKENS = 500
 
+# Dedup neighbour search backend: '' = dense exact tiles,
+# or one of 'exact' / 'ivf' / 'hnsw' for sparse top-k neighbour graphs
+ANN_BACKEND = os.getenv('ANN_BACKEND', '')
+
+# Dedup clustering: 'greedy' (seed claims neighbours, row-order dependent)
+# or 'components' (union-find over the similarity graph, order independent)
+CLUSTERING_MODE = os.getenv('CLUSTERING_MODE', 'greedy')
+# components mode only: refuse to join clusters whose centroids are less
+# similar than this (stops A~B~C chaining); empty = no check
+CLUSTER_CENTROID_THRESHOLD = float(os.getenv('CLUSTER_CENTROID_THRESHOLD') or 0) or None
+# Threads used to generate similarity edges (0 = all cores)
+GROUPING_WORKERS = int(os.getenv('GROUPING_WORKERS', '0'))
+
+# Near-exact duplicate prefilter (MinHash/LSH on normalized text): texts whose
+# character-shingle Jaccard is >= this are compared once when grouping, and
+# texts with identical normalized text share one translation (identical
+# text, one embedding); 0 = disabled (default). Long questions that differ
+# by one word (e.g. "increase" / "decrease") can clear 0.9; see
+# processors/near_duplicates.py
+NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', '0'))
+
+# Dedup blocking: '' = compare all pairs, 'types' = only within shared
+# llm_types, 'kmeans' = only within coarse embedding cells (each question
+# joins its BLOCKING_PROBES nearest of BLOCKING_CELLS cells; 0 = auto)
+BLOCKING_MODE = os.getenv('BLOCKING_MODE', '')
+BLOCKING_CELLS = int(os.getenv('BLOCKING_CELLS', '0'))
+BLOCKING_PROBES = int(os.getenv('BLOCKING_PROBES', '2'))
+BLOCKING_WORKERS = int(os.getenv('BLOCKING_WORKERS', '0'))  # processes, 0 = all cores
+# Also run the unblocked comparison and log how many merges blocking lost
+BLOCKING_AUDIT = os.getenv('BLOCKING_AUDIT', '').lower() in ('1', 'true', 'yes')
+
+# Memory-mapped snapshot of the normalized question embedding matrix
+# ('<path>.index.json' naming a '<path>.<generation>.npy'); empty = disabled
+EMBEDDING_SNAPSHOT_PATH = os.getenv('EMBEDDING_SNAPSHOT_PATH', '')
+EMBEDDING_SNAPSHOT_DTYPE = os.getenv('EMBEDDING_SNAPSHOT_DTYPE', 'float32')  # or 'float16'
+
+# Question embedding width: 0 = full model width (1536). Reduced widths come
+# from the API 'dimensions' parameter ('api') or a local PCA basis ('pca',
+# fitted with embedding_dims_report.py --fit-pca and saved at EMBEDDING_PCA_PATH)
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', '0'))
+EMBEDDING_REDUCTION = os.getenv('EMBEDDING_REDUCTION', 'api')
+EMBEDDING_PCA_PATH = os.getenv('EMBEDDING_PCA_PATH', '')
+# Transcript chunk embedding width (API 'dimensions' only; the app's query
+# embeddings must use the same value): 0 = full width
+CHUNK_EMBEDDING_DIMENSIONS = int(os.getenv('CHUNK_EMBEDDING_DIMENSIONS', '0'))
+
+# LLM work claims: rows claimed per batch, and minutes before a claim whose
+# worker never wrote results back can be claimed again
+LLM_CLAIM_BATCH_SIZE = int(os.getenv('LLM_CLAIM_BATCH_SIZE', '500'))
+LLM_CLAIM_LEASE_MINUTES = float(os.getenv('LLM_CLAIM_LEASE_MINUTES', '30'))
+
+# Embedding cache: drop cached vectors not used for this many days
+EMBEDDING_CACHE_MAX_AGE_DAYS = int(os.getenv('EMBEDDING_CACHE_MAX_AGE_DAYS', '90'))
+
 # Sources
 SOURCES = {
     'pm_exercises': {
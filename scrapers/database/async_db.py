@@ -0,0 +1,422 @@
+"""
+asyncio counterpart of DatabaseManager
+
+Same operations and return shapes as database.db.DatabaseManager, on an
+asyncpg pool, so concurrent stages (scraping, LLM batches, embedding
+writes) can write results as they arrive from one event loop:
+
+    async with AsyncDatabaseManager() as db:
+        await asyncio.gather(
+            db.update_llm_results(batch_a),
+            db.store_raw_embeddings(rows),
+        )
+
+The hot-path reads and writes are native asyncpg, set-based like their
+synchronous versions. The rarely called multi-statement maintenance
+operations (write_merged_groups, apply_merged_diff, get_merged_state,
+ensure_embedding_columns, ...) run the synchronous implementation in a
+worker thread instead of duplicating it. Iterators cannot be forwarded that
+way (the rows would be pulled on the event loop), so every iter_* method is
+native and the fallback refuses generators.
+"""
+import asyncio
+import inspect
+import json
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from config import DATABASE_URL, LLM_CLAIM_BATCH_SIZE, LLM_CLAIM_LEASE_MINUTES
+from database.async_pool import create_async_pool, rowcount, stream_records, to_timestamp
+from database.db import DatabaseManager, to_vector_literal
+from database.pool import STREAM_ITERSIZE
+from database.stats import group_counters
+
+RAW_STAGING_COLUMNS = (
+    'ord', 'content', 'source', 'source_url', 'company', 'question_type', 'metadata', 'published_at',
+)
+
+
+class AsyncDatabaseManager:
+    """Manage database operations on an asyncpg pool"""
+
+    def __init__(self, dsn: str = DATABASE_URL, **pool_kwargs):
+        self.dsn = dsn
+        self.pool_kwargs = pool_kwargs
+        self.pool = None
+
+    async def open(self) -> 'AsyncDatabaseManager':
+        if self.pool is None:
+            self.pool = await create_async_pool(self.dsn, **self.pool_kwargs)
+        return self
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def __aenter__(self) -> 'AsyncDatabaseManager':
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def __getattr__(self, name: str):
+        # Remaining DatabaseManager operations run in a worker thread
+        sync = getattr(DatabaseManager, name, None) if not name.startswith('_') else None
+        if sync is None or not callable(sync):
+            raise AttributeError(name)
+        if inspect.isgeneratorfunction(sync):
+            raise TypeError(f"DatabaseManager.{name} is a generator; it needs a native async version")
+
+        async def run_in_thread(*args, **kwargs):
+            result = await asyncio.to_thread(sync, *args, **kwargs)
+            if inspect.isgenerator(result):
+                result.close()
+                raise TypeError(f"DatabaseManager.{name} returns a generator; it needs a native async version")
+            return result
+        return run_in_thread
+
+    # ------------------------------------------------------------------
+    # Raw questions
+
+    async def insert_raw_questions(self, questions: Iterable[Dict]) -> int:
+        """Insert raw questions; returns number inserted or updated"""
+        counts = await self.copy_raw_questions(questions)
+        return counts['inserted'] + counts['updated']
+
+    async def copy_raw_questions(self, questions: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Bulk upsert through COPY into a temp staging table and one
+        ON CONFLICT (content_hash, source) merge (see
+        DatabaseManager.copy_raw_questions). `questions` may be a regular
+        or an async iterable.
+
+        Returns:
+            {'inserted': new rows, 'updated': existing rows updated}
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    CREATE TEMP TABLE raw_questions_staging (
+                        ord BIGINT,
+                        content TEXT,
+                        source VARCHAR(50),
+                        source_url TEXT,
+                        company VARCHAR(100),
+                        question_type VARCHAR(50),
+                        metadata TEXT,
+                        published_at TIMESTAMP WITH TIME ZONE
+                    ) ON COMMIT DROP
+                """)
+                await conn.copy_records_to_table(
+                    'raw_questions_staging', columns=RAW_STAGING_COLUMNS,
+                    records=_staging_records(questions),
+                )
+                row = await conn.fetchrow("""
+                    WITH src AS (
+                        SELECT DISTINCT ON (raw_question_hash(content), source)
+                            content, source, source_url, company, question_type,
+                            metadata::jsonb, published_at
+                        FROM raw_questions_staging
+                        ORDER BY raw_question_hash(content), source, ord DESC
+                    ), upserted AS (
+                        INSERT INTO raw_questions
+                            (content, source, source_url, company, question_type, metadata, published_at)
+                        SELECT * FROM src
+                        ON CONFLICT (content_hash, source) DO UPDATE SET
+                            company = COALESCE(EXCLUDED.company, raw_questions.company),
+                            question_type = COALESCE(EXCLUDED.question_type, raw_questions.question_type),
+                            metadata = EXCLUDED.metadata,
+                            published_at = COALESCE(EXCLUDED.published_at, raw_questions.published_at)
+                        RETURNING (xmax = 0) AS inserted
+                    )
+                    SELECT COUNT(*) FILTER (WHERE inserted) AS inserted,
+                           COUNT(*) FILTER (WHERE NOT inserted) AS updated
+                    FROM upserted
+                """)
+        return {'inserted': row['inserted'], 'updated': row['updated']}
+
+    async def get_llm_unprocessed_questions(self) -> List[Dict]:
+        """Get raw questions that haven't been LLM-processed yet"""
+        return [q async for q in self.iter_llm_unprocessed_questions()]
+
+    def iter_llm_unprocessed_questions(self, itersize: int = STREAM_ITERSIZE) -> AsyncIterator[Dict]:
+        """Stream raw questions that haven't been LLM-processed yet"""
+        return stream_records(self.pool, """
+            SELECT id, content, source, company, question_type
+            FROM raw_questions
+            WHERE llm_processed IS NOT TRUE
+            ORDER BY scraped_at DESC, id DESC
+        """, itersize=itersize)
+
+    async def claim_llm_batch(self, n: int = LLM_CLAIM_BATCH_SIZE, after: Optional[tuple] = None,
+                              lease_minutes: float = LLM_CLAIM_LEASE_MINUTES) -> List[Dict]:
+        """Claim up to `n` unprocessed raw questions (see DatabaseManager.claim_llm_batch)"""
+        keyset = "AND (scraped_at, id) < ($3, $4::uuid)" if after else ""
+        rows = await self.pool.fetch(f"""
+            WITH claimable AS (
+                SELECT id
+                FROM raw_questions
+                WHERE llm_processed IS NOT TRUE
+                  AND (llm_claimed_at IS NULL
+                       OR llm_claimed_at < NOW() - $1::FLOAT8 * INTERVAL '1 minute')
+                  {keyset}
+                ORDER BY scraped_at DESC, id DESC
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            ), claimed AS (
+                UPDATE raw_questions AS rq
+                SET llm_claimed_at = NOW()
+                FROM claimable
+                WHERE rq.id = claimable.id
+                RETURNING rq.id, rq.content, rq.source, rq.company, rq.question_type, rq.scraped_at
+            )
+            SELECT * FROM claimed ORDER BY scraped_at DESC, id DESC
+        """, float(lease_minutes), n, *(after or ()))
+        return [dict(r) for r in rows]
+
+    async def iter_llm_claims(self, batch_size: int = LLM_CLAIM_BATCH_SIZE) -> AsyncIterator[Dict]:
+        """Claim and yield unprocessed questions batch by batch (see
+        DatabaseManager.iter_llm_claims)"""
+        after = None
+        while True:
+            batch = await self.claim_llm_batch(batch_size, after)
+            if not batch:
+                return
+            for q in batch:
+                yield q
+            last = batch[-1]
+            after = (last['scraped_at'], last['id']) if last['scraped_at'] is not None else None
+
+    async def update_llm_results(self, results: List[Dict]) -> int:
+        """Write LLM results with one set-based UPDATE; returns rows updated"""
+        if not results:
+            return 0
+        rows = {str(r['id']): r for r in results}
+        status = await self.pool.execute("""
+            UPDATE raw_questions AS rq
+            SET english_content = v.english_content,
+                llm_types = ARRAY(SELECT jsonb_array_elements_text(v.llm_types::jsonb)),
+                llm_processed = TRUE
+            FROM unnest($1::uuid[], $2::text[], $3::text[]) AS v(id, english_content, llm_types)
+            WHERE rq.id = v.id
+        """, list(rows), [r['english_content'] for r in rows.values()],
+            # Ragged TEXT[][] is not valid, so each row's types travel as a JSON array
+            [json.dumps(list(r['llm_types'])) for r in rows.values()])
+        return rowcount(status)
+
+    async def get_all_raw_questions(self) -> List[Dict]:
+        """Get all raw questions for embedding processing"""
+        return [q async for q in self.iter_all_raw_questions()]
+
+    def iter_all_raw_questions(self, itersize: int = STREAM_ITERSIZE) -> AsyncIterator[Dict]:
+        """Stream all raw questions, newest first"""
+        return stream_records(self.pool, """
+            SELECT id, content, english_content, source, source_url,
+                   company, question_type, llm_types, metadata, published_at
+            FROM raw_questions
+            ORDER BY scraped_at DESC
+        """, itersize=itersize)
+
+    async def get_unmapped_raw_questions(self) -> List[Dict]:
+        """Get raw questions not yet mapped to any merged question"""
+        rows = await self.pool.fetch("""
+            SELECT rq.id, rq.content, rq.english_content, rq.source, rq.source_url,
+                   rq.company, rq.question_type, rq.llm_types, rq.metadata, rq.published_at
+            FROM raw_questions rq
+            LEFT JOIN question_mappings qm ON rq.id = qm.raw_question_id
+            WHERE qm.raw_question_id IS NULL
+            ORDER BY rq.scraped_at DESC
+        """)
+        return [dict(r) for r in rows]
+
+    async def get_existing_source_urls(self, source: str) -> set:
+        """Get all source_urls that already have raw questions for a given source."""
+        rows = await self.pool.fetch(
+            "SELECT DISTINCT source_url FROM raw_questions WHERE source = $1", source
+        )
+        return {r[0] for r in rows}
+
+    async def cleanup_duplicate_raw_by_url(self, source: str) -> int:
+        """Remove later scrape batches of the same source_url (see
+        DatabaseManager.cleanup_duplicate_raw_by_url); returns rows deleted"""
+        status = await self.pool.execute("""
+            DELETE FROM raw_questions
+            WHERE id IN (
+                SELECT rq.id
+                FROM raw_questions rq
+                JOIN (
+                    SELECT source_url, MIN(scraped_at) AS first_scraped
+                    FROM raw_questions
+                    WHERE source = $1
+                    GROUP BY source_url
+                ) earliest ON rq.source_url = earliest.source_url
+                WHERE rq.source = $1
+                  AND rq.scraped_at > earliest.first_scraped + INTERVAL '5 minutes'
+            )
+        """, source)
+        return rowcount(status)
+
+    # ------------------------------------------------------------------
+    # Embeddings
+
+    async def get_raw_ids_without_embedding(self) -> set:
+        """IDs of raw questions whose embedding column is not populated"""
+        rows = await self.pool.fetch("SELECT id FROM raw_questions WHERE embedding IS NULL")
+        return {r[0] for r in rows}
+
+    async def get_merged_without_embedding(self) -> List[Dict]:
+        """Merged questions created before embeddings were stored"""
+        rows = await self.pool.fetch("""
+            SELECT id, canonical_content, english_content
+            FROM merged_questions
+            WHERE embedding IS NULL
+        """)
+        return [dict(r) for r in rows]
+
+    async def _store_embeddings(self, table: str, rows: List[tuple]) -> int:
+        if not rows:
+            return 0
+        await self.pool.execute(f"""
+            UPDATE {table} AS t
+            SET embedding = v.embedding::vector
+            FROM unnest($1::uuid[], $2::text[]) AS v(id, embedding)
+            WHERE t.id = v.id
+        """, [str(row_id) for row_id, _ in rows], [to_vector_literal(vec) for _, vec in rows])
+        return len(rows)
+
+    async def store_raw_embeddings(self, rows: List[tuple]) -> int:
+        """Store embeddings for raw questions from (raw_id, vector) pairs"""
+        return await self._store_embeddings('raw_questions', rows)
+
+    async def store_merged_embeddings(self, rows: List[tuple]) -> int:
+        """Store embeddings for merged questions from (merged_id, vector) pairs"""
+        return await self._store_embeddings('merged_questions', rows)
+
+    async def match_raw_to_merged(self, raw_ids: List[str], threshold: float) -> Dict[str, tuple]:
+        """Nearest merged question per raw question (see DatabaseManager.match_raw_to_merged)"""
+        if not raw_ids:
+            return {}
+        rows = await self.pool.fetch(
+            "SELECT * FROM match_raw_to_merged($1::uuid[], $2)", [str(r) for r in raw_ids], threshold
+        )
+        return {r[0]: (r[1], float(r[2])) for r in rows}
+
+    # ------------------------------------------------------------------
+    # Merged questions
+
+    async def create_question_mapping(self, raw_id: str, merged_id: str, similarity: float):
+        """Create mapping between raw and merged question"""
+        await self.pool.execute("""
+            INSERT INTO question_mappings (raw_question_id, merged_question_id, similarity_score)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (raw_question_id, merged_question_id) DO NOTHING
+        """, str(raw_id), str(merged_id), similarity)
+
+    async def update_question_frequency(self, merged_id: str):
+        """Update frequency count for merged question"""
+        await self.pool.execute("""
+            UPDATE merged_questions
+            SET frequency = (
+                    SELECT COUNT(*) FROM question_mappings WHERE merged_question_id = $1
+                ),
+                updated_at = NOW()
+            WHERE id = $1
+        """, str(merged_id))
+
+    async def merge_question_attributes(self, merged_id: str,
+                                        question_types: Optional[List[str]] = None,
+                                        first_seen_at=None):
+        """Union question_types and keep the earliest first_seen_at"""
+        types = question_types or []
+        await self.pool.execute("""
+            UPDATE merged_questions
+            SET
+                question_types = (
+                    SELECT ARRAY(
+                        SELECT DISTINCT t
+                        FROM unnest(COALESCE(question_types, '{}') || $1::TEXT[]) AS t
+                        ORDER BY t
+                    )
+                ),
+                question_type = COALESCE(question_type, $2),
+                first_seen_at = LEAST(first_seen_at, $3::TIMESTAMPTZ),
+                updated_at = NOW()
+            WHERE id = $4
+        """, types, types[0] if types else None, to_timestamp(first_seen_at), str(merged_id))
+
+    async def link_companies(self, links: List[tuple]) -> int:
+        """
+        Link merged questions to companies by name, creating unknown
+        companies (see CompanyResolver), in one transaction.
+
+        Returns:
+            Number of links inserted
+        """
+        if not links:
+            return 0
+        names = list(dict.fromkeys(name for _, name in links if name))
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                company_ids = {
+                    r['name']: r['id'] for r in await conn.fetch("""
+                        INSERT INTO companies (name)
+                        SELECT unnest($1::VARCHAR[])
+                        ON CONFLICT (name) DO NOTHING
+                        RETURNING name, id
+                    """, names)
+                }
+                missing = [n for n in names if n not in company_ids]
+                if missing:
+                    company_ids.update(
+                        (r['name'], r['id']) for r in await conn.fetch(
+                            "SELECT name, id FROM companies WHERE name = ANY($1::VARCHAR[])", missing
+                        )
+                    )
+                rows = list(dict.fromkeys(
+                    (str(m), company_ids[name]) for m, name in links if name
+                ))
+                await conn.execute("""
+                    INSERT INTO question_companies (merged_question_id, company_id)
+                    SELECT * FROM unnest($1::uuid[], $2::uuid[])
+                    ON CONFLICT DO NOTHING
+                """, [m for m, _ in rows], [c for _, c in rows])
+        return len(rows)
+
+    # ------------------------------------------------------------------
+    # Stats
+
+    async def get_stats(self) -> Dict:
+        """Get database statistics (trigger-maintained counters, see database.stats)"""
+        metrics = ['raw_questions', 'merged_questions', 'raw_questions.source', 'merged_questions.question_type']
+        counters = group_counters(await self.pool.fetch("""
+            SELECT metric, key, SUM(value)::BIGINT FROM table_counters
+            WHERE metric = ANY($1::TEXT[])
+            GROUP BY metric, key
+        """, metrics), metrics)
+        return {
+            'raw_questions': counters['raw_questions'].get('', 0),
+            'merged_questions': counters['merged_questions'].get('', 0),
+            'by_source': counters['raw_questions.source'],
+            'by_type': dict(sorted(
+                counters['merged_questions.question_type'].items(), key=lambda kv: kv[1], reverse=True
+            )),
+        }
+
+
+async def _staging_records(questions):
+    """COPY records for raw_questions_staging from a sync or async iterable"""
+    if hasattr(questions, '__aiter__'):
+        i = 0
+        async for q in questions:
+            yield _staging_record(i, q)
+            i += 1
+    else:
+        for i, q in enumerate(questions):
+            yield _staging_record(i, q)
+
+
+def _staging_record(i: int, q: Dict) -> tuple:
+    return (
+        i, q['content'], q['source'], q['source_url'], q.get('company'),
+        q.get('question_type'), json.dumps(q.get('metadata', {})), to_timestamp(q.get('published_at')),
+    )
@@ -0,0 +1,65 @@
+"""
+asyncpg connection pool for the asyncio database layer
+
+Shared by database.async_db (AsyncDatabaseManager) and youtube.async_db
+(AsyncVideoDB). Connections are set up so rows look like the psycopg2
+ones the synchronous managers return: uuid columns decode to str and
+json/jsonb to Python objects.
+
+asyncpg is optional: pip install asyncpg
+"""
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict
+
+from database.pool import POOL_MAX, POOL_MIN, POOL_TIMEOUT, STREAM_ITERSIZE
+
+
+async def _init_connection(conn):
+    await conn.set_type_codec('uuid', encoder=str, decoder=str, schema='pg_catalog')
+    for json_type in ('json', 'jsonb'):
+        await conn.set_type_codec(json_type, encoder=_json_dumps, decoder=_json_loads,
+                                  schema='pg_catalog')
+
+
+def _json_dumps(value) -> str:
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _json_loads(value: str):
+    return json.loads(value)
+
+
+async def create_async_pool(dsn: str, min_size: int = POOL_MIN, max_size: int = POOL_MAX,
+                            timeout: float = POOL_TIMEOUT):
+    """Open an asyncpg pool (same DB_POOL_* settings as the psycopg2 pool)"""
+    try:
+        import asyncpg
+    except ImportError:
+        raise ImportError("The async database layer requires asyncpg. Run: pip install asyncpg")
+    return await asyncpg.create_pool(
+        dsn, min_size=min_size, max_size=max_size, timeout=timeout, init=_init_connection,
+    )
+
+
+async def stream_records(pool, query: str, *args,
+                         itersize: int = STREAM_ITERSIZE) -> AsyncIterator[Dict]:
+    """Yield rows of `query` as dicts from a server-side cursor, `itersize`
+    rows per round trip (the async counterpart of database.pool.stream_query)"""
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            async for record in conn.cursor(query, *args, prefetch=itersize):
+                yield dict(record)
+
+
+def to_timestamp(value):
+    """asyncpg needs datetime objects where psycopg2 accepted ISO strings"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value
+
+
+def rowcount(status: str) -> int:
+    """Affected rows from an asyncpg command status ('UPDATE 12' -> 12)"""
+    last = status.rsplit(' ', 1)[-1] if status else ''
+    return int(last) if last.isdigit() else 0
@@ -1,83 +1,193 @@
 """
 Database operations for Daily Interview
 """
-import psycopg2
 from psycopg2.extras import RealDictCursor, execute_values
 from contextlib import contextmanager
-from typing import List, Dict, Optional
+from typing import Iterable, Iterator, List, Dict, Optional
+import io
 import json
+import os
+import uuid
 from datetime import datetime
 
-from config import DATABASE_URL
+import numpy as np
+
+from config import DATABASE_URL, LLM_CLAIM_BATCH_SIZE, LLM_CLAIM_LEASE_MINUTES
+from database.pool import STREAM_ITERSIZE, get_pool, stream_query
+from database.stats import compact_counters, read_counters
+
+LLM_UPDATE_PAGE_SIZE = 1000  # rows per UPDATE ... FROM (VALUES ...) statement
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'database')
 
 
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections"""
-    conn = psycopg2.connect(DATABASE_URL)
-    try:
+    """Context manager for pooled database connections (commit on success)"""
+    with get_pool(DATABASE_URL).connection() as conn:
         yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+
+
+def _csv_field(value) -> str:
+    """One COPY csv field: unquoted empty is NULL, everything else quoted"""
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+class CopyStream(io.RawIOBase):
+    """Read-only file over rows rendered lazily as COPY csv lines"""
+
+    def __init__(self, rows: Iterable[tuple]):
+        self._lines = (
+            (','.join(_csv_field(v) for v in row) + '\n').encode('utf-8') for row in rows
+        )
+        self._buffer = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            self._buffer += line
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def to_vector_literal(vector) -> str:
+    """Format an embedding as a pgvector text literal ('[x,y,...]')"""
+    return json.dumps(np.asarray(vector, dtype=float).tolist())
+
+
+class CompanyResolver:
+    """
+    Company name -> id. The companies table is read once, names are
+    resolved in memory, and unknown names are created with one
+    INSERT ... ON CONFLICT (name) DO NOTHING. Rows another writer inserts
+    concurrently are picked up by a follow-up SELECT rather than raising.
+
+    Ids are only valid inside the transaction that resolved them (new
+    companies disappear if it rolls back), so use one resolver per
+    transaction.
+    """
+
+    def __init__(self):
+        self._ids: Optional[Dict[str, str]] = None
+
+    def resolve(self, cursor, names: Iterable[str],
+                company_type: Optional[str] = None) -> Dict[str, str]:
+        """Ids for `names`, creating missing companies (with `company_type`)"""
+        if self._ids is None:
+            cursor.execute("SELECT name, id FROM companies")
+            self._ids = {name: str(cid) for name, cid in cursor.fetchall()}
+
+        names = list(dict.fromkeys(n for n in names if n))
+        missing = [n for n in names if n not in self._ids]
+        if missing:
+            cursor.execute("""
+                INSERT INTO companies (name, type)
+                SELECT unnest(%s::VARCHAR[]), %s
+                ON CONFLICT (name) DO NOTHING
+                RETURNING name, id
+            """, (missing, company_type))
+            self._ids.update((name, str(cid)) for name, cid in cursor.fetchall())
+
+            raced = [n for n in missing if n not in self._ids]
+            if raced:
+                cursor.execute("SELECT name, id FROM companies WHERE name = ANY(%s)", (raced,))
+                self._ids.update((name, str(cid)) for name, cid in cursor.fetchall())
+
+        return {n: self._ids[n] for n in names}
 
 
 class DatabaseManager:
     """Manage all database operations"""
 
     @staticmethod
-    def insert_raw_questions(questions: List[Dict]) -> int:
+    def insert_raw_questions(questions: Iterable[Dict]) -> int:
         """
         Insert raw questions into database
 
         Args:
-            questions: List of question dictionaries
+            questions: Question dictionaries (any iterable)
 
         Returns:
-            Number of questions inserted
+            Number of questions inserted or updated
         """
-        if not questions:
-            return 0
+        counts = DatabaseManager.copy_raw_questions(questions)
+        return counts['inserted'] + counts['updated']
+
+    @staticmethod
+    def copy_raw_questions(questions: Iterable[Dict]) -> Dict[str, int]:
+        """
+        Bulk upsert raw questions: COPY into a temp staging table, then one
+        set-based INSERT ... ON CONFLICT (content_hash, source) merge.
 
+        `questions` is consumed lazily while COPY streams, so memory stays
+        flat for large loads. content_hash is generated from the normalized
+        content by raw_question_hash() (see database.migrations); within
+        the input the last row per (content_hash, source) wins.
+
+        Returns:
+            {'inserted': new rows, 'updated': existing rows updated}
+        """
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TEMP TABLE raw_questions_staging (
+                    ord BIGINT,
+                    content TEXT,
+                    source VARCHAR(50),
+                    source_url TEXT,
+                    company VARCHAR(100),
+                    question_type VARCHAR(50),
+                    metadata JSONB,
+                    published_at TIMESTAMP WITH TIME ZONE
+                ) ON COMMIT DROP
+            """)
 
-            query = """
-            INSERT INTO raw_questions
-                (content, source, source_url, company, question_type, metadata, published_at)
-            VALUES %s
-            ON CONFLICT (content, source) DO UPDATE SET
-                company = COALESCE(EXCLUDED.company, raw_questions.company),
-                question_type = COALESCE(EXCLUDED.question_type, raw_questions.question_type),
-                metadata = EXCLUDED.metadata,
-                published_at = COALESCE(EXCLUDED.published_at, raw_questions.published_at)
-            RETURNING id
-            """
+            rows = (
+                (i, q['content'], q['source'], q['source_url'], q.get('company'),
+                 q.get('question_type'), json.dumps(q.get('metadata', {})), q.get('published_at'))
+                for i, q in enumerate(questions)
+            )
+            cursor.copy_expert(
+                "COPY raw_questions_staging FROM STDIN WITH (FORMAT csv)",
+                CopyStream(rows),
+            )
 
-            # Deduplicate within batch — ON CONFLICT can't handle
-            # two rows with the same (content, source) in one INSERT
-            seen = {}
-            for q in questions:
-                key = (q['content'], q['source'])
-                seen[key] = (
-                    q['content'],
-                    q['source'],
-                    q['source_url'],
-                    q.get('company'),
-                    q.get('question_type'),
-                    json.dumps(q.get('metadata', {})),
-                    q.get('published_at')
+            # xmax = 0 only on rows this statement inserted
+            cursor.execute("""
+                WITH src AS (
+                    SELECT DISTINCT ON (raw_question_hash(content), source)
+                        content, source, source_url, company, question_type, metadata, published_at
+                    FROM raw_questions_staging
+                    ORDER BY raw_question_hash(content), source, ord DESC
+                ), upserted AS (
+                    INSERT INTO raw_questions
+                        (content, source, source_url, company, question_type, metadata, published_at)
+                    SELECT * FROM src
+                    ON CONFLICT (content_hash, source) DO UPDATE SET
+                        company = COALESCE(EXCLUDED.company, raw_questions.company),
+                        question_type = COALESCE(EXCLUDED.question_type, raw_questions.question_type),
+                        metadata = EXCLUDED.metadata,
+                        published_at = COALESCE(EXCLUDED.published_at, raw_questions.published_at)
+                    RETURNING (xmax = 0) AS inserted
                 )
-            values = list(seen.values())
-
-            execute_values(cursor, query, values)
-            inserted_count = cursor.rowcount
+                SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+                FROM upserted
+            """)
+            inserted, updated = cursor.fetchone()
             cursor.close()
 
-            return inserted_count
+            return {'inserted': inserted, 'updated': updated}
 
     @staticmethod
     def get_unprocessed_questions(limit: int = 100) -> List[Dict]:
@@ -112,7 +222,7 @@ class DatabaseManager:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
 
             query = """
-            SELECT id, canonical_content, question_type
+            SELECT id, canonical_content, english_content, question_type
             FROM merged_questions
             ORDER BY updated_at DESC
             """
@@ -190,183 +300,233 @@ class DatabaseManager:
 
     @staticmethod
     def get_or_create_company(name: str, company_type: Optional[str] = None) -> str:
-        """Get existing company or create new one"""
+        """Get existing company or create new one (safe against concurrent creates)"""
         with get_db_connection() as conn:
             cursor = conn.cursor()
-
-            # Try to get existing
-            cursor.execute("SELECT id FROM companies WHERE name = %s", (name,))
-            result = cursor.fetchone()
-
-            if result:
-                return str(result[0])
-
-            # Create new
-            cursor.execute(
-                "INSERT INTO companies (name, type) VALUES (%s, %s) RETURNING id",
-                (name, company_type)
-            )
-            company_id = cursor.fetchone()[0]
+            company_id = CompanyResolver().resolve(cursor, [name], company_type)[name]
             cursor.close()
-
-            return str(company_id)
+            return company_id
 
     @staticmethod
     def link_question_to_company(merged_id: str, company_id: str):
         """Link merged question to company"""
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            DatabaseManager._insert_company_links(cursor, [(merged_id, company_id)])
+            cursor.close()
 
-            query = """
-            INSERT INTO question_companies (merged_question_id, company_id)
-            VALUES (%s, %s)
-            ON CONFLICT DO NOTHING
-            """
+    @staticmethod
+    def link_companies(links: List[tuple]) -> int:
+        """
+        Link merged questions to companies by name, creating unknown
+        companies, in one transaction.
+
+        Args:
+            links: (merged_id, company_name) pairs
 
-            cursor.execute(query, (merged_id, company_id))
+        Returns:
+            Number of links inserted
+        """
+        if not links:
+            return 0
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            company_ids = CompanyResolver().resolve(cursor, [name for _, name in links])
+            rows = list(dict.fromkeys((str(m), company_ids[name]) for m, name in links))
+            DatabaseManager._insert_company_links(cursor, rows)
             cursor.close()
+            return len(rows)
 
     @staticmethod
-    def ensure_llm_columns():
-        """Add LLM-related columns if they don't exist"""
+    def ensure_embedding_columns(dimensions: int = 1536, truncate_existing: bool = True) -> bool:
+        """Add pgvector embedding columns, indexes and match functions for
+        questions (database/question_embeddings_schema.sql) at `dimensions` wide.
+
+        Columns created at a different width are converted in place: with
+        truncate_existing (API 'dimensions' reduction) stored vectors are cut
+        to their first `dimensions` components and re-normalized, which is what
+        the API would return; otherwise they are cleared and re-embedded.
+
+        Runs on every migration pass (see database.migrations) but only
+        issues DDL when a column is missing or its width changed.
+
+        Returns:
+            True if the schema was changed
+        """
+        dimensions = int(dimensions)
+        with open(os.path.join(SCHEMA_DIR, 'question_embeddings_schema.sql'), encoding='utf-8') as f:
+            ddl = f.read().replace('vector(1536)', f'vector({dimensions})')
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                DO $$
-                BEGIN
-                    -- raw_questions: LLM processing columns
-                    IF NOT EXISTS (
-                        SELECT 1 FROM information_schema.columns
-                        WHERE table_name = 'raw_questions' AND column_name = 'english_content'
-                    ) THEN
-                        ALTER TABLE raw_questions ADD COLUMN english_content TEXT;
-                    END IF;
-
-                    IF NOT EXISTS (
-                        SELECT 1 FROM information_schema.columns
-                        WHERE table_name = 'raw_questions' AND column_name = 'llm_types'
-                    ) THEN
-                        ALTER TABLE raw_questions ADD COLUMN llm_types TEXT[];
-                    END IF;
-
-                    IF NOT EXISTS (
-                        SELECT 1 FROM information_schema.columns
-                        WHERE table_name = 'raw_questions' AND column_name = 'llm_processed'
-                    ) THEN
-                        ALTER TABLE raw_questions ADD COLUMN llm_processed BOOLEAN DEFAULT FALSE;
-                    END IF;
-
-                    -- merged_questions: multi-type column
-                    IF NOT EXISTS (
-                        SELECT 1 FROM information_schema.columns
-                        WHERE table_name = 'merged_questions' AND column_name = 'question_types'
-                    ) THEN
-                        ALTER TABLE merged_questions ADD COLUMN question_types TEXT[];
-                    END IF;
-
-                    -- merged_questions: english_content for bilingual display
-                    IF NOT EXISTS (
-                        SELECT 1 FROM information_schema.columns
-                        WHERE table_name = 'merged_questions' AND column_name = 'english_content'
-                    ) THEN
-                        ALTER TABLE merged_questions ADD COLUMN english_content TEXT;
-                    END IF;
-
-                    -- merged_questions: earliest published date from raw questions
-                    IF NOT EXISTS (
-                        SELECT 1 FROM information_schema.columns
-                        WHERE table_name = 'merged_questions' AND column_name = 'first_seen_at'
-                    ) THEN
-                        ALTER TABLE merged_questions ADD COLUMN first_seen_at TIMESTAMPTZ;
-                    END IF;
-                END $$;
+                SELECT attrelid::regclass::text, atttypmod FROM pg_attribute
+                WHERE attrelid IN ('raw_questions'::regclass, 'merged_questions'::regclass)
+                  AND attname = 'embedding' AND NOT attisdropped
             """)
+            widths = dict(cursor.fetchall())
+            if widths == {'raw_questions': dimensions, 'merged_questions': dimensions}:
+                cursor.close()
+                return False
+
+            for table, width in widths.items():
+                if width == dimensions:
+                    continue
+
+                if truncate_existing and width > dimensions:
+                    using = f"l2_normalize(subvector(embedding, 1, {dimensions}))::vector({dimensions})"
+                else:
+                    using = f"NULL::vector({dimensions})"
+                cursor.execute(f"DROP INDEX IF EXISTS idx_{table}_embedding")
+                cursor.execute(
+                    f"ALTER TABLE {table} ALTER COLUMN embedding TYPE vector({dimensions}) USING {using}"
+                )
+            cursor.execute(ddl)
             cursor.close()
+            return True
 
     @staticmethod
     def get_llm_unprocessed_questions() -> List[Dict]:
         """Get raw questions that haven't been LLM-processed yet"""
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT id, content, source, company, question_type
-                FROM raw_questions
-                WHERE llm_processed = FALSE OR llm_processed IS NULL
-                ORDER BY scraped_at DESC
-            """)
-            questions = cursor.fetchall()
-            cursor.close()
-            return [dict(q) for q in questions]
+        return list(DatabaseManager.iter_llm_unprocessed_questions())
 
     @staticmethod
-    def update_llm_results(results: List[Dict]):
-        """Batch update raw questions with LLM results"""
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            for r in results:
-                cursor.execute("""
-                    UPDATE raw_questions
-                    SET english_content = %s,
-                        llm_types = %s,
-                        llm_processed = TRUE
-                    WHERE id = %s
-                """, (r['english_content'], r['llm_types'], str(r['id'])))
-            cursor.close()
+    def iter_llm_unprocessed_questions(itersize: int = STREAM_ITERSIZE) -> Iterator[Dict]:
+        """Stream raw questions that haven't been LLM-processed yet"""
+        return stream_query(DATABASE_URL, """
+            SELECT id, content, source, company, question_type
+            FROM raw_questions
+            WHERE llm_processed IS NOT TRUE
+            ORDER BY scraped_at DESC, id DESC
+        """, itersize=itersize)
 
     @staticmethod
-    def deduplicate_raw_questions() -> int:
+    def claim_llm_batch(n: int = LLM_CLAIM_BATCH_SIZE, after: Optional[tuple] = None,
+                        lease_minutes: float = LLM_CLAIM_LEASE_MINUTES) -> List[Dict]:
         """
-        Remove duplicate raw questions and add unique constraint.
-        Keeps the oldest row for each (content, source) pair.
-        Returns number of duplicates removed.
-        """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
+        Claim up to `n` unprocessed raw questions for this worker, newest
+        first.
 
-            # Count before
-            cursor.execute("SELECT COUNT(*) FROM raw_questions")
-            before = cursor.fetchone()[0]
+        Rows are picked from the idx_raw_questions_llm_pending partial index
+        with FOR UPDATE SKIP LOCKED and stamped with llm_claimed_at, so
+        concurrent workers (other processes or machines) never get the same
+        row. A claim expires after `lease_minutes` if its worker dies before
+        update_llm_results() marks the rows processed.
 
-            # Delete duplicates, keeping the earliest scraped_at for each (content, source)
-            cursor.execute("""
-                DELETE FROM raw_questions
-                WHERE id NOT IN (
-                    SELECT DISTINCT ON (content, source) id
+        Args:
+            after: (scraped_at, id) of the last row of the previous claim;
+                the scan resumes below it instead of re-walking rows this
+                worker already holds
+
+        Returns:
+            Claimed questions (with scraped_at), in (scraped_at, id) DESC order
+        """
+        keyset = "AND (scraped_at, id) < (%s, %s::uuid)" if after else ""
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(f"""
+                WITH claimable AS (
+                    SELECT id
                     FROM raw_questions
-                    ORDER BY content, source, scraped_at ASC
+                    WHERE llm_processed IS NOT TRUE
+                      AND (llm_claimed_at IS NULL
+                           OR llm_claimed_at < NOW() - %s * INTERVAL '1 minute')
+                      {keyset}
+                    ORDER BY scraped_at DESC, id DESC
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ), claimed AS (
+                    UPDATE raw_questions AS rq
+                    SET llm_claimed_at = NOW()
+                    FROM claimable
+                    WHERE rq.id = claimable.id
+                    RETURNING rq.id, rq.content, rq.source, rq.company, rq.question_type, rq.scraped_at
                 )
-            """)
-            removed = cursor.rowcount
+                SELECT * FROM claimed ORDER BY scraped_at DESC, id DESC
+            """, (lease_minutes, *(after or ()), n))
+            rows = [dict(r) for r in cursor.fetchall()]
+            cursor.close()
+            return rows
 
-            # Add unique constraint if not exists
-            cursor.execute("""
-                DO $$
-                BEGIN
-                    IF NOT EXISTS (
-                        SELECT 1 FROM pg_constraint
-                        WHERE conname = 'uq_raw_questions_content_source'
-                    ) THEN
-                        ALTER TABLE raw_questions
-                        ADD CONSTRAINT uq_raw_questions_content_source
-                        UNIQUE (content, source);
-                    END IF;
-                END $$;
-            """)
+    @staticmethod
+    def iter_llm_claims(batch_size: int = LLM_CLAIM_BATCH_SIZE) -> Iterator[Dict]:
+        """
+        Claim and yield unprocessed questions batch by batch until none are
+        left. Each claim commits before its rows are yielded; safe to run in
+        several workers at once.
+        """
+        after = None
+        while True:
+            batch = DatabaseManager.claim_llm_batch(batch_size, after)
+            if not batch:
+                return
+            yield from batch
+            last = batch[-1]
+            # A NULL scraped_at has no keyset position; the claims alone keep
+            # the next scan from returning rows twice
+            after = (last['scraped_at'], str(last['id'])) if last['scraped_at'] is not None else None
+
+    @staticmethod
+    def update_llm_results(results: List[Dict]) -> int:
+        """
+        Write LLM results with one set-based UPDATE ... FROM (VALUES ...).
 
+        Cheap enough to call once per LLM batch (see
+        LLMProcessor.process_questions(on_batch=...)).
+
+        Returns:
+            Number of rows updated
+        """
+        if not results:
+            return 0
+        rows = list({
+            str(r['id']): (str(r['id']), r['english_content'], list(r['llm_types'])) for r in results
+        }.values())
+        updated = 0
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            # One statement per page so rowcount covers the whole page
+            for i in range(0, len(rows), LLM_UPDATE_PAGE_SIZE):
+                execute_values(cursor, """
+                    UPDATE raw_questions AS rq
+                    SET english_content = v.english_content,
+                        llm_types = v.llm_types,
+                        llm_processed = TRUE
+                    FROM (VALUES %s) AS v(id, english_content, llm_types)
+                    WHERE rq.id = v.id
+                """, rows[i:i + LLM_UPDATE_PAGE_SIZE],
+                    template="(%s::uuid, %s, %s::text[])", page_size=LLM_UPDATE_PAGE_SIZE)
+                updated += cursor.rowcount
             cursor.close()
-            return removed
+        return updated
 
     @staticmethod
     def get_all_raw_questions() -> List[Dict]:
         """Get all raw questions for embedding processing"""
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        return list(DatabaseManager.iter_all_raw_questions())
 
-            query = """
+    @staticmethod
+    def iter_all_raw_questions(itersize: int = STREAM_ITERSIZE) -> Iterator[Dict]:
+        """Stream all raw questions, newest first"""
+        return stream_query(DATABASE_URL, """
             SELECT id, content, english_content, source, source_url,
                    company, question_type, llm_types, metadata, published_at
             FROM raw_questions
             ORDER BY scraped_at DESC
+        """, itersize=itersize)
+
+    @staticmethod
+    def get_unmapped_raw_questions() -> List[Dict]:
+        """Get raw questions not yet mapped to any merged question"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+            query = """
+            SELECT rq.id, rq.content, rq.english_content, rq.source, rq.source_url,
+                   rq.company, rq.question_type, rq.llm_types, rq.metadata, rq.published_at
+            FROM raw_questions rq
+            LEFT JOIN question_mappings qm ON rq.id = qm.raw_question_id
+            WHERE qm.raw_question_id IS NULL
+            ORDER BY rq.scraped_at DESC
             """
 
             cursor.execute(query)
@@ -375,6 +535,112 @@ class DatabaseManager:
 
             return [dict(q) for q in questions]
 
+    @staticmethod
+    def merge_question_attributes(merged_id: str, question_types: Optional[List[str]] = None,
+                                  first_seen_at=None):
+        """Fold newly attached raw questions into an existing merged question:
+        union question_types and keep the earliest first_seen_at"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            query = """
+            UPDATE merged_questions
+            SET
+                question_types = (
+                    SELECT ARRAY(
+                        SELECT DISTINCT t
+                        FROM unnest(COALESCE(question_types, '{}') || %s::TEXT[]) AS t
+                        ORDER BY t
+                    )
+                ),
+                question_type = COALESCE(question_type, %s),
+                first_seen_at = LEAST(first_seen_at, %s),
+                updated_at = NOW()
+            WHERE id = %s
+            """
+
+            types = question_types or []
+            cursor.execute(query, (types, types[0] if types else None,
+                                   first_seen_at, merged_id))
+            cursor.close()
+
+    @staticmethod
+    def get_raw_ids_without_embedding() -> set:
+        """IDs of raw questions whose embedding column is not populated"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM raw_questions WHERE embedding IS NULL")
+            ids = {str(row[0]) for row in cursor.fetchall()}
+            cursor.close()
+            return ids
+
+    @staticmethod
+    def get_merged_without_embedding() -> List[Dict]:
+        """Merged questions created before embeddings were stored"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("""
+                SELECT id, canonical_content, english_content
+                FROM merged_questions
+                WHERE embedding IS NULL
+            """)
+            questions = cursor.fetchall()
+            cursor.close()
+            return [dict(q) for q in questions]
+
+    @staticmethod
+    def _store_embeddings(table: str, rows: List[tuple]) -> int:
+        """Bulk-set the embedding column for (id, vector) pairs"""
+        if not rows:
+            return 0
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            execute_values(cursor, f"""
+                UPDATE {table} AS t
+                SET embedding = v.embedding::vector
+                FROM (VALUES %s) AS v(id, embedding)
+                WHERE t.id = v.id::uuid
+            """, [(str(row_id), to_vector_literal(vec)) for row_id, vec in rows],
+                page_size=500)
+            cursor.close()
+            return len(rows)
+
+    @staticmethod
+    def store_raw_embeddings(rows: List[tuple]) -> int:
+        """Store embeddings for raw questions from (raw_id, vector) pairs"""
+        return DatabaseManager._store_embeddings('raw_questions', rows)
+
+    @staticmethod
+    def store_merged_embeddings(rows: List[tuple]) -> int:
+        """Store embeddings for merged questions from (merged_id, vector) pairs"""
+        return DatabaseManager._store_embeddings('merged_questions', rows)
+
+    @staticmethod
+    def match_raw_to_merged(raw_ids: List[str], threshold: float) -> Dict[str, tuple]:
+        """
+        Find the nearest merged question for each raw question inside Postgres
+        (HNSW index on merged_questions.embedding).
+
+        Returns:
+            Dict raw_id -> (merged_id, similarity) for matches >= threshold
+        """
+        if not raw_ids:
+            return {}
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM match_raw_to_merged(%s::uuid[], %s)",
+                ([str(r) for r in raw_ids], threshold)
+            )
+            matches = {
+                str(raw_id): (str(merged_id), float(sim))
+                for raw_id, merged_id, sim in cursor.fetchall()
+            }
+            cursor.close()
+            return matches
+
     @staticmethod
     def clear_merged_data():
         """Clear all merged questions and mappings for a full rebuild"""
@@ -385,6 +651,281 @@ class DatabaseManager:
             cursor.execute("DELETE FROM merged_questions")
             cursor.close()
 
+    @staticmethod
+    def _merged_row(merged_id: str, g: Dict) -> tuple:
+        """Column values for a merged_questions row built from a group record"""
+        return (
+            merged_id, g['canonical_content'], g.get('question_type'),
+            g.get('question_types') or None, len(g['raw_ids']),
+            g.get('english_content'), g.get('first_seen_at'),
+            to_vector_literal(g['embedding']) if g.get('embedding') is not None else None,
+        )
+
+    @staticmethod
+    def _insert_merged_rows(cursor, rows: List[tuple]):
+        execute_values(cursor, """
+            INSERT INTO merged_questions
+                (id, canonical_content, question_type, question_types, frequency,
+                 english_content, first_seen_at, embedding)
+            VALUES %s
+        """, rows, template="(%s, %s, %s, %s, %s, %s, %s, %s::vector)", page_size=1000)
+
+    @staticmethod
+    def _upsert_mappings(cursor, rows: List[tuple]):
+        execute_values(cursor, """
+            INSERT INTO question_mappings (raw_question_id, merged_question_id, similarity_score)
+            VALUES %s
+            ON CONFLICT (raw_question_id, merged_question_id) DO UPDATE SET
+                similarity_score = EXCLUDED.similarity_score
+        """, rows, page_size=1000)
+
+    @staticmethod
+    def _insert_company_links(cursor, rows: List[tuple]):
+        execute_values(cursor, """
+            INSERT INTO question_companies (merged_question_id, company_id)
+            VALUES %s
+            ON CONFLICT DO NOTHING
+        """, rows, page_size=1000)
+
+    @staticmethod
+    def _write_merged_groups(cursor, groups: List[Dict],
+                             company_links: Optional[List[tuple]] = None) -> Dict:
+        """Insert merged rows, mappings and company links for `groups` (plus
+        extra (merged_id, company_name) `company_links`) on `cursor`"""
+        merged_ids = [str(uuid.uuid4()) for _ in groups]
+
+        merged_rows = []
+        mapping_rows = []
+        for merged_id, g in zip(merged_ids, groups):
+            merged_rows.append(DatabaseManager._merged_row(merged_id, g))
+            for raw_id in g['raw_ids']:
+                mapping_rows.append((str(raw_id), merged_id, g['similarity']))
+
+        if merged_rows:
+            DatabaseManager._insert_merged_rows(cursor, merged_rows)
+            DatabaseManager._upsert_mappings(cursor, mapping_rows)
+
+        links = [
+            (merged_id, company)
+            for merged_id, g in zip(merged_ids, groups)
+            for company in g.get('companies') or []
+        ] + list(company_links or [])
+        link_rows = []
+        if links:
+            company_ids = CompanyResolver().resolve(cursor, [name for _, name in links])
+            link_rows = list(dict.fromkeys((str(m), company_ids[name]) for m, name in links if name))
+            DatabaseManager._insert_company_links(cursor, link_rows)
+
+        return {
+            'merged_ids': merged_ids,
+            'mappings': len(mapping_rows),
+            'company_links': len(link_rows),
+        }
+
+    @staticmethod
+    def write_merged_groups(groups: List[Dict]) -> Dict:
+        """
+        Insert new merged questions for a grouping result in one transaction
+        with set-based inserts.
+
+        Args:
+            groups: One dict per merged question with keys 'canonical_content',
+                    'english_content', 'question_type', 'question_types',
+                    'first_seen_at', 'raw_ids', 'similarity', 'companies'
+                    and optionally 'embedding'
+
+        Returns:
+            Dict with 'merged_ids' (in input order), 'mappings', 'company_links'
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            written = DatabaseManager._write_merged_groups(cursor, groups)
+            cursor.close()
+        return written
+
+    @staticmethod
+    def write_incremental_merge(attachments: List[Dict], groups: List[Dict]) -> Dict:
+        """
+        Write an incremental merge in one transaction: raw questions attached
+        to existing merged questions, and new merged questions.
+
+        Attached mappings go in with one execute_values insert (whose
+        statement-level trigger recounts frequency once per merged question),
+        and one UPDATE ... FROM (VALUES ...) folds types and first_seen_at
+        into the existing merged rows.
+
+        Args:
+            attachments: One dict per existing merged question gaining raw
+                         questions, with keys 'merged_id', 'mappings'
+                         ([(raw_id, similarity)]), 'question_types',
+                         'first_seen_at', 'companies'
+            groups: New merged questions, as for write_merged_groups
+
+        Returns:
+            write_merged_groups counts, with 'mappings' and 'company_links'
+            covering the attachments too
+        """
+        mapping_rows = [
+            (str(raw_id), str(a['merged_id']), similarity)
+            for a in attachments for raw_id, similarity in a['mappings']
+        ]
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            if mapping_rows:
+                DatabaseManager._upsert_mappings(cursor, mapping_rows)
+                execute_values(cursor, """
+                    UPDATE merged_questions AS mq
+                    SET question_types = ARRAY(
+                            SELECT DISTINCT t
+                            FROM unnest(COALESCE(mq.question_types, '{}') || v.question_types) AS t
+                            ORDER BY t
+                        ),
+                        question_type = COALESCE(mq.question_type, v.question_types[1]),
+                        first_seen_at = LEAST(mq.first_seen_at, v.first_seen_at),
+                        updated_at = NOW()
+                    FROM (VALUES %s) AS v(id, question_types, first_seen_at)
+                    WHERE mq.id = v.id
+                """, [
+                    (str(a['merged_id']), list(a.get('question_types') or []), a.get('first_seen_at'))
+                    for a in attachments
+                ], template="(%s::uuid, %s::TEXT[], %s::TIMESTAMPTZ)", page_size=1000)
+
+            written = DatabaseManager._write_merged_groups(cursor, groups, [
+                (a['merged_id'], company) for a in attachments for company in a.get('companies') or []
+            ])
+            cursor.close()
+
+        written['mappings'] += len(mapping_rows)
+        return written
+
+    @staticmethod
+    def get_merged_state() -> Dict[str, Dict]:
+        """
+        Current merged output, for reconciling a rebuild against it.
+
+        Returns:
+            Dict merged_id -> {'canonical_content', 'english_content',
+            'question_type', 'question_types', 'frequency', 'first_seen_at',
+            'has_embedding', 'raw_ids': {raw_id: similarity}, 'companies': set}
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+            cursor.execute("""
+                SELECT id, canonical_content, english_content, question_type,
+                       question_types, frequency, first_seen_at,
+                       embedding IS NOT NULL AS has_embedding
+                FROM merged_questions
+            """)
+            state = {}
+            for row in cursor.fetchall():
+                row = dict(row)
+                merged_id = str(row.pop('id'))
+                row['raw_ids'] = {}
+                row['companies'] = set()
+                state[merged_id] = row
+
+            cursor.execute("""
+                SELECT raw_question_id, merged_question_id, similarity_score
+                FROM question_mappings
+            """)
+            for row in cursor.fetchall():
+                merged = state.get(str(row['merged_question_id']))
+                if merged is not None:
+                    merged['raw_ids'][str(row['raw_question_id'])] = row['similarity_score']
+
+            cursor.execute("""
+                SELECT qc.merged_question_id, c.name
+                FROM question_companies qc
+                JOIN companies c ON c.id = qc.company_id
+            """)
+            for row in cursor.fetchall():
+                merged = state.get(str(row['merged_question_id']))
+                if merged is not None:
+                    merged['companies'].add(row['name'])
+
+            cursor.close()
+            return state
+
+    @staticmethod
+    def apply_merged_diff(diff: Dict) -> Dict:
+        """
+        Apply a reconciliation diff (see processors.reconcile) in one transaction.
+
+        Returns:
+            Dict of row counts touched per operation
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+
+            company_ids = CompanyResolver().resolve(
+                cursor,
+                [name for _, name in diff['companies_add']] +
+                [name for _, name in diff['companies_remove']]
+            )
+
+            # Deleting merged rows cascades to their mappings and company links
+            if diff['delete']:
+                cursor.execute(
+                    "DELETE FROM merged_questions WHERE id = ANY(%s::uuid[])",
+                    (diff['delete'],)
+                )
+
+            execute_values(cursor, """
+                DELETE FROM question_mappings qm
+                USING (VALUES %s) AS v(raw_id, merged_id)
+                WHERE qm.raw_question_id = v.raw_id::uuid
+                  AND qm.merged_question_id = v.merged_id::uuid
+            """, diff['mappings_delete'], page_size=1000)
+
+            DatabaseManager._insert_merged_rows(cursor, [
+                DatabaseManager._merged_row(g['id'], g) for g in diff['insert']
+            ])
+
+            execute_values(cursor, """
+                UPDATE merged_questions AS mq
+                SET canonical_content = v.canonical_content,
+                    question_type = v.question_type,
+                    question_types = v.question_types,
+                    frequency = v.frequency,
+                    english_content = v.english_content,
+                    first_seen_at = v.first_seen_at,
+                    embedding = COALESCE(v.embedding, mq.embedding),
+                    updated_at = NOW()
+                FROM (VALUES %s) AS v(id, canonical_content, question_type, question_types,
+                                      frequency, english_content, first_seen_at, embedding)
+                WHERE mq.id = v.id
+            """, [DatabaseManager._merged_row(g['id'], g) for g in diff['update']],
+                template="(%s::uuid, %s, %s, %s::TEXT[], %s::INT, %s, %s::TIMESTAMPTZ, %s::vector)",
+                page_size=1000)
+
+            DatabaseManager._upsert_mappings(cursor, diff['mappings_upsert'])
+
+            execute_values(cursor, """
+                DELETE FROM question_companies qc
+                USING (VALUES %s) AS v(merged_id, company_id)
+                WHERE qc.merged_question_id = v.merged_id::uuid
+                  AND qc.company_id = v.company_id::uuid
+            """, [(m, company_ids[name]) for m, name in diff['companies_remove']],
+                page_size=1000)
+
+            DatabaseManager._insert_company_links(
+                cursor, [(m, company_ids[name]) for m, name in diff['companies_add']]
+            )
+
+            cursor.close()
+
+        return {
+            'inserted': len(diff['insert']),
+            'updated': len(diff['update']),
+            'deleted': len(diff['delete']),
+            'mappings_written': len(diff['mappings_upsert']),
+            'mappings_deleted': len(diff['mappings_delete']),
+            'company_links_added': len(diff['companies_add']),
+            'company_links_removed': len(diff['companies_remove']),
+        }
+
     @staticmethod
     def update_merged_frequency(merged_id: str, count: int):
         """Set frequency for a merged question directly"""
@@ -402,39 +943,31 @@ class DatabaseManager:
 
     @staticmethod
     def get_stats() -> Dict:
-        """Get database statistics"""
+        """Get database statistics (trigger-maintained counters, see database.stats)"""
         with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-            stats = {}
-
-            # Total questions
-            cursor.execute("SELECT COUNT(*) as count FROM raw_questions")
-            stats['raw_questions'] = cursor.fetchone()['count']
-
-            cursor.execute("SELECT COUNT(*) as count FROM merged_questions")
-            stats['merged_questions'] = cursor.fetchone()['count']
-
-            # By source
-            cursor.execute("""
-                SELECT source, COUNT(*) as count
-                FROM raw_questions
-                GROUP BY source
-            """)
-            stats['by_source'] = {row['source']: row['count'] for row in cursor.fetchall()}
+            cursor = conn.cursor()
+            counters = read_counters(cursor, [
+                'raw_questions', 'merged_questions', 'raw_questions.source', 'merged_questions.question_type',
+            ])
+            cursor.close()
 
-            # By type
-            cursor.execute("""
-                SELECT question_type, COUNT(*) as count
-                FROM merged_questions
-                WHERE question_type IS NOT NULL
-                GROUP BY question_type
-                ORDER BY count DESC
-            """)
-            stats['by_type'] = {row['question_type']: row['count'] for row in cursor.fetchall()}
+        return {
+            'raw_questions': counters['raw_questions'].get('', 0),
+            'merged_questions': counters['merged_questions'].get('', 0),
+            'by_source': counters['raw_questions.source'],
+            'by_type': dict(sorted(
+                counters['merged_questions.question_type'].items(), key=lambda kv: kv[1], reverse=True
+            )),
+        }
 
+    @staticmethod
+    def compact_counters() -> int:
+        """Fold table_counters shards (see database.stats); returns rows folded"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            folded = compact_counters(cursor)
             cursor.close()
-            return stats
+            return folded
 
     @staticmethod
     def get_existing_source_urls(source: str) -> set:
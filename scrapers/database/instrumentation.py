@@ -0,0 +1,192 @@
+"""
+Per-query timing for pooled database connections
+
+Pooled connections (database.pool) are opened with InstrumentedConnection,
+so every cursor they hand out - plain, RealDictCursor or named - times its
+execute() / executemany() / copy_expert() calls. Each call is recorded
+twice:
+
+    per method     the DatabaseManager / VideoDB / ... function that issued
+                   it (first caller frame outside psycopg2 and this package's
+                   plumbing)
+    per statement  the SQL with literals and VALUES lists folded away, so
+                   every page of an execute_values() batch counts as one
+                   statement
+
+For named (server-side) cursors only the DECLARE is timed, not the fetches.
+
+Statements slower than DB_SLOW_QUERY_MS are logged; with DB_EXPLAIN_SLOW=1
+their EXPLAIN plan is logged too. explain() returns a plan on demand.
+log_query_stats() writes the summary tables both pipelines end with.
+
+    DB_QUERY_STATS     record timings (default 1)
+    DB_SLOW_QUERY_MS   slow statement threshold in ms (default 1000, 0 = off)
+    DB_EXPLAIN_SLOW    EXPLAIN slow statements (default 0)
+"""
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, List
+
+from psycopg2 import extensions
+
+logger = logging.getLogger("DBQueries")
+
+QUERY_STATS = os.getenv('DB_QUERY_STATS', '1').lower() in ('1', 'true', 'yes')
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '1000'))
+EXPLAIN_SLOW = os.getenv('DB_EXPLAIN_SLOW', '').lower() in ('1', 'true', 'yes')
+
+# Caller frames in these files are plumbing, not the method to charge
+_PLUMBING = (
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pool.py'),
+    os.path.dirname(extensions.__file__),
+    os.path.dirname(os.__file__),  # stdlib (contextlib, ...)
+)
+_EXPLAINABLE = re.compile(r'^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b', re.IGNORECASE)
+
+_lock = threading.Lock()
+_by_method: Dict[str, List[float]] = {}  # name -> [calls, rows, seconds, max_seconds]
+_by_statement: Dict[str, List[float]] = {}
+
+
+def fingerprint(query) -> str:
+    """SQL with string/number literals replaced by ? and VALUES lists folded"""
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    query = re.sub(r"'(?:[^']|'')*'", '?', str(query))
+    query = re.sub(r'(?<![\w$])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b', '?', query)
+    query = re.sub(r'(\([^()]*\)(?:::\w+)?\s*,\s*)+\([^()]*\)(?:::\w+)?', '(...)', query)
+    return re.sub(r'\s+', ' ', query).strip()
+
+
+def _caller() -> str:
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_code.co_filename.startswith(_PLUMBING):
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _add(table: Dict[str, List[float]], key: str, rows: int, seconds: float):
+    entry = table.get(key)
+    if entry is None:
+        entry = table[key] = [0, 0, 0.0, 0.0]
+    entry[0] += 1
+    entry[1] += max(rows, 0)
+    entry[2] += seconds
+    entry[3] = max(entry[3], seconds)
+
+
+def record(method: str, statement: str, rows: int, seconds: float):
+    with _lock:
+        _add(_by_method, method, rows, seconds)
+        _add(_by_statement, statement, rows, seconds)
+
+
+def explain(cursor, query, params=None, analyze: bool = False) -> str:
+    """EXPLAIN plan text for `query` on `cursor`'s connection (ANALYZE runs it)"""
+    with cursor.connection.cursor(cursor_factory=extensions.cursor) as plan_cursor:
+        prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+        extensions.cursor.execute(plan_cursor, prefix + _text(query), params)
+        return '\n'.join(row[0] for row in plan_cursor.fetchall())
+
+
+def _text(query) -> str:
+    return query.decode('utf-8') if isinstance(query, bytes) else str(query)
+
+
+def _timed(cursor, method, query, params, call):
+    if not QUERY_STATS:
+        return call()
+    caller = _caller()
+    start = time.perf_counter()
+    result = call()
+    seconds = time.perf_counter() - start
+    statement = fingerprint(query)
+    record(caller, statement, cursor.rowcount, seconds)
+
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning(f"Slow query ({seconds * 1000:.0f}ms, {caller}): {statement[:300]}")
+        if EXPLAIN_SLOW and method == 'execute' and not cursor.name and _EXPLAINABLE.match(_text(query)):
+            try:
+                logger.warning("Plan:\n" + explain(cursor, query, params))
+            except Exception as e:
+                logger.warning(f"EXPLAIN failed: {str(e)}")
+    return result
+
+
+_cursor_classes: Dict[type, type] = {}
+
+
+def instrumented_cursor(base: type) -> type:
+    """Subclass of cursor class `base` whose calls are timed (cached per base)"""
+    cls = _cursor_classes.get(base)
+    if cls is not None:
+        return cls
+
+    class InstrumentedCursor(base):
+        def execute(self, query, vars=None):
+            return _timed(self, 'execute', query, vars,
+                          lambda: super(InstrumentedCursor, self).execute(query, vars))
+
+        def executemany(self, query, vars_list):
+            return _timed(self, 'executemany', query, None,
+                          lambda: super(InstrumentedCursor, self).executemany(query, vars_list))
+
+        def copy_expert(self, sql, file, size=8192):
+            return _timed(self, 'copy_expert', sql, None,
+                          lambda: super(InstrumentedCursor, self).copy_expert(sql, file, size))
+
+    InstrumentedCursor.__name__ = f"Instrumented{base.__name__}"
+    _cursor_classes[base] = InstrumentedCursor
+    return InstrumentedCursor
+
+
+class InstrumentedConnection(extensions.connection):
+    """psycopg2 connection whose cursors record query timings"""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get('cursor_factory') or self.cursor_factory or extensions.cursor
+        kwargs['cursor_factory'] = instrumented_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+
+def query_stats() -> Dict[str, Dict[str, Dict]]:
+    """{'methods': {name: stats}, 'statements': {sql: stats}}"""
+    def rows(table):
+        return {
+            key: {'calls': int(c), 'rows': int(r), 'seconds': s, 'max_seconds': m}
+            for key, (c, r, s, m) in table.items()
+        }
+    with _lock:
+        return {'methods': rows(_by_method), 'statements': rows(_by_statement)}
+
+
+def reset_query_stats():
+    with _lock:
+        _by_method.clear()
+        _by_statement.clear()
+
+
+def log_query_stats(log: logging.Logger = logger, top: int = 15):
+    """Log the `top` methods and statements by total time"""
+    stats = query_stats()
+    if not stats['methods']:
+        return
+    for title, table, width in (('method', stats['methods'], 48), ('statement', stats['statements'], 90)):
+        ranked = sorted(table.items(), key=lambda kv: -kv[1]['seconds'])[:top]
+        log.info(f"DB time by {title} (top {len(ranked)} of {len(table)}):")
+        log.info(f"  {'calls':>6} {'rows':>9} {'total s':>8} {'avg ms':>8} {'max ms':>8}  {title}")
+        for key, s in ranked:
+            label = key if len(key) <= width else key[:width - 3] + '...'
+            log.info(
+                f"  {s['calls']:>6} {s['rows']:>9} {s['seconds']:>8.2f} "
+                f"{1000 * s['seconds'] / s['calls']:>8.1f} {1000 * s['max_seconds']:>8.1f}  {label}"
+            )
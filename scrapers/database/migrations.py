@@ -0,0 +1,313 @@
+"""
+Versioned schema migrations
+
+Each migration runs once per database and is recorded in
+schema_migrations, so a nightly run only reads that table instead of
+re-checking every column and re-sorting raw_questions. Migrations apply in
+version order, each in its own transaction, under an advisory lock so two
+concurrent runs cannot apply the same one twice.
+
+Add a migration by appending to MIGRATIONS with the next version number;
+never edit or renumber one that has shipped.
+
+The embedding columns are the exception: their width follows
+configuration, so run_migrations() ends with
+DatabaseManager.ensure_embedding_columns() (questions, EMBEDDING_DIMENSIONS)
+and ensure_chunk_embedding_column() (transcript chunks,
+CHUNK_EMBEDDING_DIMENSIONS), catalog lookups that only run DDL when a
+width changed.
+
+Usage:
+    python -m database.migrations
+"""
+import logging
+import os
+from typing import Callable, List, Tuple, Union
+
+from config import CHUNK_EMBEDDING_DIMENSIONS, EMBEDDING_DIMENSIONS, EMBEDDING_REDUCTION
+from database.db import SCHEMA_DIR, DatabaseManager, get_db_connection
+from database.stats import ADMIN_STATS_TABLES, COUNTED_TABLES
+from processors.dim_reduction import FULL_DIMENSIONS
+
+logger = logging.getLogger("Migrations")
+
+MIGRATION_LOCK_ID = 727_001  # pg_advisory_xact_lock key
+
+
+def _schema_file(name: str) -> str:
+    with open(os.path.join(SCHEMA_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def _delete_duplicate_raw_questions(cursor, key: str) -> int:
+    """
+    Keep the earliest scraped raw question per `key` (a column list) and
+    delete the rest, without losing their merges: each deleted row's
+    question_mappings are first repointed to the row that survives, and
+    the frequency of every merged question involved is recounted, since
+    the ON DELETE CASCADE removes the old mappings behind the frequency
+    triggers' back. table_counters needs no fix-up: migration 7 seeds it
+    by counting, after every dedup migration.
+
+    Returns:
+        Number of raw questions deleted
+    """
+    cursor.execute(f"""
+        CREATE TEMP TABLE raw_duplicates ON COMMIT DROP AS
+        SELECT id, keep_id FROM (
+            SELECT id, first_value(id) OVER (
+                PARTITION BY {key} ORDER BY scraped_at ASC, id
+            ) AS keep_id
+            FROM raw_questions
+        ) ranked
+        WHERE id <> keep_id
+    """)
+    cursor.execute("""
+        INSERT INTO question_mappings (raw_question_id, merged_question_id, similarity_score)
+        SELECT d.keep_id, qm.merged_question_id, MAX(qm.similarity_score)
+        FROM raw_duplicates d
+        JOIN question_mappings qm ON qm.raw_question_id = d.id
+        GROUP BY d.keep_id, qm.merged_question_id
+        ON CONFLICT (raw_question_id, merged_question_id) DO NOTHING
+    """)
+    logger.info(f"Repointed {cursor.rowcount} question mappings to surviving raw questions")
+    cursor.execute("""
+        CREATE TEMP TABLE touched_merged ON COMMIT DROP AS
+        SELECT DISTINCT qm.merged_question_id AS id
+        FROM question_mappings qm
+        JOIN raw_duplicates d ON qm.raw_question_id IN (d.id, d.keep_id)
+    """)
+    cursor.execute("DELETE FROM raw_questions WHERE id IN (SELECT id FROM raw_duplicates)")
+    deleted = cursor.rowcount
+    cursor.execute("""
+        UPDATE merged_questions mq
+        SET frequency = (
+            SELECT COUNT(*) FROM question_mappings qm WHERE qm.merged_question_id = mq.id
+        )
+        WHERE mq.id IN (SELECT id FROM touched_merged)
+    """)
+    cursor.execute("DROP TABLE raw_duplicates, touched_merged")
+    return deleted
+
+
+def _dedupe_raw_questions(cursor):
+    """Keep the earliest scraped row per (content, source), then let the
+    unique constraint stop new duplicates"""
+    deleted = _delete_duplicate_raw_questions(cursor, "content, source")
+    logger.info(f"Removed {deleted} duplicate raw questions")
+    cursor.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint
+                WHERE conname = 'uq_raw_questions_content_source'
+            ) THEN
+                ALTER TABLE raw_questions
+                ADD CONSTRAINT uq_raw_questions_content_source
+                UNIQUE (content, source);
+            END IF;
+        END $$;
+    """)
+
+
+def _raw_questions_content_hash(cursor):
+    """Key raw questions on a 16-byte hash of the normalized content
+    instead of the full text"""
+    cursor.execute(r"""
+        -- Mirrors DataNormalizer.clean_question_content
+        CREATE OR REPLACE FUNCTION raw_question_hash(content TEXT) RETURNS UUID
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT md5(btrim(regexp_replace(
+                regexp_replace(content, '\s+', ' ', 'g'),
+                '^(Question|Q):\s*', '', 'i'
+            )))::uuid
+        $$;
+
+        ALTER TABLE raw_questions ADD COLUMN IF NOT EXISTS content_hash UUID
+            GENERATED ALWAYS AS (raw_question_hash(content)) STORED;
+    """)
+    # Rows equal only after normalization collide on the new key
+    deleted = _delete_duplicate_raw_questions(cursor, "content_hash, source")
+    logger.info(f"Removed {deleted} raw questions duplicated after normalization")
+    cursor.execute("""
+        ALTER TABLE raw_questions
+            ADD CONSTRAINT uq_raw_questions_content_hash_source UNIQUE (content_hash, source);
+        ALTER TABLE raw_questions DROP CONSTRAINT IF EXISTS uq_raw_questions_content_source;
+    """)
+
+
+def _table_exists(cursor, table: str) -> bool:
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (table,))
+    return cursor.fetchone()[0]
+
+
+def _table_counters(cursor):
+    """Trigger-maintained row counters and the admin stats view (see
+    database.stats); the AI Pulse tables may not exist in every database"""
+    cursor.execute(_schema_file('table_counters_schema.sql'))
+    for table, columns in COUNTED_TABLES:
+        if _table_exists(cursor, table):
+            cursor.execute("SELECT track_row_counts(%s::regclass, VARIADIC %s::TEXT[])",
+                           (table, list(columns)))
+        else:
+            logger.warning(f"{table} does not exist; once it does, run SELECT track_row_counts('{table}')")
+    if all(_table_exists(cursor, table) for table in ADMIN_STATS_TABLES):
+        cursor.execute(_schema_file('admin_stats_schema.sql'))
+    else:
+        logger.warning("AI Pulse tables missing; run database/admin_stats_schema.sql once they exist")
+
+
+def _shard_table_counters(cursor):
+    """Spread each counter over shards so concurrent writers stop queuing
+    on one row (see database/table_counters_schema.sql); existing counts
+    become shard 0"""
+    cursor.execute("""
+        ALTER TABLE table_counters ADD COLUMN IF NOT EXISTS shard SMALLINT NOT NULL DEFAULT 0;
+        ALTER TABLE table_counters DROP CONSTRAINT IF EXISTS table_counters_pkey;
+        ALTER TABLE table_counters ADD PRIMARY KEY (metric, key, shard);
+    """)
+    cursor.execute(_schema_file('table_counters_schema.sql'))
+
+
+def ensure_chunk_embedding_column(dimensions: int = CHUNK_EMBEDDING_DIMENSIONS or FULL_DIMENSIONS,
+                                  truncate_existing: bool = False) -> bool:
+    """Convert transcript_chunks.embedding to `dimensions` wide and install
+    the width-agnostic search functions (database/chunk_embedding_dims.sql).
+
+    Chunk vectors come from the API 'dimensions' parameter, so narrowing
+    cuts stored vectors to their first `dimensions` components and
+    re-normalizes them. Widening cannot be done in place: it deletes every
+    chunk, so it is refused unless truncate_existing is set
+    (chunk_and_embed.py --rebuild, which re-creates them).
+
+    Returns:
+        True if the schema was changed
+    """
+    dimensions = int(dimensions)
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT atttypmod FROM pg_attribute
+            WHERE attrelid = to_regclass('transcript_chunks')
+              AND attname = 'embedding' AND NOT attisdropped
+        """)
+        row = cursor.fetchone()
+        if row is None or row[0] == dimensions:
+            cursor.close()
+            return False
+
+        width = row[0]
+        if width < dimensions and not truncate_existing:
+            cursor.close()
+            raise ValueError(
+                f"transcript_chunks.embedding is vector({width}) but CHUNK_EMBEDDING_DIMENSIONS "
+                f"gives {dimensions}; widening deletes all chunks. Run python chunk_and_embed.py "
+                f"--rebuild to delete and re-embed them, or set CHUNK_EMBEDDING_DIMENSIONS={width}"
+            )
+        logger.info(f"Converting transcript_chunks.embedding from vector({width}) to vector({dimensions})")
+        cursor.execute("DROP INDEX IF EXISTS idx_transcript_chunks_embedding")
+        if width > dimensions:
+            using = f"l2_normalize(subvector(embedding, 1, {dimensions}))::vector({dimensions})"
+        else:
+            cursor.execute("DELETE FROM transcript_chunks")
+            logger.warning(f"Deleted {cursor.rowcount} transcript chunks to widen the column")
+            using = f"embedding::vector({dimensions})"
+        cursor.execute(
+            f"ALTER TABLE transcript_chunks ALTER COLUMN embedding TYPE vector({dimensions}) USING {using}"
+        )
+        cursor.execute(_schema_file('chunk_embedding_dims.sql'))
+        cursor.close()
+        return True
+
+
+# (version, name, SQL text or callable(cursor))
+MIGRATIONS: List[Tuple[int, str, Union[str, Callable]]] = [
+    (1, 'llm_columns', """
+        ALTER TABLE raw_questions ADD COLUMN IF NOT EXISTS english_content TEXT;
+        ALTER TABLE raw_questions ADD COLUMN IF NOT EXISTS llm_types TEXT[];
+        ALTER TABLE raw_questions ADD COLUMN IF NOT EXISTS llm_processed BOOLEAN DEFAULT FALSE;
+        ALTER TABLE merged_questions ADD COLUMN IF NOT EXISTS question_types TEXT[];
+        ALTER TABLE merged_questions ADD COLUMN IF NOT EXISTS english_content TEXT;
+        ALTER TABLE merged_questions ADD COLUMN IF NOT EXISTS first_seen_at TIMESTAMPTZ;
+    """),
+    (2, 'raw_questions_unique_content_source', _dedupe_raw_questions),
+    (3, 'embedding_cache', lambda cursor: cursor.execute(_schema_file('embedding_cache_schema.sql'))),
+    (4, 'similarity_verdicts', lambda cursor: cursor.execute(_schema_file('similarity_verdicts_schema.sql'))),
+    (5, 'raw_questions_content_hash', _raw_questions_content_hash),
+    # Work queue for LLM workers (DatabaseManager.claim_llm_batch): the
+    # partial index holds only rows still waiting, in claim order
+    (6, 'llm_claims', """
+        ALTER TABLE raw_questions ADD COLUMN IF NOT EXISTS llm_claimed_at TIMESTAMPTZ;
+        CREATE INDEX IF NOT EXISTS idx_raw_questions_llm_pending
+            ON raw_questions (scraped_at DESC, id DESC)
+            WHERE llm_processed IS NOT TRUE;
+    """),
+    (7, 'table_counters', _table_counters),
+    (8, 'merged_frequency_statement_triggers',
+     lambda cursor: cursor.execute(_schema_file('merged_frequency_schema.sql'))),
+    # Raw embeddings are only query vectors for match_raw_to_merged
+    (9, 'drop_raw_questions_embedding_index', """
+        DROP INDEX IF EXISTS idx_raw_questions_embedding;
+    """),
+    (10, 'shard_table_counters', _shard_table_counters),
+]
+
+
+def applied_versions(cursor) -> set:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def run_migrations(embedding_dimensions: int = EMBEDDING_DIMENSIONS or FULL_DIMENSIONS,
+                   truncate_existing: bool = EMBEDDING_REDUCTION == 'api') -> List[str]:
+    """
+    Apply pending migrations, then match the embedding column width.
+
+    Returns:
+        Names of the migrations applied by this call
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        pending = [m for m in MIGRATIONS if m[0] not in applied_versions(cursor)]
+        cursor.close()
+
+    applied = []
+    for version, name, migration in sorted(pending):
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            # Another run may have applied it while we waited for the lock
+            cursor.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+            if cursor.fetchone() is None:
+                logger.info(f"Applying migration {version}: {name}")
+                if callable(migration):
+                    migration(cursor)
+                else:
+                    cursor.execute(migration)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                applied.append(name)
+            cursor.close()
+
+    DatabaseManager.ensure_embedding_columns(embedding_dimensions, truncate_existing)
+    try:
+        ensure_chunk_embedding_column()
+    except ValueError as e:
+        # Widening deletes chunks; left to chunk_and_embed.py --rebuild
+        logger.error(str(e))
+    return applied
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(message)s')
+    names = run_migrations()
+    print(f"Applied {len(names)} migrations: {', '.join(names)}" if names else "Schema up to date")
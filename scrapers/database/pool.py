@@ -0,0 +1,280 @@
+"""
+Process-wide PostgreSQL connection pool
+
+get_db_connection() (scrapers) and get_conn() (youtube) used to open a new
+connection for every call - a TCP + TLS + auth round trip per query on a
+hosted database. Both now check connections out of one thread-safe pool
+per DSN instead.
+
+    - Callers block (up to DB_POOL_TIMEOUT seconds) when all DB_POOL_MAX
+      connections are in use, instead of failing
+    - A connection idle for more than DB_POOL_HEALTH_CHECK_AFTER seconds is
+      checked with SELECT 1 before it is handed out; broken connections are
+      discarded and replaced
+    - Checkouts, waits and wait time are counted; pool_stats() returns them
+
+Settings come from the environment, so the youtube package (which has its
+own config module) shares them:
+
+    DB_POOL_MIN                 connections opened up front (default 1)
+    DB_POOL_MAX                 connection cap (default 10)
+    DB_POOL_TIMEOUT             max seconds to wait for a connection (default 30)
+    DB_POOL_HEALTH_CHECK_AFTER  idle seconds before a ping (default 30, -1 = never)
+    DB_STREAM_ITERSIZE          rows per round trip for stream_query() (default 500)
+"""
+import logging
+import os
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError
+
+from database.instrumentation import InstrumentedConnection
+
+logger = logging.getLogger("DBPool")
+
+POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+HEALTH_CHECK_AFTER = float(os.getenv('DB_POOL_HEALTH_CHECK_AFTER', '30'))
+STREAM_ITERSIZE = int(os.getenv('DB_STREAM_ITERSIZE', '500'))
+
+
+class PoolTimeout(PoolError):
+    """No connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of psycopg2 connections to one DSN"""
+
+    def __init__(self, dsn: str, min_size: int = POOL_MIN, max_size: int = POOL_MAX,
+                 timeout: float = POOL_TIMEOUT, health_check_after: float = HEALTH_CHECK_AFTER):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_after = health_check_after
+
+        self._idle = deque()  # (connection, returned_at), most recent last
+        self._size = 0  # open connections, idle or checked out
+        self._cond = threading.Condition()
+        self._closed = False
+        self._metrics = {
+            'checkouts': 0, 'connects': 0, 'waits': 0, 'timeouts': 0,
+            'wait_seconds': 0.0, 'max_wait_seconds': 0.0,
+            'health_checks': 0, 'discarded': 0,
+        }
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, connection_factory=InstrumentedConnection)
+        with self._cond:
+            self._metrics['connects'] += 1
+        return conn
+
+    def _healthy(self, conn, idle_for: float) -> bool:
+        if conn.closed:
+            return False
+        if self.health_check_after < 0 or idle_for < self.health_check_after:
+            return True
+        with self._cond:
+            self._metrics['health_checks'] += 1
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._metrics['discarded'] += 1
+            self._cond.notify()
+
+    def getconn(self):
+        """Check out a connection, waiting for one if the pool is at its cap"""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolError("connection pool is closed")
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        create = False
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        conn, returned_at, create = None, None, True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics['timeouts'] += 1
+                        raise PoolTimeout(
+                            f"no database connection free after {self.timeout:g}s "
+                            f"({self.max_size} in use)"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._healthy(conn, time.monotonic() - returned_at):
+                logger.warning("Discarding broken pooled connection")
+                self._discard(conn)
+                continue
+
+            wait = time.monotonic() - start
+            with self._cond:
+                self._metrics['checkouts'] += 1
+                self._metrics['wait_seconds'] += wait
+                self._metrics['max_wait_seconds'] = max(self._metrics['max_wait_seconds'], wait)
+                if waited:
+                    self._metrics['waits'] += 1
+            return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Return a connection; broken or discarded ones are closed instead"""
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed or self._closed:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Checked-out connection; commit on success, rollback on error"""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            stats = dict(self._metrics)
+            stats.update(size=self._size, idle=len(self._idle),
+                         in_use=self._size - len(self._idle), max_size=self.max_size)
+        stats['avg_wait_ms'] = (
+            1000 * stats['wait_seconds'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        )
+        return stats
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(dsn: str) -> ConnectionPool:
+    """The shared pool for `dsn`, created on first use"""
+    global _pools_pid
+    with _pools_lock:
+        # Connections must not cross a fork: a child process starts fresh
+        if os.getpid() != _pools_pid:
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(dsn)
+        if pool is None:
+            pool = _pools[dsn] = ConnectionPool(dsn)
+        return pool
+
+
+_cursor_ids = itertools.count()
+
+
+def stream_query(dsn: str, query: str, params=None,
+                 itersize: int = STREAM_ITERSIZE) -> Iterator[Dict]:
+    """
+    Yield rows of `query` as dicts through a named (server-side) cursor,
+    `itersize` rows per round trip, so the result set is never held in
+    memory at once.
+
+    The pooled connection stays checked out until the generator is
+    exhausted or closed; writes made while consuming it go through other
+    pool connections.
+    """
+    with get_pool(dsn).connection() as conn:
+        with conn.cursor(name=f"stream_{next(_cursor_ids)}", cursor_factory=RealDictCursor) as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            for row in cur:
+                yield dict(row)
+
+
+def pool_stats(dsn: Optional[str] = None) -> Dict:
+    """Stats of one pool, or of every pool keyed by index if `dsn` is None"""
+    with _pools_lock:
+        pools = dict(_pools)
+    if dsn is not None:
+        return pools[dsn].stats() if dsn in pools else {}
+    return {i: pool.stats() for i, pool in enumerate(pools.values())}
+
+
+def log_pool_stats(log: logging.Logger = logger):
+    """One line per pool: checkouts, new connections and wait time"""
+    for i, stats in pool_stats().items():
+        log.info(
+            f"DB pool {i}: {stats['checkouts']} checkouts over {stats['connects']} connections "
+            f"(max {stats['max_size']}), {stats['waits']} waited, "
+            f"avg wait {stats['avg_wait_ms']:.1f}ms, max {1000 * stats['max_wait_seconds']:.1f}ms, "
+            f"{stats['discarded']} discarded"
+        )
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.closeall()
@@ -0,0 +1,85 @@
+"""
+Precomputed pipeline statistics
+
+Row counts live in table_counters, which triggers keep current on every
+write (database/table_counters_schema.sql, installed by migration 7). The
+end-of-run summaries read a few rows from it instead of COUNT(*) /
+GROUP BY scans over raw_questions, merged_questions and the YouTube
+tables.
+
+Each count is split over shards (migration 10) so concurrent writers do not
+all update one row; readers sum the shards, and compact_counters() folds
+them back into one row per count at the end of a pipeline run.
+
+The admin page's per-channel breakdown is the admin_channel_stats
+materialized view (database/admin_stats_schema.sql). refresh_admin_stats()
+recomputes it after a pipeline run.
+
+    metric                          key             value (summed over shards)
+    raw_questions                   ''              total rows
+    raw_questions.source            'nowcoder'      rows with that source
+    merged_questions.question_type  'Product Sense' rows with that type
+"""
+import logging
+from typing import Dict, Iterable, List
+
+logger = logging.getLogger("DBStats")
+
+# (table, grouping columns) counted by migration 7
+COUNTED_TABLES = [
+    ('raw_questions', ('source',)),
+    ('merged_questions', ('question_type',)),
+    ('youtube_videos', ()),
+    ('video_transcripts', ()),
+    ('video_insights', ()),
+    ('video_summaries', ()),
+    ('sample_answers', ()),
+]
+# Sources of admin_channel_stats
+ADMIN_STATS_TABLES = ('youtube_videos', 'video_transcripts', 'video_summaries')
+
+
+def group_counters(rows: Iterable[tuple], metrics: List[str]) -> Dict[str, Dict[str, int]]:
+    """{metric: {key: value}} from (metric, key, value) rows; empty groups are dropped"""
+    counters = {metric: {} for metric in metrics}
+    for metric, key, value in rows:
+        if value or not key:
+            counters[metric][key] = int(value)
+    return counters
+
+
+def read_counters(cursor, metrics: Iterable[str]) -> Dict[str, Dict[str, int]]:
+    """Counters for `metrics` in one indexed read ('' key = table total)"""
+    metrics = list(metrics)
+    cursor.execute("""
+        SELECT metric, key, SUM(value)::BIGINT FROM table_counters
+        WHERE metric = ANY(%s)
+        GROUP BY metric, key
+    """, (metrics,))
+    return group_counters(cursor.fetchall(), metrics)
+
+
+def table_totals(cursor, tables: Iterable[str]) -> Dict[str, int]:
+    """Row count per table; tables without counters (migrations not run
+    yet) fall back to COUNT(*)"""
+    tables = list(tables)
+    cursor.execute("SELECT to_regclass('table_counters') IS NOT NULL")
+    counters = read_counters(cursor, tables) if cursor.fetchone()[0] else {t: {} for t in tables}
+    totals = {table: counts.get('') for table, counts in counters.items()}
+    for table, total in totals.items():
+        if total is None:
+            logger.warning(f"No row counter for {table}; counting (run python -m database.migrations)")
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            totals[table] = cursor.fetchone()[0]
+    return totals
+
+
+def compact_counters(cursor) -> int:
+    """Fold counter shards into one row per count; returns shard rows folded"""
+    cursor.execute("SELECT compact_table_counters()")
+    return cursor.fetchone()[0]
+
+
+def refresh_admin_stats(cursor):
+    """Recompute admin_channel_stats without blocking readers"""
+    cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY admin_channel_stats")
@@ -0,0 +1,234 @@
+"""
+Quality and speed benchmark for the merge-step deduplication.
+
+Runs EmbeddingProcessor grouping over a labeled set of duplicate and
+non-duplicate question pairs (data/dedup_benchmark_pairs.csv). Most of its
+texts come from data/lewis_lin_questions.csv; a few are hand-written
+paraphrases that are not in that CSV. The set is optionally padded with
+unlabeled distractor questions from the CSV so groups form in realistic
+company. A labeled pair counts as "merged" when both questions land in the
+same group.
+
+Grouping goes through EmbeddingProcessor.group_indices, the same path as
+the merge step, so near-duplicate collapse and (for 'type-blocks') type
+blocking are part of what is measured. Question types come from the CSV's
+question_type column; texts not in the CSV are untyped and are compared
+within every type block.
+
+For every grouping backend and threshold it reports precision, recall and
+F1 over the labeled pairs, candidate pairs/sec of the grouping step and
+its peak traced memory. Embeddings are kept in an on-disk snapshot, so only
+the first run (or new text) calls the embedding API.
+
+Usage:
+    python dedup_benchmark.py
+    python dedup_benchmark.py --thresholds 0.75,0.8,0.85 --distractors 0
+    python dedup_benchmark.py --min-f1 0.8 --output results.json
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from processors.embeddings import EmbeddingProcessor, SIMILARITY_THRESHOLD
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+PAIRS_PATH = os.path.join(DATA_DIR, 'dedup_benchmark_pairs.csv')
+CORPUS_PATH = os.path.join(DATA_DIR, 'lewis_lin_questions.csv')
+SNAPSHOT_PATH = os.path.join(DATA_DIR, 'dedup_benchmark_embeddings')
+
+THRESHOLDS = (0.75, 0.80, 0.85, 0.90)
+
+# Grouping configurations, as EmbeddingProcessor keyword arguments
+BACKENDS = {
+    'greedy': {},
+    'greedy+ivf': {'ann_backend': 'ivf'},
+    'greedy+hnsw': {'ann_backend': 'hnsw'},
+    'components': {'clustering': 'components'},
+    'components+guard': {'clustering': 'components', 'centroid_threshold': 0.85},
+    'kmeans-blocks': {'blocking': 'kmeans'},
+    'type-blocks': {'blocking': 'types'},
+}
+
+
+def load_pairs(path: str) -> List[Tuple[str, str, bool]]:
+    """Labeled pairs as (question_a, question_b, is_duplicate)"""
+    with open(path, encoding='utf-8') as f:
+        return [
+            (row['question_a'].strip(), row['question_b'].strip(), row['is_duplicate'] == '1')
+            for row in csv.DictReader(f)
+        ]
+
+
+def load_distractors(path: str, limit: int, exclude: set) -> List[str]:
+    """First `limit` distinct questions from the corpus that aren't labeled"""
+    texts = []
+    seen = set(exclude)
+    with open(path, encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if len(texts) >= limit:
+                break
+            text = (row.get('question') or '').strip()
+            if text and text not in seen:
+                seen.add(text)
+                texts.append(text)
+    return texts
+
+
+def load_types(path: str) -> Dict[str, List[str]]:
+    """question text -> [question_type] from the corpus CSV"""
+    types = {}
+    with open(path, encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            text = (row.get('question') or '').strip()
+            question_type = (row.get('question_type') or '').strip()
+            if text and question_type:
+                types.setdefault(text, [question_type])
+    return types
+
+
+def score_pairs(groups: List[List[int]], index_of: Dict[str, int],
+                pairs: List[Tuple[str, str, bool]]) -> Dict:
+    """Precision / recall / F1 of "same group" against the pair labels"""
+    group_of = {}
+    for g, members in enumerate(groups):
+        for i in members:
+            group_of[i] = g
+
+    tp = fp = fn = 0
+    for a, b, is_duplicate in pairs:
+        merged = group_of[index_of[a]] == group_of[index_of[b]]
+        if merged and is_duplicate:
+            tp += 1
+        elif merged:
+            fp += 1
+        elif is_duplicate:
+            fn += 1
+
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': precision, 'recall': recall, 'f1': f1, 'tp': tp, 'fp': fp, 'fn': fn}
+
+
+def run_config(questions: List[Dict], matrix: np.ndarray, threshold: float, params: Dict,
+               repeat: int) -> Tuple[List[List[int]], Dict]:
+    """Group `questions` (rows of `matrix`) with one configuration;
+    best-of-`repeat` time, then one traced run for peak memory (tracing
+    slows the Python loops down)"""
+    processor = EmbeddingProcessor(threshold=threshold, use_cache=False, **params)
+
+    best = float('inf')
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        groups = processor.group_indices(questions, matrix)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    processor.group_indices(questions, matrix)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n = matrix.shape[0]
+    candidate_pairs = n * (n - 1) // 2
+    return groups, {
+        'groups': len(groups),
+        'seconds': best,
+        'pairs_per_sec': candidate_pairs / best if best > 0 else float('inf'),
+        'peak_mb': peak / (1024 * 1024),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dedup quality/speed benchmark")
+    parser.add_argument("--pairs", default=PAIRS_PATH, help="Labeled pairs CSV")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="CSV with distractor questions")
+    parser.add_argument("--distractors", type=int, default=2000,
+                        help="Unlabeled corpus questions mixed in (0 = labeled pairs only)")
+    parser.add_argument("--thresholds", default=",".join(str(t) for t in THRESHOLDS))
+    parser.add_argument("--backends", default=",".join(BACKENDS),
+                        help=f"Comma-separated subset of: {', '.join(BACKENDS)}")
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="On-disk embedding snapshot path")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing runs per config (best is kept)")
+    parser.add_argument("--min-f1", type=float, default=0.0,
+                        help=f"Exit 1 if any config scores below this F1 at threshold {SIMILARITY_THRESHOLD}")
+    parser.add_argument("--output", default="", help="Also write results as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(message)s')
+
+    pairs = load_pairs(args.pairs)
+    labeled = list(dict.fromkeys(text for a, b, _ in pairs for text in (a, b)))
+    texts = labeled + load_distractors(args.corpus, args.distractors, set(labeled))
+    index_of = {text: i for i, text in enumerate(texts)}
+    types = load_types(args.corpus)
+    questions = [
+        {'id': str(i), 'content': text, 'llm_types': types.get(text, [])}
+        for i, text in enumerate(texts)
+    ]
+
+    duplicates = sum(1 for _, _, d in pairs if d)
+    print(f"{len(pairs)} labeled pairs ({duplicates} duplicates), "
+          f"{len(texts)} questions ({len(texts) - len(labeled)} distractors)")
+
+    embedder = EmbeddingProcessor(use_cache=False, snapshot_path=args.snapshot)
+    matrix = embedder.embed_questions(questions)
+    embedder.save_snapshot(questions, matrix)
+
+    thresholds = [float(t) for t in args.thresholds.split(',') if t]
+    backends = {}
+    for name in args.backends.split(','):
+        if name not in BACKENDS:
+            parser.error(f"Unknown backend '{name}'")
+        if BACKENDS[name].get('ann_backend') == 'hnsw':
+            try:
+                import hnswlib  # noqa: F401
+            except ImportError:
+                print(f"Skipping {name}: hnswlib not installed")
+                continue
+        backends[name] = BACKENDS[name]
+
+    results = []
+    for name, params in backends.items():
+        for threshold in thresholds:
+            groups, perf = run_config(questions, matrix, threshold, params, args.repeat)
+            results.append(dict(
+                backend=name, threshold=threshold,
+                **score_pairs(groups, index_of, pairs), **perf
+            ))
+
+    print(f"\n{'='*96}")
+    print(f"DEDUP BENCHMARK (n={matrix.shape[0]})")
+    print(f"{'='*96}")
+    print(f"{'backend':<18} {'thresh':>6} {'prec':>6} {'recall':>6} {'f1':>6} "
+          f"{'fp':>4} {'fn':>4} {'groups':>7} {'pairs/s':>12} {'peak MB':>8}")
+    for row in results:
+        print(f"{row['backend']:<18} {row['threshold']:>6.2f} {row['precision']:>6.3f} "
+              f"{row['recall']:>6.3f} {row['f1']:>6.3f} {row['fp']:>4} {row['fn']:>4} "
+              f"{row['groups']:>7} {row['pairs_per_sec']:>12,.0f} {row['peak_mb']:>8.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'n': int(matrix.shape[0]), 'pairs': len(pairs), 'results': results}, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.min_f1:
+        failing = [
+            row for row in results
+            if abs(row['threshold'] - SIMILARITY_THRESHOLD) < 1e-9 and row['f1'] < args.min_f1
+        ]
+        for row in failing:
+            print(f"FAIL: {row['backend']} F1 {row['f1']:.3f} < {args.min_f1} at threshold {row['threshold']}")
+        if failing:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
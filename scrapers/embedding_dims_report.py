@@ -0,0 +1,128 @@
+"""
+Quality report for reduced-width question embeddings.
+
+Embeds a corpus once at full width (1536), then derives each reduced
+variant locally - 'api' by truncating and re-normalizing (what the API
+returns for `dimensions=N`), 'pca' by projecting onto a PCA basis fitted on
+the same corpus - and compares it with full width:
+
+    nn recall@k   overlap of each question's top-k neighbours
+    edge recall   share of full-width pairs >= threshold still found
+    edge prec.    share of reduced-width pairs >= threshold that are real
+    pair F1       dedup F1 on the labeled pairs (benchmark corpus only)
+    bytes         float32 bytes per vector
+
+Corpus: the dedup benchmark (labeled pairs + distractors, embeddings kept in
+its on-disk snapshot), or all raw questions with --db.
+
+Usage:
+    python embedding_dims_report.py
+    python embedding_dims_report.py --dims 256,512 --threshold 0.8
+    python embedding_dims_report.py --db --fit-pca 512 --pca-out data/pca512
+"""
+import argparse
+import logging
+
+import numpy as np
+
+from dedup_benchmark import (
+    PAIRS_PATH, CORPUS_PATH, SNAPSHOT_PATH, load_pairs, load_distractors, score_pairs,
+)
+from processors.ann import ExactIndex
+from processors.dim_reduction import FULL_DIMENSIONS, PCAProjection, truncate
+from processors.embeddings import EmbeddingProcessor, EMBEDDING_MODEL, SIMILARITY_THRESHOLD
+from processors.grouping import greedy_groups, normalize_rows, threshold_edges
+
+DIMS = (256, 512, 1024)
+NN_K = 10
+
+
+def top_k_sets(matrix: np.ndarray, k: int):
+    rows, cols, _ = ExactIndex().build(matrix).neighbors(k, threshold=-1.0)
+    neighbours = [set() for _ in range(matrix.shape[0])]
+    for r, c in zip(rows.tolist(), cols.tolist()):
+        neighbours[r].add(c)
+    return neighbours
+
+
+def edge_set(matrix: np.ndarray, threshold: float) -> set:
+    rows, cols, _ = threshold_edges(matrix, threshold)
+    return set(zip(rows.tolist(), cols.tolist()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reduced embedding dimension quality report")
+    parser.add_argument("--dims", default=",".join(str(d) for d in DIMS))
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--k", type=int, default=NN_K, help="Neighbours compared per question")
+    parser.add_argument("--db", action="store_true", help="Use all raw questions instead of the benchmark corpus")
+    parser.add_argument("--distractors", type=int, default=2000)
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="On-disk embedding snapshot (benchmark corpus)")
+    parser.add_argument("--fit-pca", type=int, default=0, metavar="DIMS",
+                        help="Also fit a PCA basis of this width on the corpus and save it")
+    parser.add_argument("--pca-out", default="", help="Where --fit-pca saves the basis (.npz)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(message)s')
+
+    pairs, index_of = [], {}
+    full_embedder = EmbeddingProcessor(dimensions=0, use_cache=args.db,
+                                       snapshot_path='' if args.db else args.snapshot)
+    if args.db:
+        from database.db import DatabaseManager
+        questions = DatabaseManager.get_all_raw_questions()
+    else:
+        pairs = load_pairs(PAIRS_PATH)
+        labeled = list(dict.fromkeys(text for a, b, _ in pairs for text in (a, b)))
+        texts = labeled + load_distractors(CORPUS_PATH, args.distractors, set(labeled))
+        index_of = {text: i for i, text in enumerate(texts)}
+        questions = [{'id': str(i), 'content': text} for i, text in enumerate(texts)]
+
+    print(f"Embedding {len(questions)} questions at full width...")
+    full = full_embedder.embed_questions(questions)
+    if not args.db:
+        full_embedder.save_snapshot(questions, full)
+
+    if args.fit_pca:
+        if not args.pca_out:
+            parser.error("--fit-pca needs --pca-out")
+        PCAProjection.fit(full, args.fit_pca, model=EMBEDDING_MODEL).save(args.pca_out)
+        print(f"Saved {args.fit_pca}-dim PCA basis to {args.pca_out} "
+              f"(use EMBEDDING_REDUCTION=pca EMBEDDING_PCA_PATH={args.pca_out})")
+
+    full_neighbours = top_k_sets(full, args.k)
+    full_edges = edge_set(full, args.threshold)
+
+    variants = {f'full {FULL_DIMENSIONS}': full}
+    for dims in (int(d) for d in args.dims.split(',') if d):
+        variants[f'api {dims}'] = truncate(full, dims)
+        variants[f'pca {dims}'] = normalize_rows(
+            PCAProjection.fit(full, dims, model=EMBEDDING_MODEL).transform(full), copy=False
+        )
+
+    print(f"\n{'='*84}")
+    print(f"EMBEDDING DIMENSION REPORT (n={full.shape[0]}, threshold={args.threshold}, k={args.k})")
+    print(f"{'='*84}")
+    print(f"{'variant':<12} {'nn recall':>10} {'edges':>8} {'edge rec':>9} {'edge prec':>10} "
+          f"{'pair F1':>8} {'bytes':>7}")
+    for label, matrix in variants.items():
+        neighbours = full_neighbours if matrix is full else top_k_sets(matrix, args.k)
+        nn_recall = np.mean([
+            len(a & b) / len(a) if a else 1.0 for a, b in zip(full_neighbours, neighbours)
+        ])
+        edges = full_edges if matrix is full else edge_set(matrix, args.threshold)
+        found = len(edges & full_edges)
+        edge_recall = found / len(full_edges) if full_edges else 1.0
+        edge_precision = found / len(edges) if edges else 1.0
+
+        pair_f1 = ''
+        if pairs:
+            groups = greedy_groups(matrix, args.threshold)
+            pair_f1 = f"{score_pairs(groups, index_of, pairs)['f1']:.3f}"
+
+        print(f"{label:<12} {nn_recall:>10.4f} {len(edges):>8} {edge_recall:>9.4f} "
+              f"{edge_precision:>10.4f} {pair_f1:>8} {matrix.shape[1] * 4:>7}")
+
+
+if __name__ == "__main__":
+    main()
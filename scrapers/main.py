@@ -5,15 +5,23 @@ Simplified version: Scrape and store raw questions
 GPT similarity detection will be added later
 """
 import sys
+import argparse
 import logging
 from datetime import datetime
 from typing import List, Dict
 
-from config import SCRAPE_DAYS_BACK, SOURCES, OPENAI_API_KEY
+from config import (
+    SCRAPE_DAYS_BACK, SOURCES, OPENAI_API_KEY, EMBEDDING_CACHE_MAX_AGE_DAYS,
+    EMBEDDING_DIMENSIONS, EMBEDDING_REDUCTION, LLM_CLAIM_BATCH_SIZE,
+)
 from database.db import DatabaseManager
+from database.migrations import run_migrations
+from database.instrumentation import log_query_stats
+from database.pool import log_pool_stats
 from processors.normalizer import DataNormalizer
 from processors.llm_processor import LLMProcessor
 from processors.embeddings import EmbeddingProcessor
+from processors.dim_reduction import FULL_DIMENSIONS
 from scrapers import PMExercisesScraper, NowcoderScraper, StellarPeersScraper
 
 # Setup logging
@@ -52,7 +60,7 @@ class DailyInterviewScraper:
 
         return scrapers
 
-    def run(self, days_back: int = SCRAPE_DAYS_BACK):
+    def run(self, days_back: int = SCRAPE_DAYS_BACK, rebuild: bool = False):
         """
         Run the complete scraping pipeline
 
@@ -60,7 +68,10 @@ class DailyInterviewScraper:
         1. Scrape from all sources
         2. Normalize and clean data
         3. Store in raw_questions table
-        4. (GPT similarity detection - TO BE ADDED LATER)
+        4. LLM translation + classification
+        5. Embedding similarity merge: incremental, or with `rebuild` regroup
+           all raw questions, reconcile with merged_questions and apply only
+           the diff (surviving clusters keep their merged UUID)
         """
         logger.info("=" * 60)
         logger.info("Daily Interview Scraper Started")
@@ -138,21 +149,27 @@ class DailyInterviewScraper:
 
         logger.info(f"✓ Normalized {len(normalized_questions)} questions")
 
-        # Step 3: Ensure DB schema is up-to-date + deduplicate
-        logger.info("\nMigrating schema and deduplicating...")
+        # Step 3: Apply pending schema migrations
+        logger.info("\nMigrating schema...")
         try:
-            self.db.ensure_llm_columns()
-            removed = self.db.deduplicate_raw_questions()
-            logger.info(f"✓ Schema up-to-date, removed {removed} duplicates")
+            applied = run_migrations(
+                EMBEDDING_DIMENSIONS or FULL_DIMENSIONS,
+                truncate_existing=EMBEDDING_REDUCTION == 'api',
+            )
+            logger.info(f"✓ Schema up-to-date ({len(applied)} migrations applied)")
         except Exception as e:
-            logger.error(f"✗ Schema migration/dedup failed: {str(e)}", exc_info=True)
+            logger.error(f"✗ Schema migration failed: {str(e)}", exc_info=True)
 
         # Step 4: Store in database (upsert with unique constraint)
         logger.info("\nStoring questions in database...")
 
         try:
-            inserted_count = self.db.insert_raw_questions(normalized_questions)
-            logger.info(f"✓ Upserted {inserted_count} questions into database")
+            counts = self.db.copy_raw_questions(normalized_questions)
+            inserted_count = counts['inserted'] + counts['updated']
+            logger.info(
+                f"✓ Upserted {inserted_count} questions into database "
+                f"({counts['inserted']} new, {counts['updated']} updated)"
+            )
 
         except Exception as e:
             logger.error(f"✗ Database insertion failed: {str(e)}", exc_info=True)
@@ -162,13 +179,15 @@ class DailyInterviewScraper:
         if OPENAI_API_KEY:
             logger.info("\nRunning LLM processing (translate + classify)...")
             try:
-                unprocessed = self.db.get_llm_unprocessed_questions()
-                if unprocessed:
-                    logger.info(f"Found {len(unprocessed)} questions to LLM-process")
-                    llm = LLMProcessor()
-                    results = llm.process_questions(unprocessed)
-                    self.db.update_llm_results(results)
-                    logger.info(f"✓ LLM processed {len(results)} questions")
+                llm = LLMProcessor()
+                # Claimed batches, so concurrent pipeline runs split the backlog;
+                # each claim is processed before the next one is taken
+                processed = llm.process_stream(
+                    self.db.iter_llm_claims(LLM_CLAIM_BATCH_SIZE),
+                    on_batch=self.db.update_llm_results, chunk_size=LLM_CLAIM_BATCH_SIZE,
+                )
+                if processed:
+                    logger.info(f"✓ LLM processed {processed} questions")
                 else:
                     logger.info("✓ All questions already LLM-processed")
             except Exception as e:
@@ -178,8 +197,15 @@ class DailyInterviewScraper:
             logger.info("\nRunning embedding-based similarity detection...")
             try:
                 embedding_processor = EmbeddingProcessor()
-                merge_stats = embedding_processor.process_and_merge(self.db)
+                if rebuild:
+                    logger.info("REBUILD mode: regrouping all raw questions, applying the diff")
+                    merge_stats = embedding_processor.process_and_merge(self.db)
+                else:
+                    merge_stats = embedding_processor.process_new_questions(self.db)
                 logger.info(f"✓ Merge complete: {merge_stats}")
+                evicted = embedding_processor.cache.evict_stale(EMBEDDING_CACHE_MAX_AGE_DAYS)
+                if evicted:
+                    logger.info(f"✓ Evicted {evicted} stale cached embeddings")
             except Exception as e:
                 logger.error(f"✗ Embedding processing failed: {str(e)}", exc_info=True)
         else:
@@ -188,6 +214,11 @@ class DailyInterviewScraper:
         # Step 6: Get statistics
         logger.info("\nFetching database statistics...")
 
+        try:
+            self.db.compact_counters()
+        except Exception as e:
+            logger.warning(f"Row counter compaction skipped: {str(e)}")
+
         try:
             stats = self.db.get_stats()
             logger.info(f"\n{'='*60}")
@@ -218,14 +249,23 @@ class DailyInterviewScraper:
         logger.info(f"Duration: {duration:.2f} seconds")
         logger.info(f"Questions scraped: {len(all_questions)}")
         logger.info(f"Questions inserted: {inserted_count}")
+        log_pool_stats(logger)
+        log_query_stats(logger)
         logger.info(f"{'='*60}\n")
 
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Daily Interview scraper")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Regroup all raw questions and apply only the diff to "
+                             "merged questions (surviving clusters keep their UUIDs) "
+                             "instead of merging only new raw questions")
+    args = parser.parse_args()
+
     try:
         scraper = DailyInterviewScraper()
-        scraper.run()
+        scraper.run(rebuild=args.rebuild)
 
     except KeyboardInterrupt:
         logger.info("\n\nScraping interrupted by user")
@@ -0,0 +1,290 @@
+"""
+Approximate nearest-neighbour indexes for question deduplication
+
+Each backend answers the same query: for every row of a row-normalized
+embedding matrix, return its top-k neighbours with cosine similarity
+>= threshold, as a sparse edge list. Grouping then runs on that edge list
+(see grouping.greedy_groups_sparse) instead of the dense pairwise loop.
+
+Backends:
+    exact - tiled brute force (reference for recall measurements)
+    ivf   - pure-NumPy inverted file: spherical k-means cells, probe the
+            n_probe closest cells per query
+    hnsw  - hnswlib graph index (optional: pip install hnswlib)
+"""
+import logging
+import math
+import time
+from typing import Dict, Tuple
+
+import numpy as np
+
+from processors.grouping import TILE_SIZE
+
+logger = logging.getLogger("ANN")
+
+ANN_TOP_K = 50  # neighbours kept per question
+IVF_KMEANS_ITERATIONS = 10
+IVF_TRAIN_SAMPLE = 20000  # rows used to fit cell centroids
+
+Edges = Tuple[np.ndarray, np.ndarray, np.ndarray]  # (rows, cols, sims)
+
+
+def _top_k_edges(rows: np.ndarray, cols: np.ndarray, sims: np.ndarray, k: int) -> Edges:
+    """Keep at most k highest-similarity edges per row, excluding self-loops
+    and duplicate (row, col) pairs."""
+    keep = rows != cols
+    rows, cols, sims = rows[keep], cols[keep], sims[keep]
+    if rows.size == 0:
+        return rows, cols, sims
+
+    # Sort by row, then by descending similarity
+    order = np.lexsort((-sims, rows))
+    rows, cols, sims = rows[order], cols[order], sims[order]
+
+    # Drop repeated (row, col) pairs (a cell can be reached twice), keep first
+    pair_keys = rows.astype(np.int64) * (int(cols.max()) + 1) + cols
+    _, first = np.unique(pair_keys, return_index=True)
+    first.sort()
+    rows, cols, sims = rows[first], cols[first], sims[first]
+
+    # Rank within each row and cut at k
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    run_lengths = np.diff(np.r_[starts, rows.size])
+    rank = np.arange(rows.size) - np.repeat(starts, run_lengths)
+    keep = rank < k
+    return rows[keep], cols[keep], sims[keep]
+
+
+class ExactIndex:
+    """Brute-force neighbour search in matrix-multiply tiles"""
+
+    name = "exact"
+
+    def __init__(self, tile_size: int = TILE_SIZE):
+        self.tile_size = tile_size
+        self.matrix = None
+
+    def build(self, matrix: np.ndarray):
+        self.matrix = matrix
+        return self
+
+    def neighbors(self, k: int, threshold: float) -> Edges:
+        matrix = self.matrix
+        n = matrix.shape[0]
+        all_rows, all_cols, all_sims = [], [], []
+
+        for i0 in range(0, n, self.tile_size):
+            i1 = min(i0 + self.tile_size, n)
+            block_rows, block_cols, block_sims = [], [], []
+            for j0 in range(0, n, self.tile_size):
+                j1 = min(j0 + self.tile_size, n)
+                sims = matrix[i0:i1] @ matrix[j0:j1].T
+                r, c = np.nonzero(sims >= threshold)
+                block_rows.append(r + i0)
+                block_cols.append(c + j0)
+                block_sims.append(sims[r, c])
+            rows, cols, sims = _top_k_edges(
+                np.concatenate(block_rows), np.concatenate(block_cols),
+                np.concatenate(block_sims), k
+            )
+            all_rows.append(rows)
+            all_cols.append(cols)
+            all_sims.append(sims)
+
+        return np.concatenate(all_rows), np.concatenate(all_cols), np.concatenate(all_sims)
+
+
+class IVFIndex:
+    """Inverted-file index: rows are bucketed by nearest k-means centroid,
+    queries only scan the n_probe closest buckets"""
+
+    name = "ivf"
+
+    def __init__(self, n_lists: int = 0, n_probe: int = 8, seed: int = 0,
+                 tile_size: int = TILE_SIZE):
+        self.n_lists = n_lists  # 0 = choose sqrt(n)
+        self.n_probe = n_probe
+        self.seed = seed
+        self.tile_size = tile_size
+        self.matrix = None
+        self.centroids = None
+        self.assignments = None
+
+    def _fit_centroids(self, matrix: np.ndarray, n_lists: int) -> np.ndarray:
+        """Spherical k-means on a sample of rows"""
+        rng = np.random.default_rng(self.seed)
+        n = matrix.shape[0]
+        sample = matrix[rng.choice(n, size=min(n, IVF_TRAIN_SAMPLE), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)].copy()
+
+        for _ in range(IVF_KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[labels == c]
+                if members.shape[0]:
+                    centroids[c] = members.sum(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+
+        return centroids
+
+    def build(self, matrix: np.ndarray):
+        n = matrix.shape[0]
+        n_lists = self.n_lists or max(1, int(math.sqrt(n)))
+        n_lists = min(n_lists, n)
+        self.matrix = matrix
+        self.centroids = self._fit_centroids(matrix, n_lists)
+
+        assignments = np.empty(n, dtype=np.int64)
+        for i0 in range(0, n, self.tile_size):
+            i1 = min(i0 + self.tile_size, n)
+            assignments[i0:i1] = np.argmax(matrix[i0:i1] @ self.centroids.T, axis=1)
+        self.assignments = assignments
+        logger.info(f"IVF index built: {n} rows in {n_lists} lists (n_probe={self.n_probe})")
+        return self
+
+    def neighbors(self, k: int, threshold: float) -> Edges:
+        matrix = self.matrix
+        n = matrix.shape[0]
+        n_lists = self.centroids.shape[0]
+        n_probe = min(self.n_probe, n_lists)
+
+        # Which lists each query probes
+        probes = np.empty((n, n_probe), dtype=np.int64)
+        for i0 in range(0, n, self.tile_size):
+            i1 = min(i0 + self.tile_size, n)
+            cell_sims = matrix[i0:i1] @ self.centroids.T
+            probes[i0:i1] = np.argpartition(-cell_sims, n_probe - 1, axis=1)[:, :n_probe]
+
+        list_members = [np.flatnonzero(self.assignments == c) for c in range(n_lists)]
+        probe_queries = np.argsort(probes, axis=None, kind='stable') // n_probe
+        probe_cells = np.sort(probes, axis=None, kind='stable')
+        cell_bounds = np.searchsorted(probe_cells, np.arange(n_lists + 1))
+
+        all_rows, all_cols, all_sims = [], [], []
+        for c in range(n_lists):
+            members = list_members[c]
+            queries = probe_queries[cell_bounds[c]:cell_bounds[c + 1]]
+            if members.size == 0 or queries.size == 0:
+                continue
+            cell_matrix = matrix[members]
+            for q0 in range(0, queries.size, self.tile_size):
+                q = queries[q0:q0 + self.tile_size]
+                sims = matrix[q] @ cell_matrix.T
+                r, m = np.nonzero(sims >= threshold)
+                all_rows.append(q[r])
+                all_cols.append(members[m])
+                all_sims.append(sims[r, m])
+
+        if not all_rows:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=matrix.dtype)
+        return _top_k_edges(
+            np.concatenate(all_rows), np.concatenate(all_cols),
+            np.concatenate(all_sims), k
+        )
+
+
+class HNSWIndex:
+    """hnswlib graph index (cosine space)"""
+
+    name = "hnsw"
+
+    def __init__(self, m: int = 16, ef_construction: int = 200, ef: int = 100,
+                 num_threads: int = -1):
+        try:
+            import hnswlib  # noqa: F401
+        except ImportError:
+            raise ImportError("hnsw backend requires hnswlib. Run: pip install hnswlib")
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef = ef
+        self.num_threads = num_threads
+        self.index = None
+        self.matrix = None
+
+    def build(self, matrix: np.ndarray):
+        import hnswlib
+
+        n, dims = matrix.shape
+        index = hnswlib.Index(space='cosine', dim=dims)
+        index.init_index(max_elements=n, M=self.m, ef_construction=self.ef_construction)
+        index.add_items(matrix, np.arange(n), num_threads=self.num_threads)
+        self.index = index
+        self.matrix = matrix
+        logger.info(f"HNSW index built: {n} rows (M={self.m}, ef={self.ef})")
+        return self
+
+    def neighbors(self, k: int, threshold: float) -> Edges:
+        n = self.matrix.shape[0]
+        query_k = min(k + 1, n)  # +1: each row finds itself
+        self.index.set_ef(max(self.ef, query_k))
+        labels, distances = self.index.knn_query(
+            self.matrix, k=query_k, num_threads=self.num_threads
+        )
+        rows = np.repeat(np.arange(n), query_k)
+        cols = labels.reshape(-1).astype(np.int64)
+        sims = 1.0 - distances.reshape(-1)
+        keep = sims >= threshold
+        return _top_k_edges(rows[keep], cols[keep], sims[keep], k)
+
+
+BACKENDS = {
+    ExactIndex.name: ExactIndex,
+    IVFIndex.name: IVFIndex,
+    HNSWIndex.name: HNSWIndex,
+}
+
+
+def build_index(backend: str, matrix: np.ndarray, **params):
+    """Create and build a neighbour index by backend name"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown ANN backend '{backend}'. Choose from: {sorted(BACKENDS)}")
+    return BACKENDS[backend](**params).build(matrix)
+
+
+def recall_report(matrix: np.ndarray, threshold: float, k: int = ANN_TOP_K,
+                  candidates: Dict[str, Dict] = None) -> Dict[str, Dict]:
+    """
+    Compare each candidate index configuration against exact search.
+
+    Args:
+        matrix: Row-normalized embedding matrix
+        threshold: Similarity threshold for an edge to count
+        k: Neighbours per row
+        candidates: {label: {'backend': name, **params}}
+
+    Returns:
+        {label: {'recall', 'edges', 'exact_edges', 'build_s', 'query_s'}}
+    """
+    def edge_set(edges: Edges) -> set:
+        rows, cols, _ = edges
+        return set(zip(rows.tolist(), cols.tolist()))
+
+    start = time.time()
+    exact = edge_set(ExactIndex().build(matrix).neighbors(k, threshold))
+    exact_s = time.time() - start
+
+    report = {'exact': {'recall': 1.0, 'edges': len(exact), 'exact_edges': len(exact),
+                        'build_s': 0.0, 'query_s': exact_s}}
+
+    for label, config in (candidates or {}).items():
+        params = dict(config)
+        backend = params.pop('backend')
+        start = time.time()
+        index = build_index(backend, matrix, **params)
+        built = time.time()
+        found = edge_set(index.neighbors(k, threshold))
+        done = time.time()
+
+        report[label] = {
+            'recall': len(found & exact) / len(exact) if exact else 1.0,
+            'edges': len(found),
+            'exact_edges': len(exact),
+            'build_s': built - start,
+            'query_s': done - built,
+        }
+
+    return report
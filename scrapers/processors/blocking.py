@@ -0,0 +1,175 @@
+"""
+Blocking for question deduplication
+
+Instead of comparing every question with every other, questions are put
+into overlapping blocks and exact similarity is only computed within a
+block. Two ways to form blocks:
+
+    types  - one block per LLM question type; a question joins the block of
+             every type it has, untyped questions join all blocks
+    kmeans - spherical k-means cells over the embeddings; each question
+             joins its `probes` nearest cells, so near-boundary pairs still
+             meet
+
+Blocks are independent, so they run in parallel worker processes. The
+matrix is handed to the workers once at pool start-up (shared copy-on-write
+under fork), and each task only ships a block's row indices.
+
+Pairs that never share a block are never compared; blocking_loss() measures
+how many real merges that costs against the unblocked result.
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from processors.ann import IVFIndex
+from processors.grouping import TILE_SIZE, threshold_edges
+
+logger = logging.getLogger("Blocking")
+
+BLOCKING_MODES = ('types', 'kmeans')
+KMEANS_PROBES = 2  # cells each question joins in kmeans mode
+
+Edges = Tuple[np.ndarray, np.ndarray, np.ndarray]  # (rows, cols, sims), rows < cols
+
+_worker_matrix = None
+
+
+def type_blocks(question_types: Sequence[Sequence[str]]) -> List[np.ndarray]:
+    """Row indices per question type (overlapping)"""
+    members: Dict[str, List[int]] = {}
+    untyped = []
+    for i, types in enumerate(question_types):
+        if not types:
+            untyped.append(i)
+        for t in set(types or ()):
+            members.setdefault(t, []).append(i)
+
+    if not members:
+        return [np.arange(len(question_types))]
+    return [np.array(sorted(rows + untyped), dtype=np.int64) for _, rows in sorted(members.items())]
+
+
+def kmeans_blocks(matrix: np.ndarray, n_cells: int = 0,
+                  probes: int = KMEANS_PROBES, seed: int = 0) -> List[np.ndarray]:
+    """Row indices per k-means cell; each row joins its `probes` closest cells"""
+    n = matrix.shape[0]
+    n_cells = min(n_cells or max(1, int(np.sqrt(n) / 2)), n)
+    probes = max(1, min(probes, n_cells))
+
+    index = IVFIndex(n_lists=n_cells, seed=seed).build(matrix)
+    cells = np.empty((n, probes), dtype=np.int64)
+    for i0 in range(0, n, TILE_SIZE):
+        i1 = min(i0 + TILE_SIZE, n)
+        cell_sims = matrix[i0:i1] @ index.centroids.T
+        cells[i0:i1] = np.argpartition(-cell_sims, probes - 1, axis=1)[:, :probes]
+
+    rows = np.repeat(np.arange(n), probes)
+    flat = cells.reshape(-1)
+    order = np.argsort(flat, kind='stable')
+    bounds = np.searchsorted(flat[order], np.arange(n_cells + 1))
+    blocks = [rows[order[bounds[c]:bounds[c + 1]]] for c in range(n_cells)]
+    return [b for b in blocks if b.size]
+
+
+def _init_worker(matrix: np.ndarray):
+    global _worker_matrix
+    _worker_matrix = matrix
+
+
+def _block_edges(block: np.ndarray, threshold: float, tile_size: int) -> Edges:
+    """Thresholded pairs within one block, in global row numbers"""
+    sub = np.ascontiguousarray(_worker_matrix[block])
+    rows, cols, sims = threshold_edges(sub, threshold, tile_size=tile_size, workers=1)
+    return block[rows], block[cols], sims
+
+
+def _merge_edges(parts: List[Edges], n: int) -> Edges:
+    """Concatenate per-block edges, dropping pairs found in several blocks"""
+    if not parts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    rows = np.concatenate([p[0] for p in parts]).astype(np.int64)
+    cols = np.concatenate([p[1] for p in parts]).astype(np.int64)
+    sims = np.concatenate([p[2] for p in parts])
+    _, first = np.unique(rows * n + cols, return_index=True)
+    return rows[first], cols[first], sims[first]
+
+
+def blocked_edges(matrix: np.ndarray, blocks: List[np.ndarray], threshold: float,
+                  workers: int = 0, tile_size: int = TILE_SIZE) -> Edges:
+    """
+    All pairs (i < j) with similarity >= threshold that share a block.
+
+    Args:
+        workers: Worker processes (0 = os.cpu_count(); 1 = run in-process)
+    """
+    n = matrix.shape[0]
+    blocks = [b for b in blocks if b.size > 1]
+    workers = min(workers or os.cpu_count() or 1, max(1, len(blocks)))
+    compared = sum(b.size * (b.size - 1) // 2 for b in blocks)
+    logger.info(
+        f"Blocking: {len(blocks)} blocks, {compared:,} pairs compared "
+        f"({compared / max(1, n * (n - 1) // 2):.1%} of all pairs), {workers} workers"
+    )
+
+    if workers == 1:
+        _init_worker(matrix)
+        parts = [_block_edges(b, threshold, tile_size) for b in blocks]
+    else:
+        # fork shares the matrix with the workers without copying
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        # Largest blocks first so one big block doesn't start last
+        order = sorted(range(len(blocks)), key=lambda k: -blocks[k].size)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(matrix,)) as pool:
+            futures = [pool.submit(_block_edges, blocks[k], threshold, tile_size) for k in order]
+            parts = [f.result() for f in futures]
+
+    return _merge_edges(parts, n)
+
+
+def _same_group_pairs(groups: List[List[int]]) -> int:
+    return sum(len(g) * (len(g) - 1) // 2 for g in groups)
+
+
+def blocking_loss(n: int, blocked: Edges, full: Edges,
+                  blocked_groups: List[List[int]],
+                  full_groups: Optional[List[List[int]]] = None) -> Dict:
+    """
+    What blocking cost against the unblocked run.
+
+    Returns:
+        {'edges_lost': similar pairs never compared,
+         'merges_lost': question pairs grouped together without blocking
+                        but not with it,
+         'pairs_grouped_full': question pairs grouped together without blocking,
+         'groups_blocked', 'groups_full'}
+    """
+    blocked_keys = set((blocked[0].astype(np.int64) * n + blocked[1]).tolist())
+    full_keys = set((full[0].astype(np.int64) * n + full[1]).tolist())
+
+    merges_lost = 0
+    if full_groups is not None:
+        group_of = np.empty(n, dtype=np.int64)
+        for g, members in enumerate(blocked_groups):
+            group_of[members] = g
+        for members in full_groups:
+            if len(members) < 2:
+                continue
+            _, counts = np.unique(group_of[members], return_counts=True)
+            together = int((counts * (counts - 1) // 2).sum())
+            merges_lost += len(members) * (len(members) - 1) // 2 - together
+
+    return {
+        'edges_lost': len(full_keys - blocked_keys),
+        'merges_lost': merges_lost,
+        'groups_blocked': len(blocked_groups),
+        'groups_full': len(full_groups) if full_groups is not None else None,
+        'pairs_grouped_full': _same_group_pairs(full_groups) if full_groups is not None else None,
+    }
@@ -0,0 +1,98 @@
+"""
+Reduced-width question embeddings
+
+text-embedding-3 models return 1536 dims, but they are trained so that a
+prefix of the vector is itself a usable embedding: asking the API for
+`dimensions=d` gives the first d components, re-normalized. Two ways to get
+narrower vectors:
+
+    api - pass `dimensions` to the embedding API (no local state)
+    pca - request full vectors and project them with a PCA basis fitted on
+          our own corpus (see embedding_dims_report.py --fit-pca)
+
+Narrower vectors make grouping matmuls, snapshots and pgvector indexes
+proportionally cheaper; embedding_dims_report.py measures what it costs in
+neighbour recall and dedup quality.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger("DimReduction")
+
+FULL_DIMENSIONS = 1536  # text-embedding-3-small
+REDUCTION_METHODS = ('api', 'pca')
+PCA_FIT_SAMPLE = 50000  # rows used to fit the projection
+
+
+def model_key(model: str, dimensions: int = 0, method: str = 'api') -> str:
+    """Name vectors by model and width, for caches and snapshots"""
+    if not dimensions or dimensions >= FULL_DIMENSIONS:
+        return model
+    return f"{model}@{dimensions}" if method == 'api' else f"{model}@pca{dimensions}"
+
+
+def truncate(matrix: np.ndarray, dimensions: int) -> np.ndarray:
+    """First `dimensions` components, re-normalized. Equivalent to requesting
+    `dimensions` from the API, so it can be evaluated from full vectors."""
+    reduced = np.array(matrix[:, :dimensions], dtype=np.float32)
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    reduced /= norms
+    return reduced
+
+
+class PCAProjection:
+    """Linear projection onto the top principal components of a corpus"""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, model: str = ''):
+        self.mean = mean.astype(np.float32)
+        self.components = components.astype(np.float32)  # (dimensions, full)
+        self.model = model
+
+    @property
+    def dimensions(self) -> int:
+        return self.components.shape[0]
+
+    @classmethod
+    def fit(cls, matrix: np.ndarray, dimensions: int, model: str = '',
+            seed: int = 0) -> 'PCAProjection':
+        """Fit on (a sample of) a full-width embedding matrix"""
+        n = matrix.shape[0]
+        if dimensions > min(n, matrix.shape[1]):
+            raise ValueError(f"Cannot fit {dimensions} components on a {matrix.shape} matrix")
+        rng = np.random.default_rng(seed)
+        sample = matrix[rng.choice(n, size=min(n, PCA_FIT_SAMPLE), replace=False)]
+        sample = np.asarray(sample, dtype=np.float64)
+        mean = sample.mean(axis=0)
+        _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+        logger.info(f"Fitted PCA projection {matrix.shape[1]} -> {dimensions} on {sample.shape[0]} rows")
+        return cls(mean, vt[:dimensions], model=model)
+
+    def transform(self, matrix: np.ndarray) -> np.ndarray:
+        """Project rows; callers re-normalize as usual"""
+        return np.ascontiguousarray((np.asarray(matrix, dtype=np.float32) - self.mean) @ self.components.T)
+
+    def save(self, path: str):
+        np.savez(path, mean=self.mean, components=self.components, model=np.array(self.model))
+
+    @classmethod
+    def load(cls, path: str) -> 'PCAProjection':
+        data = np.load(path if path.endswith('.npz') else f"{path}.npz")
+        return cls(data['mean'], data['components'], model=str(data['model']))
+
+
+def load_projection(path: str, dimensions: int, model: str) -> PCAProjection:
+    """Load the PCA basis for `dimensions`, checking it matches the model"""
+    if not path:
+        raise ValueError("EMBEDDING_REDUCTION=pca requires EMBEDDING_PCA_PATH "
+                         "(fit one with embedding_dims_report.py --fit-pca)")
+    projection = PCAProjection.load(path)
+    if projection.dimensions != dimensions:
+        raise ValueError(
+            f"PCA projection at {path} has {projection.dimensions} dims, "
+            f"EMBEDDING_DIMENSIONS is {dimensions}"
+        )
+    if projection.model and projection.model != model:
+        raise ValueError(f"PCA projection at {path} was fitted for {projection.model}, not {model}")
+    return projection
@@ -0,0 +1,162 @@
+"""
+Persistent content-addressed embedding cache
+
+Embeddings are stored in Postgres keyed by (model, sha256(text)), so a
+nightly run only calls the OpenAI API for text it has never embedded.
+Vectors are stored as raw float32 bytes to keep rows compact.
+
+The table is created by database.migrations. The cache is best-effort:
+if the table is missing or the database call fails, lookups count as
+misses and embedding proceeds through the API.
+"""
+import hashlib
+import logging
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from database.db import get_db_connection
+
+logger = logging.getLogger("EmbeddingCache")
+
+LOOKUP_CHUNK_SIZE = 1000  # hashes per SELECT / INSERT round trip
+TOUCH_AFTER_DAYS = 7  # only refresh last_used_at when older than this
+
+
+class EmbeddingCache:
+    """Look up and store embeddings by (model, sha256(text))"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """sha256 hex digest of the exact text sent to the API"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Fetch cached vectors for the given hashes (missing keys are absent)"""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        if not unique:
+            return found
+
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                for i in range(0, len(unique), LOOKUP_CHUNK_SIZE):
+                    chunk = unique[i:i + LOOKUP_CHUNK_SIZE]
+                    cursor.execute("""
+                        SELECT text_hash, embedding
+                        FROM embedding_cache
+                        WHERE model = %s AND text_hash = ANY(%s)
+                    """, (self.model, chunk))
+                    for text_hash, blob in cursor.fetchall():
+                        found[text_hash] = np.frombuffer(bytes(blob), dtype=np.float32)
+
+                    # Keep entries that are still in use away from eviction
+                    cursor.execute("""
+                        UPDATE embedding_cache
+                        SET last_used_at = NOW()
+                        WHERE model = %s AND text_hash = ANY(%s)
+                          AND last_used_at < NOW() - make_interval(days => %s)
+                    """, (self.model, chunk, TOUCH_AFTER_DAYS))
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed, treating as misses: {str(e)}")
+            return {}
+
+        return found
+
+    def put_many(self, hashes: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        """Store vectors for the given hashes"""
+        if not hashes:
+            return
+
+        rows = {}
+        for text_hash, embedding in zip(hashes, embeddings):
+            vector = np.asarray(embedding, dtype=np.float32)
+            rows[text_hash] = (self.model, text_hash, int(vector.shape[0]), vector.tobytes())
+        values = list(rows.values())
+
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                execute_values(cursor, """
+                    INSERT INTO embedding_cache (model, text_hash, dims, embedding)
+                    VALUES %s
+                    ON CONFLICT (model, text_hash) DO UPDATE SET
+                        dims = EXCLUDED.dims,
+                        embedding = EXCLUDED.embedding,
+                        last_used_at = NOW()
+                """, values, page_size=LOOKUP_CHUNK_SIZE)
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"Embedding cache store failed: {str(e)}")
+
+    def embed(self, texts: List[str],
+              fetch: Callable[[List[str]], List[List[float]]],
+              batch_size: int) -> np.ndarray:
+        """
+        Return embeddings for `texts`, calling `fetch` only for cache misses.
+
+        Args:
+            texts: Texts to embed (duplicates are embedded once)
+            fetch: Calls the embedding API for one batch of texts
+            batch_size: Max texts per `fetch` call
+
+        Returns:
+            Contiguous float32 matrix with one row per input text, in input order
+        """
+        hashes = [self.text_hash(t) for t in texts]
+        cached = self.get_many(hashes)
+
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        hits = len(set(hashes)) - len(missing)
+        self.hits += hits
+        self.misses += len(missing)
+        logger.info(
+            f"Embedding cache: {hits} hits, {len(missing)} misses "
+            f"({len(texts)} texts, model={self.model})"
+        )
+
+        miss_hashes = list(missing.keys())
+        miss_texts = list(missing.values())
+        for i in range(0, len(miss_texts), batch_size):
+            batch_hashes = miss_hashes[i:i + batch_size]
+            batch_embeddings = np.asarray(fetch(miss_texts[i:i + batch_size]), dtype=np.float32)
+            self.put_many(batch_hashes, batch_embeddings)
+            for text_hash, embedding in zip(batch_hashes, batch_embeddings):
+                cached[text_hash] = embedding
+
+        if not hashes:
+            return np.empty((0, 0), dtype=np.float32)
+        matrix = np.empty((len(hashes), cached[hashes[0]].shape[0]), dtype=np.float32)
+        for i, text_hash in enumerate(hashes):
+            matrix[i] = cached[text_hash]
+        return matrix
+
+    def evict_stale(self, max_age_days: int) -> int:
+        """Delete entries for this model not used in `max_age_days`.
+        Returns number of evicted rows."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                DELETE FROM embedding_cache
+                WHERE model = %s
+                  AND last_used_at < NOW() - make_interval(days => %s)
+            """, (self.model, max_age_days))
+            removed = cursor.rowcount
+            cursor.close()
+            return removed
+
+    def stats(self) -> Dict:
+        """Hit/miss counts since this cache object was created"""
+        return {'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,155 @@
+"""
+Memory-mapped embedding matrix snapshots
+
+A snapshot is a row-normalized embedding matrix (float32 or float16) plus
+`<path>.index.json`, which records the model, the question id and the
+sha256 text hash of every row, and the name of the matrix file.
+
+Every save writes its matrix to a new `<path>.<generation>.npy` and then
+publishes it by replacing the index, a single rename. A reader therefore
+sees either the old index with the old matrix or the new index with the
+new matrix, never a mix, even across a crash mid-save. The index also
+holds the generation id and a checksum of sampled matrix rows, both
+verified on open.
+
+Opening a snapshot memory-maps the .npy file read-only, so the merge job
+and any offline search or related-question job share the same pages
+through the OS page cache instead of each holding a private copy.
+"""
+import glob
+import json
+import logging
+import os
+import uuid
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("EmbeddingSnapshot")
+
+WRITE_CHUNK_ROWS = 4096
+CHECKSUM_ROWS = 64  # rows sampled (evenly spaced) for the matrix checksum
+
+
+def matrix_checksum(matrix: np.ndarray) -> int:
+    """crc32 over the shape, dtype and up to CHECKSUM_ROWS evenly spaced rows"""
+    n = matrix.shape[0] if matrix.ndim else 0
+    rows = np.unique(np.linspace(0, n - 1, num=min(n, CHECKSUM_ROWS)).astype(np.int64)) if n else []
+    crc = zlib.crc32(f"{matrix.shape}{matrix.dtype.name}".encode('utf-8'))
+    for i in rows:
+        crc = zlib.crc32(np.ascontiguousarray(matrix[i]).tobytes(), crc)
+    return crc
+
+
+class EmbeddingSnapshot:
+    """Read-only view of a saved snapshot"""
+
+    def __init__(self, path: str):
+        with open(f"{path}.index.json", encoding='utf-8') as f:
+            index = json.load(f)
+        if 'generation' not in index:
+            raise ValueError(f"Snapshot {path} predates versioned snapshots; it will be rewritten")
+        self.path = path
+        self.generation = index['generation']
+        self.model = index['model']
+        self.ids: List[str] = index['ids']
+        self.hashes: List[str] = index['hashes']
+        matrix_file = os.path.join(os.path.dirname(path), index['matrix'])
+        self.matrix = np.load(matrix_file, mmap_mode='r')
+        self._row_by_hash = None
+
+        if not index['matrix'].endswith(f".{self.generation}.npy"):
+            raise ValueError(f"Snapshot {path}: index generation {self.generation} "
+                             f"does not name matrix {index['matrix']}")
+        if self.matrix.shape[0] != len(self.ids):
+            raise ValueError(
+                f"Snapshot {path} is inconsistent: {self.matrix.shape[0]} rows, "
+                f"{len(self.ids)} ids"
+            )
+        if matrix_checksum(self.matrix) != index['checksum']:
+            raise ValueError(f"Snapshot {path}: matrix checksum does not match its index")
+
+    @classmethod
+    def open(cls, path: str, model: Optional[str] = None) -> Optional['EmbeddingSnapshot']:
+        """Open a snapshot if it exists (and matches `model`), else None"""
+        if not path or not os.path.exists(f"{path}.index.json"):
+            return None
+        try:
+            snapshot = cls(path)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable embedding snapshot {path}: {str(e)}")
+            return None
+        if model and snapshot.model != model:
+            logger.info(f"Ignoring embedding snapshot for model {snapshot.model}")
+            return None
+        return snapshot
+
+    def row_by_hash(self) -> Dict[str, int]:
+        """Map text hash -> row number"""
+        if self._row_by_hash is None:
+            self._row_by_hash = {h: i for i, h in enumerate(self.hashes)}
+        return self._row_by_hash
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def save_snapshot(path: str, model: str, ids: List[str], hashes: List[str],
+                  matrix: np.ndarray, dtype=np.float32):
+    """
+    Write `matrix` (rows aligned with ids/hashes) as a new snapshot
+    generation.
+
+    Rows are streamed into a memory-mapped file in chunks under a name no
+    reader knows yet; replacing the index then publishes matrix and ids
+    together. The previous generation's matrix is kept for readers that
+    read the old index just before the swap; older ones are removed.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    generation = uuid.uuid4().hex[:12]
+    matrix_name = f"{os.path.basename(path)}.{generation}.npy"
+    matrix_path = os.path.join(directory, matrix_name)
+
+    tmp_npy = f"{path}.tmp.npy"
+    out = np.lib.format.open_memmap(tmp_npy, mode='w+', dtype=dtype, shape=matrix.shape)
+    for i in range(0, matrix.shape[0], WRITE_CHUNK_ROWS):
+        out[i:i + WRITE_CHUNK_ROWS] = matrix[i:i + WRITE_CHUNK_ROWS]
+    out.flush()
+    checksum = matrix_checksum(out)
+    del out
+    os.replace(tmp_npy, matrix_path)
+
+    previous = None
+    try:
+        with open(f"{path}.index.json", encoding='utf-8') as f:
+            previous = json.load(f).get('matrix')
+    except (OSError, ValueError):
+        pass
+
+    tmp_index = f"{path}.index.json.tmp"
+    with open(tmp_index, 'w', encoding='utf-8') as f:
+        json.dump({
+            'model': model,
+            'generation': generation,
+            'matrix': matrix_name,
+            'checksum': checksum,
+            'dtype': np.dtype(dtype).name,
+            'dims': int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            'ids': [str(i) for i in ids],
+            'hashes': list(hashes),
+        }, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_index, f"{path}.index.json")
+
+    keep = {matrix_name, previous}
+    for stale in glob.glob(f"{glob.escape(path)}.*.npy"):
+        if os.path.basename(stale) not in keep:
+            os.remove(stale)
+    if os.path.exists(f"{path}.npy"):
+        os.remove(f"{path}.npy")  # unversioned layout
+    logger.info(f"Saved embedding snapshot {matrix_path} ({matrix.shape[0]} rows, {np.dtype(dtype).name})")
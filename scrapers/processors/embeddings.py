@@ -5,11 +5,32 @@ Uses OpenAI Embedding API to generate vectors, then cosine similarity
 to find duplicate/similar questions across sources.
 """
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 import logging
 from openai import OpenAI
 
-from config import OPENAI_API_KEY
+from config import (
+    OPENAI_API_KEY, ANN_BACKEND, CLUSTERING_MODE, CLUSTER_CENTROID_THRESHOLD,
+    GROUPING_WORKERS, EMBEDDING_SNAPSHOT_PATH, EMBEDDING_SNAPSHOT_DTYPE,
+    EMBEDDING_DIMENSIONS, EMBEDDING_REDUCTION, EMBEDDING_PCA_PATH,
+    BLOCKING_MODE, BLOCKING_CELLS, BLOCKING_PROBES, BLOCKING_WORKERS, BLOCKING_AUDIT,
+    NEAR_DUP_THRESHOLD,
+)
+from processors.ann import build_index, ANN_TOP_K
+from processors.blocking import (
+    BLOCKING_MODES, blocked_edges, blocking_loss, kmeans_blocks, type_blocks,
+)
+from processors.dim_reduction import (
+    FULL_DIMENSIONS, REDUCTION_METHODS, load_projection, model_key,
+)
+from processors.embedding_cache import EmbeddingCache
+from processors.embedding_snapshot import EmbeddingSnapshot, save_snapshot
+from processors.near_duplicates import identical_text_buckets, log_savings, near_duplicate_buckets
+from processors.grouping import (
+    normalize_rows, greedy_groups, greedy_groups_sparse,
+    threshold_edges, union_find_groups, TILE_SIZE,
+)
+from processors.reconcile import reconcile_groups
 
 logger = logging.getLogger("Embeddings")
 
@@ -34,27 +55,116 @@ TYPE_NORMALIZATION = {
 class EmbeddingProcessor:
     """Process questions using embeddings for similarity detection"""
 
-    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD,
+                 tile_size: int = TILE_SIZE, use_cache: bool = True,
+                 ann_backend: str = ANN_BACKEND, ann_params: Optional[Dict] = None,
+                 ann_top_k: int = ANN_TOP_K, clustering: str = CLUSTERING_MODE,
+                 centroid_threshold: Optional[float] = CLUSTER_CENTROID_THRESHOLD,
+                 workers: int = GROUPING_WORKERS,
+                 snapshot_path: str = EMBEDDING_SNAPSHOT_PATH,
+                 dimensions: int = EMBEDDING_DIMENSIONS,
+                 reduction: str = EMBEDDING_REDUCTION,
+                 pca_path: str = EMBEDDING_PCA_PATH,
+                 blocking: str = BLOCKING_MODE,
+                 blocking_cells: int = BLOCKING_CELLS,
+                 blocking_probes: int = BLOCKING_PROBES,
+                 blocking_workers: int = BLOCKING_WORKERS,
+                 blocking_audit: bool = BLOCKING_AUDIT,
+                 near_dup_threshold: float = NEAR_DUP_THRESHOLD):
+        if clustering not in ('greedy', 'components'):
+            raise ValueError(f"Unknown clustering mode '{clustering}'")
+        if blocking and blocking not in BLOCKING_MODES:
+            raise ValueError(f"Unknown blocking mode '{blocking}'")
+        if reduction not in REDUCTION_METHODS:
+            raise ValueError(f"Unknown embedding reduction '{reduction}'")
         self.threshold = threshold
+        self.clustering = clustering
+        self.centroid_threshold = centroid_threshold
+        self.workers = workers
+        self.tile_size = tile_size
+        self.ann_backend = ann_backend
+        self.ann_params = ann_params or {}
+        self.ann_top_k = ann_top_k
         self.client = OpenAI(api_key=OPENAI_API_KEY)
-
-    def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of texts"""
-        all_embeddings = []
-
-        for i in range(0, len(texts), BATCH_SIZE):
-            batch = texts[i:i + BATCH_SIZE]
-            logger.info(f"Generating embeddings for batch {i//BATCH_SIZE + 1} ({len(batch)} texts)")
-
-            response = self.client.embeddings.create(
-                model=EMBEDDING_MODEL,
-                input=batch
-            )
-
-            batch_embeddings = [item.embedding for item in response.data]
-            all_embeddings.extend(batch_embeddings)
-
-        return all_embeddings
+        self.dimensions = dimensions if 0 < dimensions < FULL_DIMENSIONS else 0
+        self.reduction = reduction
+        self.projection = None
+        if self.dimensions and reduction == 'pca':
+            self.projection = load_projection(pca_path, self.dimensions, EMBEDDING_MODEL)
+        # Cache holds what the API returned; snapshots hold the final vectors
+        api_dimensions = self.dimensions if reduction == 'api' else 0
+        self.model_key = model_key(EMBEDDING_MODEL, self.dimensions, reduction)
+        self.cache = EmbeddingCache(model_key(EMBEDDING_MODEL, api_dimensions)) if use_cache else None
+        self.snapshot_path = snapshot_path
+        self.blocking = blocking
+        self.blocking_cells = blocking_cells
+        self.blocking_probes = blocking_probes
+        self.blocking_workers = blocking_workers
+        self.blocking_audit = blocking_audit
+        self.blocking_report = None  # set by the last audited blocked grouping
+        self.near_dup_threshold = near_dup_threshold
+        self.near_duplicate_stats = {}  # per stage, from the last collapse
+
+    @property
+    def output_dimensions(self) -> int:
+        """Width of the vectors this processor produces (and stores in pgvector)"""
+        return self.dimensions or FULL_DIMENSIONS
+
+    def _request_embeddings(self, batch: List[str]) -> List[List[float]]:
+        """Call the embedding API for a single batch"""
+        logger.info(f"Requesting embeddings from API ({len(batch)} texts)")
+        params = {}
+        if self.dimensions and self.reduction == 'api':
+            params['dimensions'] = self.dimensions
+        response = self.client.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=batch,
+            **params
+        )
+        return [item.embedding for item in response.data]
+
+    def generate_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for a list of texts as a contiguous float32 matrix.
+        Cached texts are served from embedding_cache; only misses hit the API.
+        With a PCA reduction configured, rows are projected to `dimensions`."""
+        if self.cache:
+            matrix = self.cache.embed(texts, self._request_embeddings, BATCH_SIZE)
+        else:
+            batches = [
+                np.asarray(self._request_embeddings(texts[i:i + BATCH_SIZE]), dtype=np.float32)
+                for i in range(0, len(texts), BATCH_SIZE)
+            ]
+            matrix = np.concatenate(batches) if batches else np.empty((0, 0), dtype=np.float32)
+
+        if self.projection is not None and matrix.size:
+            matrix = self.projection.transform(matrix)
+        return matrix
+
+    def _near_duplicate_buckets(self, texts: List[str]) -> Optional[List[List[int]]]:
+        """Near-exact duplicate buckets of `texts`, or None when the prefilter
+        is off or finds nothing to collapse"""
+        if not self.near_dup_threshold or len(texts) < 2:
+            return None
+        buckets = near_duplicate_buckets(texts, self.near_dup_threshold)
+        return buckets if len(buckets) < len(texts) else None
+
+    def _generate_collapsed(self, texts: List[str]) -> np.ndarray:
+        """generate_embeddings once per distinct text; repeats get a copy of
+        its vector. Only byte-identical texts share a vector, so every row
+        (and its cache, snapshot and pgvector entry, all keyed by the text
+        hash) holds the embedding of its own text."""
+        buckets = identical_text_buckets(texts) if self.near_dup_threshold else None
+        if buckets is None or len(buckets) == len(texts):
+            return self.generate_embeddings(texts)
+
+        self.near_duplicate_stats['embedding'] = log_savings(
+            "Embedding", len(texts), len(buckets), BATCH_SIZE
+        )
+        reps = self.generate_embeddings([texts[b[0]] for b in buckets])
+        matrix = np.empty((len(texts), reps.shape[1]), dtype=reps.dtype)
+        for k, bucket in enumerate(buckets):
+            matrix[bucket] = reps[k]
+        return matrix
 
     def cosine_similarity(self, a: List[float], b: List[float]) -> float:
         """Calculate cosine similarity between two vectors"""
@@ -66,13 +176,163 @@ class EmbeddingProcessor:
         """Get the text to embed: prefer english_content over content"""
         return q.get('english_content') or q.get('content', '')
 
-    def find_groups(self, questions: List[Dict]) -> List[List[Dict]]:
+    def embed_questions(self, questions: List[Dict]) -> np.ndarray:
+        """Embed questions (english_content preferred) into a row-normalized
+        float32 matrix. Rows already in the embedding snapshot are copied from
+        the memory map; only the rest go through the cache/API."""
+        texts = [self._get_embed_text(q) for q in questions]
+        snapshot = EmbeddingSnapshot.open(self.snapshot_path, model=self.model_key)
+        if snapshot is None:
+            logger.info(f"Generating embeddings for {len(texts)} questions...")
+            embeddings = self._generate_collapsed(texts)
+            logger.info(f"Generated {len(embeddings)} embeddings")
+            return normalize_rows(embeddings, copy=False)
+
+        row_by_hash = snapshot.row_by_hash()
+        rows = [row_by_hash.get(EmbeddingCache.text_hash(t), -1) for t in texts]
+        missing = [i for i, row in enumerate(rows) if row < 0]
+        logger.info(
+            f"Embedding snapshot: {len(texts) - len(missing)} of {len(texts)} "
+            f"questions found, generating {len(missing)}"
+        )
+
+        matrix = np.empty((len(texts), snapshot.matrix.shape[1]), dtype=np.float32)
+        found = [i for i, row in enumerate(rows) if row >= 0]
+        if found:
+            matrix[found] = snapshot.matrix[[rows[i] for i in found]]
+        if missing:
+            matrix[missing] = normalize_rows(
+                self._generate_collapsed([texts[i] for i in missing]), copy=False
+            )
+        return matrix
+
+    def save_snapshot(self, questions: List[Dict], matrix: np.ndarray):
+        """Persist the normalized matrix for `questions` as a memory-mapped snapshot"""
+        if not self.snapshot_path:
+            return
+        save_snapshot(
+            self.snapshot_path, self.model_key,
+            ids=[str(q['id']) for q in questions],
+            hashes=[EmbeddingCache.text_hash(self._get_embed_text(q)) for q in questions],
+            matrix=matrix, dtype=np.dtype(EMBEDDING_SNAPSHOT_DTYPE),
+        )
+
+    def _group_edges(self, n: int, rows: np.ndarray, cols: np.ndarray, sims: np.ndarray,
+                     matrix: np.ndarray) -> List[List[int]]:
+        """Group a thresholded edge list with the configured clustering mode"""
+        if self.clustering == 'components':
+            return union_find_groups(
+                n, rows, cols, sims,
+                matrix=matrix, centroid_threshold=self.centroid_threshold,
+            )
+        return greedy_groups_sparse(n, rows, cols)
+
+    def _blocked_group_indices(self, matrix: np.ndarray,
+                               questions: Optional[List[Dict]]) -> List[List[int]]:
+        """Compare only within blocks; optionally audit against all pairs"""
+        if self.blocking == 'types':
+            if questions is None:
+                raise ValueError("types blocking needs the questions")
+            blocks = type_blocks([self._aggregate_types([q]) for q in questions])
+        else:
+            blocks = kmeans_blocks(matrix, self.blocking_cells, self.blocking_probes)
+
+        edges = blocked_edges(
+            matrix, blocks, self.threshold,
+            workers=self.blocking_workers, tile_size=self.tile_size,
+        )
+        groups = self._group_edges(matrix.shape[0], *edges, matrix)
+
+        if self.blocking_audit:
+            full_edges = threshold_edges(
+                matrix, self.threshold, tile_size=self.tile_size, workers=self.workers
+            )
+            full_groups = self._group_edges(matrix.shape[0], *full_edges, matrix)
+            self.blocking_report = blocking_loss(
+                matrix.shape[0], edges, full_edges, groups, full_groups
+            )
+            logger.info(
+                f"Blocking audit ({self.blocking}): lost {self.blocking_report['edges_lost']} "
+                f"similar pairs and {self.blocking_report['merges_lost']} of "
+                f"{self.blocking_report['pairs_grouped_full']} merges; "
+                f"{self.blocking_report['groups_blocked']} groups vs "
+                f"{self.blocking_report['groups_full']} unblocked"
+            )
+        return groups
+
+    def _group_indices(self, matrix: np.ndarray,
+                       questions: Optional[List[Dict]] = None) -> List[List[int]]:
+        """Group row indices of a normalized embedding matrix.
+
+        blocking: exact pairs within blocks (llm_types or k-means cells), in
+                  worker processes; takes precedence over an ANN backend
+        greedy: dense tiled pass, or the sparse top-k neighbour graph when an
+                ANN backend is configured
+        components: union-find over the thresholded edge list (ANN edges if
+                    configured, otherwise all pairs generated on `workers` threads)
+        """
+        if self.blocking:
+            return self._blocked_group_indices(matrix, questions)
+
+        if self.clustering == 'greedy' and not self.ann_backend:
+            return greedy_groups(matrix, self.threshold, tile_size=self.tile_size)
+
+        if self.ann_backend:
+            index = build_index(self.ann_backend, matrix, **self.ann_params)
+            rows, cols, sims = index.neighbors(self.ann_top_k, self.threshold)
+            logger.info(
+                f"{self.ann_backend} neighbour graph: {len(rows)} edges "
+                f"(top-{self.ann_top_k}, threshold {self.threshold})"
+            )
+        else:
+            rows, cols, sims = threshold_edges(
+                matrix, self.threshold, tile_size=self.tile_size, workers=self.workers
+            )
+            logger.info(f"Similarity graph: {len(rows)} edges (threshold {self.threshold})")
+
+        return self._group_edges(matrix.shape[0], rows, cols, sims, matrix)
+
+    def _collapsed_group_indices(self, matrix: np.ndarray, questions: List[Dict],
+                                 texts: List[str]) -> List[List[int]]:
+        """_group_indices over one representative per near-duplicate bucket;
+        the rest of each bucket joins its representative's group"""
+        buckets = self._near_duplicate_buckets(texts)
+        if buckets is None:
+            return self._group_indices(matrix, questions)
+
+        n, r = len(texts), len(buckets)
+        self.near_duplicate_stats['grouping'] = {
+            'texts': n, 'representatives': r,
+            'pairs_saved': n * (n - 1) // 2 - r * (r - 1) // 2,
+        }
+        logger.info(
+            f"Grouping: {n} questions -> {r} after near-duplicate collapse, "
+            f"{self.near_duplicate_stats['grouping']['pairs_saved']:,} fewer pairs to compare"
+        )
+        reps = [b[0] for b in buckets]
+        rep_groups = self._group_indices(matrix[reps], [questions[i] for i in reps])
+        return [[i for k in group for i in buckets[k]] for group in rep_groups]
+
+    def group_indices(self, questions: List[Dict], matrix: np.ndarray,
+                      texts: Optional[List[str]] = None) -> List[List[int]]:
+        """
+        Row-index groups for `questions` (rows of `matrix`), exactly as
+        find_groups forms them: near-duplicate collapse first, then the
+        configured blocking / ANN / clustering over the representatives.
+        """
+        if texts is None:
+            texts = [self._get_embed_text(q) for q in questions]
+        return self._collapsed_group_indices(matrix, questions, texts)
+
+    def find_groups(self, questions: List[Dict],
+                    matrix: Optional[np.ndarray] = None) -> List[List[Dict]]:
         """
         Group similar questions together using english_content for embedding.
 
         Args:
             questions: List of raw question dicts with 'id', 'content',
                        'english_content', 'source', etc.
+            matrix: Optional precomputed output of embed_questions(questions)
 
         Returns:
             List of groups, where each group is a list of similar questions.
@@ -81,41 +341,21 @@ class EmbeddingProcessor:
             return []
 
         texts = [self._get_embed_text(q) for q in questions]
-        logger.info(f"Generating embeddings for {len(texts)} questions...")
-
-        embeddings = self.generate_embeddings(texts)
-        logger.info(f"Generated {len(embeddings)} embeddings")
-
-        # Track which questions have been assigned to a group
-        assigned = set()
-        groups = []
+        if matrix is None:
+            matrix = self.embed_questions(questions)
 
-        for i in range(len(questions)):
-            if i in assigned:
-                continue
+        index_groups = self.group_indices(questions, matrix, texts)
+        groups = [[questions[i] for i in group] for group in index_groups]
 
-            # Start a new group with this question
-            group = [questions[i]]
-            assigned.add(i)
-
-            # Find all similar questions
-            for j in range(i + 1, len(questions)):
-                if j in assigned:
-                    continue
-
-                sim = self.cosine_similarity(embeddings[i], embeddings[j])
-
-                if sim >= self.threshold:
-                    group.append(questions[j])
-                    assigned.add(j)
+        if logger.isEnabledFor(logging.DEBUG):
+            for group in index_groups:
+                for j in group[1:]:
                     logger.debug(
-                        f"Merged: [{sim:.3f}] "
-                        f"'{texts[i][:50]}...' "
+                        f"Merged: [{float(matrix[group[0]] @ matrix[j]):.3f}] "
+                        f"'{texts[group[0]][:50]}...' "
                         f"<-> '{texts[j][:50]}...'"
                     )
 
-            groups.append(group)
-
         # Stats
         multi_groups = [g for g in groups if len(g) > 1]
         logger.info(
@@ -145,10 +385,64 @@ class EmbeddingProcessor:
                         all_types.add(normalized)
         return sorted(all_types) if all_types else []
 
+    def _first_seen_at(self, group: List[Dict]):
+        """Earliest published_at across all raw questions in a group"""
+        published_dates = [
+            q['published_at'] for q in group
+            if q.get('published_at') is not None
+        ]
+        return min(published_dates) if published_dates else None
+
+    def _group_record(self, group: List[Dict],
+                      embedding: Optional[np.ndarray] = None) -> Dict:
+        """Build the merged-question record for one group (see
+        DatabaseManager.write_merged_groups)"""
+        canonical = self.select_canonical(group)
+        question_types = self._aggregate_types(group)
+
+        return {
+            'canonical_content': canonical,
+            # english_content is the canonical (already English from select_canonical)
+            'english_content': canonical,
+            # Keep first non-null single type for backward compat
+            'question_type': question_types[0] if question_types else None,
+            'question_types': question_types or None,
+            'first_seen_at': self._first_seen_at(group),
+            'raw_ids': [str(q['id']) for q in group],
+            'similarity': 1.0 if len(group) == 1 else 0.9,
+            'companies': list(dict.fromkeys(q['company'] for q in group if q.get('company'))),
+            'embedding': embedding,
+        }
+
+    def _group_records(self, groups: List[List[Dict]], questions: List[Dict],
+                       matrix: np.ndarray) -> List[Dict]:
+        """Merged-question records for `groups`, each carrying the embedding of
+        its canonical member (rows of `matrix` align with `questions`)"""
+        row_of = {str(q['id']): i for i, q in enumerate(questions)}
+        records = []
+        for group in groups:
+            canonical_q = max(group, key=lambda q: len(self._get_embed_text(q)))
+            records.append(self._group_record(group, matrix[row_of[str(canonical_q['id'])]]))
+        return records
+
+    def _backfill_merged_embeddings(self, db_manager) -> int:
+        """Embed merged questions that predate the embedding column"""
+        missing = db_manager.get_merged_without_embedding()
+        if not missing:
+            return 0
+
+        logger.info(f"Backfilling embeddings for {len(missing)} merged questions...")
+        texts = [m.get('english_content') or m['canonical_content'] for m in missing]
+        matrix = normalize_rows(self.generate_embeddings(texts), copy=False)
+        return db_manager.store_merged_embeddings(
+            [(m['id'], matrix[i]) for i, m in enumerate(missing)]
+        )
+
     def process_and_merge(self, db_manager) -> Dict:
         """
-        Full pipeline: fetch raw questions, compute embeddings,
-        group similar ones, and update merged_questions table.
+        Full rebuild: fetch raw questions, compute embeddings, group similar
+        ones, and reconcile the result with merged_questions. Clusters that
+        survive keep their merged id; only changed rows are written.
 
         Returns:
             Stats dict with counts
@@ -162,68 +456,116 @@ class EmbeddingProcessor:
             return {'total': 0, 'groups': 0, 'duplicates': 0}
 
         # 2. Find groups
-        groups = self.find_groups(raw_questions)
+        matrix = self.embed_questions(raw_questions)
+        self.save_snapshot(raw_questions, matrix)
+        groups = self.find_groups(raw_questions, matrix=matrix)
+
+        # 3. Reconcile with the stored merged questions and write only the diff
+        logger.info("Reconciling with existing merged questions...")
+        records = self._group_records(groups, raw_questions, matrix)
+        diff = reconcile_groups(records, db_manager.get_merged_state())
+        written = db_manager.apply_merged_diff(diff)
+        logger.info(f"Merged rows touched: {written}")
+
+        # 4. Persist raw embeddings the database doesn't have yet
+        missing_ids = db_manager.get_raw_ids_without_embedding()
+        db_manager.store_raw_embeddings([
+            (q['id'], matrix[i]) for i, q in enumerate(raw_questions)
+            if str(q['id']) in missing_ids
+        ])
 
-        # 3. Clear old merged data and rebuild
-        logger.info("Clearing old merged data...")
-        db_manager.clear_merged_data()
+        stats = {
+            'total_raw': len(raw_questions),
+            'total_groups': len(groups),
+            'duplicates': sum(1 for g in groups if len(g) > 1),
+            'total_mappings': sum(len(r['raw_ids']) for r in records),
+            'rows_touched': written,
+        }
+        if self.cache:
+            stats['embedding_cache'] = self.cache.stats()
+        if self.blocking_report:
+            stats['blocking'] = self.blocking_report
+        if self.near_duplicate_stats:
+            stats['near_duplicates'] = self.near_duplicate_stats
 
-        # 4. For each group, create merged question and mappings
-        logger.info("Creating merged questions...")
-        total_mappings = 0
+        logger.info(f"Merge complete: {stats}")
+        return stats
 
-        for group in groups:
-            canonical = self.select_canonical(group)
-            question_types = self._aggregate_types(group)
-            # Keep first non-null single type for backward compat
-            question_type = question_types[0] if question_types else None
+    def process_new_questions(self, db_manager) -> Dict:
+        """
+        Incremental merge: only raw questions without a mapping are processed.
 
-            # english_content is the canonical (already English from select_canonical)
-            english_content = canonical
+        New embeddings are stored on raw_questions, and each new question is
+        attached to its nearest existing merged question when similarity >=
+        threshold, using the pgvector index in Postgres (frequency, types and
+        companies are updated in place). Only the new rows are held in
+        memory. The rest are grouped among themselves and become new merged
+        questions. Existing merged IDs are never changed.
 
-            # first_seen_at = earliest published_at across all raw questions in group
-            published_dates = [
-                q['published_at'] for q in group
-                if q.get('published_at') is not None
-            ]
-            first_seen_at = min(published_dates) if published_dates else None
-
-            # Create merged question
-            merged_id = db_manager.create_merged_question(
-                content=canonical,
-                question_type=question_type,
-                question_types=question_types or None,
-                english_content=english_content,
-                first_seen_at=first_seen_at,
-            )
+        Returns:
+            Stats dict with counts
+        """
+        logger.info("Fetching unmapped raw questions from database...")
+        new_questions = db_manager.get_unmapped_raw_questions()
+        logger.info(f"Fetched {len(new_questions)} unmapped raw questions")
+
+        if not new_questions:
+            return {'new_raw': 0, 'attached': 0, 'new_groups': 0}
 
-            # Update frequency
-            db_manager.update_merged_frequency(merged_id, len(group))
-
-            # Create mappings for each raw question in the group
-            for raw_q in group:
-                db_manager.create_question_mapping(
-                    raw_id=str(raw_q['id']),
-                    merged_id=merged_id,
-                    similarity=1.0 if len(group) == 1 else 0.9
-                )
-                total_mappings += 1
-
-            # Link companies
-            companies_seen = set()
-            for raw_q in group:
-                company = raw_q.get('company')
-                if company and company not in companies_seen:
-                    companies_seen.add(company)
-                    company_id = db_manager.get_or_create_company(company)
-                    db_manager.link_question_to_company(merged_id, company_id)
+        new_matrix = self.embed_questions(new_questions)
+        db_manager.store_raw_embeddings(
+            [(q['id'], new_matrix[i]) for i, q in enumerate(new_questions)]
+        )
+
+        # 1. Attach to nearest existing merged question (searched in pgvector)
+        self._backfill_merged_embeddings(db_manager)
+        matches = db_manager.match_raw_to_merged(
+            [str(q['id']) for q in new_questions], self.threshold
+        )
+
+        attached = {}  # merged_id -> [(raw_q, similarity)]
+        unmatched = []
+        for i, q in enumerate(new_questions):
+            match = matches.get(str(q['id']))
+            if match:
+                merged_id, sim = match
+                attached.setdefault(merged_id, []).append((q, sim))
+            else:
+                unmatched.append(i)
+
+        attachments = []
+        for merged_id, members in attached.items():
+            group = [raw_q for raw_q, _ in members]
+            attachments.append({
+                'merged_id': merged_id,
+                'mappings': [(raw_q['id'], min(max(sim, 0.0), 1.0)) for raw_q, sim in members],
+                'question_types': self._aggregate_types(group),
+                'first_seen_at': self._first_seen_at(group),
+                'companies': [q['company'] for q in group if q.get('company')],
+            })
+
+        # 2. Group what's left into new clusters
+        leftover = [new_questions[i] for i in unmatched]
+        leftover_matrix = new_matrix[unmatched]
+        groups = self.find_groups(leftover, matrix=leftover_matrix) if leftover else []
+
+        # 3. Attachments and new clusters in one transaction
+        written = db_manager.write_incremental_merge(
+            attachments, self._group_records(groups, leftover, leftover_matrix)
+        )
+        total_mappings = written['mappings']
 
         stats = {
-            'total_raw': len(raw_questions),
-            'total_groups': len(groups),
-            'duplicates': sum(1 for g in groups if len(g) > 1),
+            'new_raw': len(new_questions),
+            'attached': len(new_questions) - len(leftover),
+            'updated_groups': len(attached),
+            'new_groups': len(groups),
             'total_mappings': total_mappings,
         }
+        if self.cache:
+            stats['embedding_cache'] = self.cache.stats()
+        if self.near_duplicate_stats:
+            stats['near_duplicates'] = self.near_duplicate_stats
 
-        logger.info(f"Merge complete: {stats}")
+        logger.info(f"Incremental merge complete: {stats}")
         return stats
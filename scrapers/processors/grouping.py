@@ -0,0 +1,255 @@
+"""
+Similarity grouping engines for question deduplication
+
+Works on a dense embedding matrix: rows are L2-normalized once, then
+cosine similarities are computed in fixed-size matrix-multiply tiles so
+peak memory depends on the tile size, not on the number of questions.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("Grouping")
+
+TILE_SIZE = 1024  # rows/columns per similarity tile (tile holds TILE_SIZE² floats)
+
+
+def normalize_rows(embeddings, dtype=np.float32, copy: bool = True) -> np.ndarray:
+    """Return `embeddings` as a contiguous matrix with unit-length rows.
+    Zero vectors are left as zeros (similarity 0 to everything).
+    With copy=False an input array of the right dtype is normalized in place."""
+    if copy:
+        matrix = np.array(embeddings, dtype=dtype, copy=True)
+    else:
+        matrix = np.asarray(embeddings, dtype=dtype)
+    if matrix.ndim != 2:
+        raise ValueError(f"Expected a 2-D embedding matrix, got shape {matrix.shape}")
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return np.ascontiguousarray(matrix)
+
+
+def greedy_groups(matrix: np.ndarray, threshold: float,
+                  tile_size: int = TILE_SIZE) -> List[List[int]]:
+    """
+    Greedy threshold grouping over a row-normalized matrix.
+
+    Same semantics as the original pairwise loop: walk rows in order, and
+    every row not yet assigned starts a group that claims each later
+    unassigned row with cosine similarity >= threshold.
+
+    Similarities are computed one (row tile × column tile) block at a time,
+    so at most tile_size² floats of similarity are held in memory.
+
+    Returns:
+        List of groups, each a list of row indices (first index is the seed).
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        return []
+    tile_size = max(1, int(tile_size))
+
+    assigned = np.zeros(n, dtype=bool)
+    groups = []
+
+    for i0 in range(0, n, tile_size):
+        i1 = min(i0 + tile_size, n)
+        rows = np.flatnonzero(~assigned[i0:i1]) + i0
+        if rows.size == 0:
+            continue
+
+        # Candidate partners (j > i, sim >= threshold) for each pending row,
+        # collected tile by tile in ascending j order
+        candidates = {int(i): [] for i in rows}
+        row_block = matrix[rows]
+
+        for j0 in range(i0, n, tile_size):
+            j1 = min(j0 + tile_size, n)
+            cols = np.flatnonzero(~assigned[j0:j1]) + j0
+            if cols.size == 0:
+                continue
+
+            sims = row_block @ matrix[cols].T
+            hit_r, hit_c = np.nonzero(sims >= threshold)
+            for r, c in zip(hit_r.tolist(), hit_c.tolist()):
+                i, j = int(rows[r]), int(cols[c])
+                if j > i:
+                    candidates[i].append(j)
+
+        # Resolve greedily in row order; a row claimed earlier in this
+        # tile no longer seeds its own group
+        for i in rows.tolist():
+            if assigned[i]:
+                continue
+            group = [i]
+            assigned[i] = True
+            for j in candidates[i]:
+                if not assigned[j]:
+                    group.append(j)
+                    assigned[j] = True
+            groups.append(group)
+
+    return groups
+
+
+def greedy_groups_sparse(n: int, rows: np.ndarray, cols: np.ndarray) -> List[List[int]]:
+    """
+    Greedy grouping over a sparse similarity graph.
+
+    Applies the same rule as greedy_groups, but a row can only claim rows it
+    shares an edge with (edges are treated as undirected). With the complete
+    thresholded edge list this gives exactly the greedy_groups result.
+
+    Args:
+        n: Number of rows
+        rows, cols: Edge endpoints (already filtered by threshold)
+
+    Returns:
+        List of groups, each a list of row indices (first index is the seed).
+    """
+    lo = np.minimum(rows, cols).astype(np.int64)
+    hi = np.maximum(rows, cols).astype(np.int64)
+    keep = lo != hi
+    pairs = np.unique(lo[keep] * n + hi[keep])  # sorted by (lo, hi)
+    lo, hi = pairs // n, pairs % n
+    offsets = np.searchsorted(lo, np.arange(n + 1))
+    hi = hi.tolist()
+
+    assigned = np.zeros(n, dtype=bool)
+    groups = []
+    for i in range(n):
+        if assigned[i]:
+            continue
+        group = [i]
+        assigned[i] = True
+        for j in hi[offsets[i]:offsets[i + 1]]:
+            if not assigned[j]:
+                group.append(j)
+                assigned[j] = True
+        groups.append(group)
+
+    return groups
+
+
+def _row_tile_edges(matrix: np.ndarray, threshold: float, i0: int,
+                    tile_size: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Edges (i, j, sim) with i in [i0, i0 + tile_size), j > i, sim >= threshold"""
+    n = matrix.shape[0]
+    i1 = min(i0 + tile_size, n)
+    rows, cols, sims = [], [], []
+    for j0 in range(i0, n, tile_size):
+        j1 = min(j0 + tile_size, n)
+        block = matrix[i0:i1] @ matrix[j0:j1].T
+        r, c = np.nonzero(block >= threshold)
+        upper = (c + j0) > (r + i0)
+        r, c = r[upper], c[upper]
+        rows.append(r + i0)
+        cols.append(c + j0)
+        sims.append(block[r, c])
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(sims)
+
+
+def threshold_edges(matrix: np.ndarray, threshold: float, tile_size: int = TILE_SIZE,
+                    workers: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    All pairs (i < j) with cosine similarity >= threshold, as a sparse edge list.
+
+    Row tiles are processed on a thread pool; NumPy releases the GIL inside
+    the matrix multiply and comparisons, so tiles run on separate cores
+    while sharing the one matrix in memory.
+
+    Args:
+        workers: Thread count (0 = os.cpu_count())
+    """
+    n = matrix.shape[0]
+    if n == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=matrix.dtype)
+    tile_size = max(1, int(tile_size))
+    workers = workers or os.cpu_count() or 1
+
+    starts = range(0, n, tile_size)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(
+            lambda i0: _row_tile_edges(matrix, threshold, i0, tile_size), starts
+        ))
+
+    return (
+        np.concatenate([p[0] for p in parts]),
+        np.concatenate([p[1] for p in parts]),
+        np.concatenate([p[2] for p in parts]),
+    )
+
+
+def union_find_groups(n: int, rows: np.ndarray, cols: np.ndarray, sims: np.ndarray,
+                      matrix: Optional[np.ndarray] = None,
+                      centroid_threshold: Optional[float] = None) -> List[List[int]]:
+    """
+    Connected components of the thresholded similarity graph (union-find).
+
+    The result does not depend on row order, and transitive duplicates end
+    up in the same group. Runs in O(edges · α(n)).
+
+    To stop long chains (A~B~C~D with A and D unrelated), pass `matrix` and
+    `centroid_threshold`: edges are then applied strongest first, and two
+    components are only joined if the cosine similarity between their
+    centroids is >= centroid_threshold.
+
+    Returns:
+        List of groups (sorted member indices), ordered by smallest member.
+    """
+    if n == 0:
+        return []
+    parent = list(range(n))
+
+    def find(x: int) -> int:
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    guarded = centroid_threshold is not None and matrix is not None
+    if guarded:
+        # Strongest edges first; ties broken by index for determinism
+        order = np.lexsort((cols, rows, -sims))
+        centroid_sums = {}
+    else:
+        order = np.arange(len(rows))
+
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        a, b = find(r), find(c)
+        if a == b:
+            continue
+
+        if guarded:
+            sum_a = centroid_sums.get(a)
+            sum_b = centroid_sums.get(b)
+            if sum_a is None:
+                sum_a = matrix[a].astype(np.float64)
+            if sum_b is None:
+                sum_b = matrix[b].astype(np.float64)
+            denom = np.linalg.norm(sum_a) * np.linalg.norm(sum_b)
+            if denom and float(sum_a @ sum_b) / denom < centroid_threshold:
+                continue
+            centroid_sums.pop(a, None)
+            centroid_sums.pop(b, None)
+
+        # Lower index becomes the root so roots are stable
+        if b < a:
+            a, b = b, a
+        parent[b] = a
+        if guarded:
+            centroid_sums[a] = sum_a + sum_b
+
+    roots = np.array([find(i) for i in range(n)], dtype=np.int64)
+    order = np.argsort(roots, kind='stable')
+    bounds = np.flatnonzero(np.r_[True, roots[order][1:] != roots[order][:-1], True])
+    groups = [order[bounds[k]:bounds[k + 1]].tolist() for k in range(len(bounds) - 1)]
+    groups.sort(key=lambda g: g[0])
+    return groups
@@ -5,17 +5,20 @@ For each raw question:
 1. Detect language, translate to English if needed
 2. Classify into one or more question types
 """
+import itertools
 import json
 import logging
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, List, Optional
 from openai import OpenAI
 
-from config import OPENAI_API_KEY
+from config import OPENAI_API_KEY, NEAR_DUP_THRESHOLD
+from processors.near_duplicates import log_savings, near_duplicate_buckets
 
 logger = logging.getLogger("LLMProcessor")
 
 LLM_MODEL = "gpt-4o-mini"
 BATCH_SIZE = 20  # questions per LLM call
+STREAM_CHUNK = 1000  # questions held at once by process_stream (near-duplicates collapse within a chunk)
 
 QUESTION_TYPES = [
     "AI Domain Knowledge",
@@ -47,19 +50,69 @@ Return ONLY the JSON array, no other text."""
 class LLMProcessor:
     """Translate and classify questions using LLM"""
 
-    def __init__(self):
+    def __init__(self, near_dup_threshold: float = NEAR_DUP_THRESHOLD):
         self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.near_dup_threshold = near_dup_threshold
+        self.near_duplicate_stats = None
 
-    def process_questions(self, questions: List[Dict]) -> List[Dict]:
+    def process_questions(self, questions: List[Dict],
+                          on_batch: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
         """
         Process a list of raw questions: translate + classify.
 
+        With the near-duplicate prefilter on, questions whose normalized
+        text is identical (see processors.near_duplicates) are sent to the
+        LLM once and the others get a copy of the result. Questions that are
+        only similar are always translated separately.
+
         Args:
             questions: List of dicts with at least 'id' and 'content'
+            on_batch: Called with each LLM batch's results as soon as they
+                arrive (e.g. DatabaseManager.update_llm_results), so a crash
+                mid-run keeps the batches already paid for
 
         Returns:
             List of dicts with 'id', 'english_content', 'llm_types'
         """
+        if not self.near_dup_threshold or len(questions) < 2:
+            return self._process_all(questions, on_batch)
+
+        buckets = near_duplicate_buckets([q['content'] for q in questions], threshold=1.0)
+        self.near_duplicate_stats = log_savings(
+            "LLM processing", len(questions), len(buckets), BATCH_SIZE
+        )
+        members = {questions[b[0]]['id']: b for b in buckets}
+
+        def fan_out(rep_results: List[Dict]) -> List[Dict]:
+            return [
+                dict(rep, id=questions[i]['id'], llm_types=list(rep['llm_types']))
+                for rep in rep_results for i in members[rep['id']]
+            ]
+
+        batch_callback = (lambda batch: on_batch(fan_out(batch))) if on_batch else None
+        return fan_out(self._process_all([questions[b[0]] for b in buckets], batch_callback))
+
+    def process_stream(self, questions: Iterable[Dict],
+                       on_batch: Callable[[List[Dict]], None],
+                       chunk_size: int = STREAM_CHUNK) -> int:
+        """
+        process_questions() over an iterator (e.g. a server-side cursor),
+        `chunk_size` questions at a time. Results only go to `on_batch`.
+
+        Returns:
+            Number of questions processed
+        """
+        processed = 0
+        iterator = iter(questions)
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                return processed
+            processed += len(self.process_questions(chunk, on_batch))
+
+    def _process_all(self, questions: List[Dict],
+                     on_batch: Optional[Callable[[List[Dict]], None]] = None) -> List[Dict]:
+        """Translate + classify every question, BATCH_SIZE per LLM call"""
         results = []
 
         for i in range(0, len(questions), BATCH_SIZE):
@@ -70,6 +123,8 @@ class LLMProcessor:
 
             batch_results = self._process_batch(batch)
             results.extend(batch_results)
+            if on_batch and batch_results:
+                on_batch(batch_results)
 
         return results
 
@@ -0,0 +1,172 @@
+"""
+Near-exact duplicate detection with shingle MinHash + LSH
+
+Many raw questions differ only in punctuation, whitespace or casing across
+sources and reruns. This stage finds them locally, before any paid API
+call: texts are normalized, cut into character shingles, summarized as
+MinHash signatures and bucketed with LSH banding; candidate pairs are
+confirmed by exact shingle Jaccard. Each bucket keeps one representative
+(its earliest member) for pairwise comparison when grouping, and its
+other members join the representative's group.
+
+Results are only copied where they cannot be wrong: the LLM translation
+and types go to members with identical normalized text (threshold 1.0),
+and an embedding only to byte-identical texts, so no row ever stores a
+vector or translation computed from a different question.
+
+Character shingles work the same for English and Chinese text.
+
+Jaccard on 5-character shingles measures how much text is shared, not what
+it means. One changed word touches only about five shingles, so the longer
+the question, the less one word moves the score. "...increase the number
+of podcast episodes a listener finishes each week..." and the same
+175-character question with "decrease" score 0.93, so at a threshold of
+0.9 the two land in the same merged question. A 50-character pair with
+the same swap scores 0.77 and stays apart. This is why the prefilter is
+off by default (NEAR_DUP_THRESHOLD=0).
+"""
+import logging
+import re
+import unicodedata
+import zlib
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from config import NEAR_DUP_THRESHOLD
+from processors.grouping import union_find_groups
+
+logger = logging.getLogger("NearDuplicates")
+
+SHINGLE_SIZE = 5  # characters
+NUM_PERM = 64  # MinHash permutations
+LSH_BANDS = 8  # bands of NUM_PERM // LSH_BANDS rows; candidate pairs from J ~ 0.75 up
+HASH_PRIME = 4294967291  # largest prime below 2**32
+SIGNATURE_CHUNK = 65536  # shingles hashed per vectorized step
+
+_rng = np.random.default_rng(1)
+_PERM_A = _rng.integers(1, HASH_PRIME, size=(NUM_PERM, 1), dtype=np.uint64)
+_PERM_B = _rng.integers(0, HASH_PRIME, size=(NUM_PERM, 1), dtype=np.uint64)
+
+
+def normalize_text(text: str) -> str:
+    """Casefold, drop punctuation and collapse whitespace"""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Character shingles of normalized text (the whole text if shorter)"""
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def minhash_signatures(shingle_sets: Sequence[set]) -> np.ndarray:
+    """(n, NUM_PERM) MinHash signatures, computed over all texts at once"""
+    n = len(shingle_sets)
+    signatures = np.empty((n, NUM_PERM), dtype=np.uint64)
+    start = 0
+    while start < n:
+        # Take texts until the chunk holds about SIGNATURE_CHUNK shingles
+        end, total = start, 0
+        while end < n and (total == 0 or total + len(shingle_sets[end]) <= SIGNATURE_CHUNK):
+            total += len(shingle_sets[end])
+            end += 1
+
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for k in range(start, end) for s in shingle_sets[k]),
+            dtype=np.uint64, count=total,
+        )
+        lengths = np.array([len(shingle_sets[k]) for k in range(start, end)])
+        offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+        permuted = (_PERM_A * hashes + _PERM_B) % HASH_PRIME
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+def identical_text_buckets(texts: Sequence[str]) -> List[List[int]]:
+    """Buckets of byte-identical texts, in the same shape as
+    near_duplicate_buckets"""
+    first_of: Dict[str, List[int]] = {}
+    for i, text in enumerate(texts):
+        first_of.setdefault(text, []).append(i)
+    return list(first_of.values())
+
+
+def near_duplicate_buckets(texts: Sequence[str],
+                           threshold: float = NEAR_DUP_THRESHOLD) -> List[List[int]]:
+    """
+    Partition `texts` into buckets of near-exact duplicates.
+
+    Returns:
+        Buckets of indices (sorted; the first is the representative),
+        ordered by representative. Every text is in exactly one bucket.
+    """
+    n = len(texts)
+    if n == 0:
+        return []
+
+    # Identical normalized text: no hashing needed
+    first_of: Dict[str, int] = {}
+    rows, cols = [], []
+    normalized = [normalize_text(t) for t in texts]
+    unique = []
+    for i, text in enumerate(normalized):
+        j = first_of.setdefault(text, i)
+        if j == i:
+            unique.append(i)
+        else:
+            rows.append(j)
+            cols.append(i)
+
+    # Similar normalized text: MinHash + LSH candidates, confirmed by Jaccard.
+    # Every member of a band bucket is checked against all earlier members
+    # (a pair is verified once even if it shares several bands), so a text
+    # too far from the bucket's first member can still join a later one.
+    if threshold < 1.0 and len(unique) > 1:
+        sets = [shingles(normalized[i]) for i in unique]
+        signatures = minhash_signatures(sets)
+        band_rows = NUM_PERM // LSH_BANDS
+        checked = set()
+        for band in range(LSH_BANDS):
+            band_keys = signatures[:, band * band_rows:(band + 1) * band_rows]
+            members: Dict[bytes, List[int]] = {}
+            for k in range(len(unique)):
+                bucket = members.setdefault(band_keys[k].tobytes(), [])
+                for prior in bucket:
+                    if (prior, k) in checked:
+                        continue
+                    checked.add((prior, k))
+                    if jaccard(sets[prior], sets[k]) >= threshold:
+                        rows.append(unique[prior])
+                        cols.append(unique[k])
+                bucket.append(k)
+
+    rows = np.array(rows, dtype=np.int64)
+    cols = np.array(cols, dtype=np.int64)
+    return union_find_groups(n, rows, cols, np.ones(rows.size, dtype=np.float32))
+
+
+def api_calls(count: int, batch_size: int) -> int:
+    """Requests needed for `count` inputs at `batch_size` per request"""
+    return (count + batch_size - 1) // batch_size
+
+
+def log_savings(stage: str, total: int, representatives: int, batch_size: int) -> Dict:
+    """Log (and return) what collapsing near-duplicates saved for one stage"""
+    saved = api_calls(total, batch_size) - api_calls(representatives, batch_size)
+    if total > representatives:
+        logger.info(
+            f"{stage}: {total} texts -> {representatives} after near-duplicate collapse, "
+            f"saving {total - representatives} inputs and {saved} API calls"
+        )
+    return {'texts': total, 'representatives': representatives, 'api_calls_saved': saved}
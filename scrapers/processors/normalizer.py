@@ -61,7 +61,11 @@ class DataNormalizer:
 
     @staticmethod
     def clean_question_content(content: str) -> str:
-        """Clean and normalize question content"""
+        """Clean and normalize question content
+
+        The raw_question_hash() SQL function behind raw_questions.content_hash
+        applies the same steps; keep the two in sync.
+        """
         if not content:
             return ""
 
@@ -0,0 +1,122 @@
+"""
+Reconcile a rebuilt grouping against the merged questions already stored
+
+New clusters are matched one-to-one to existing merged rows by how many
+raw question ids they share (largest overlap first). Matched clusters keep
+their merged id, so frontend links, sample_answers.question_id and caches
+stay valid; only rows whose content actually changed are written.
+"""
+import uuid
+from typing import Dict, List
+
+# Fields compared between a new group record and the stored merged row
+COMPARED_FIELDS = (
+    'canonical_content', 'english_content', 'question_type',
+    'question_types', 'first_seen_at',
+)
+
+
+def _match_clusters(records: List[Dict], existing: Dict[str, Dict]) -> Dict[int, str]:
+    """Greedy maximum-overlap matching of new records to existing merged ids"""
+    merged_of_raw = {}
+    for merged_id, row in existing.items():
+        for raw_id in row['raw_ids']:
+            merged_of_raw[raw_id] = merged_id
+
+    candidates = []
+    for idx, record in enumerate(records):
+        overlaps = {}
+        for raw_id in record['raw_ids']:
+            merged_id = merged_of_raw.get(raw_id)
+            if merged_id is not None:
+                overlaps[merged_id] = overlaps.get(merged_id, 0) + 1
+        for merged_id, overlap in overlaps.items():
+            candidates.append((-overlap, idx, merged_id))
+
+    # Largest overlap first; ties go to the earlier record, then lowest id
+    candidates.sort()
+    matched = {}
+    taken = set()
+    for _, idx, merged_id in candidates:
+        if idx in matched or merged_id in taken:
+            continue
+        matched[idx] = merged_id
+        taken.add(merged_id)
+    return matched
+
+
+def _row_changed(record: Dict, row: Dict) -> bool:
+    if len(record['raw_ids']) != row['frequency']:
+        return True
+    for field in COMPARED_FIELDS:
+        new, old = record.get(field), row.get(field)
+        if field == 'question_types':
+            new, old = list(new or []), list(old or [])
+        if new != old:
+            return True
+    return not row['has_embedding'] and record.get('embedding') is not None
+
+
+def reconcile_groups(records: List[Dict], existing: Dict[str, Dict]) -> Dict:
+    """
+    Compute the minimal set of writes turning `existing` into `records`.
+
+    Args:
+        records: Group records as built by EmbeddingProcessor._group_records
+        existing: Output of DatabaseManager.get_merged_state()
+
+    Returns:
+        Diff for DatabaseManager.apply_merged_diff with keys 'insert',
+        'update', 'delete' (merged rows), 'mappings_upsert', 'mappings_delete',
+        'companies_add', 'companies_remove'
+    """
+    matched = _match_clusters(records, existing)
+
+    diff = {
+        'insert': [], 'update': [], 'delete': [],
+        'mappings_upsert': [], 'mappings_delete': [],
+        'companies_add': [], 'companies_remove': [],
+    }
+
+    for idx, record in enumerate(records):
+        merged_id = matched.get(idx)
+        companies = set(record.get('companies') or [])
+        similarity = record['similarity']
+
+        if merged_id is None:
+            merged_id = str(uuid.uuid4())
+            diff['insert'].append(dict(record, id=merged_id))
+            diff['mappings_upsert'].extend(
+                (raw_id, merged_id, similarity) for raw_id in record['raw_ids']
+            )
+            diff['companies_add'].extend((merged_id, name) for name in sorted(companies))
+            continue
+
+        row = existing[merged_id]
+        if _row_changed(record, row):
+            update = dict(record, id=merged_id)
+            # Only send a new vector when the canonical text changed or none is stored
+            if row['has_embedding'] and record['canonical_content'] == row['canonical_content']:
+                update['embedding'] = None
+            diff['update'].append(update)
+
+        old_raw = row['raw_ids']
+        for raw_id in record['raw_ids']:
+            if old_raw.get(raw_id) != similarity:
+                diff['mappings_upsert'].append((raw_id, merged_id, similarity))
+        new_raw = set(record['raw_ids'])
+        diff['mappings_delete'].extend(
+            (raw_id, merged_id) for raw_id in old_raw if raw_id not in new_raw
+        )
+
+        diff['companies_add'].extend(
+            (merged_id, name) for name in sorted(companies - row['companies'])
+        )
+        diff['companies_remove'].extend(
+            (merged_id, name) for name in sorted(row['companies'] - companies)
+        )
+
+    matched_ids = set(matched.values())
+    diff['delete'] = [merged_id for merged_id in existing if merged_id not in matched_ids]
+
+    return diff
@@ -1,10 +1,18 @@
 """
 GPT-based similarity detection for questions
+
+Two stages: embedding similarity shortlists the top-k existing questions,
+then GPT judges only those pairs. GPT verdicts are stored in Postgres
+(similarity_verdicts) keyed by a hash of the question pair, so re-runs
+reuse them instead of paying for the same comparison again.
 """
+import hashlib
 import openai
 from typing import List, Dict, Optional, Tuple
 import logging
 import json
+import re
+import numpy as np
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from config import (
@@ -15,27 +23,99 @@ from config import (
     GPT_MAX_TOKENS
 )
 
+from database.db import get_db_connection
+from processors.embeddings import EmbeddingProcessor
+from processors.grouping import normalize_rows
+
 openai.api_key = OPENAI_API_KEY
 logger = logging.getLogger("Similarity")
 
+SHORTLIST_K = 5  # GPT comparisons per new question, at most
+SHORTLIST_MIN_SIMILARITY = 0.5  # embedding cosine below this is never sent to GPT
+VERDICT_PROMPT_VERSION = 1  # bump when the prompt changes to invalidate cached verdicts
+
+
+class VerdictCache:
+    """Persistent (pair hash -> similarity score) store for GPT verdicts
+    (table created by database.migrations)"""
+
+    def __init__(self, model: str = GPT_MODEL):
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def pair_hash(question1: str, question2: str) -> str:
+        """Order-independent hash of a question pair and the prompt version"""
+        first, second = sorted((question1, question2))
+        key = f"v{VERDICT_PROMPT_VERSION}\x00{first}\x00{second}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get(self, pair_hash: str) -> Optional[float]:
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT score FROM similarity_verdicts WHERE model = %s AND pair_hash = %s",
+                    (self.model, pair_hash)
+                )
+                row = cursor.fetchone()
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"Verdict cache lookup failed: {str(e)}")
+            row = None
+
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return float(row[0])
+
+    def put(self, pair_hash: str, score: float):
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO similarity_verdicts (model, pair_hash, score)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (model, pair_hash) DO UPDATE SET score = EXCLUDED.score
+                """, (self.model, pair_hash, score))
+                cursor.close()
+        except Exception as e:
+            logger.warning(f"Verdict cache store failed: {str(e)}")
+
+    def stats(self) -> Dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
 
 class SimilarityDetector:
     """Detect similarity between questions using GPT"""
 
-    def __init__(self, threshold: float = SIMILARITY_THRESHOLD):
+    def __init__(self, threshold: float = SIMILARITY_THRESHOLD,
+                 shortlist_k: int = SHORTLIST_K,
+                 embedder: Optional[EmbeddingProcessor] = None,
+                 use_cache: bool = True):
         self.threshold = threshold
+        self.shortlist_k = shortlist_k
         self.client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        self.embedder = embedder or EmbeddingProcessor()
+        self.verdicts = None
+        self.api_calls = 0
+
+        if use_cache:
+            self.verdicts = VerdictCache()
 
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10)
     )
-    def calculate_similarity(self, question1: str, question2: str) -> float:
+    def _request_similarity(self, question1: str, question2: str) -> Optional[float]:
         """
-        Calculate similarity between two questions using GPT
+        Ask GPT for the similarity of two questions.
 
         Returns:
-            Similarity score between 0 and 1
+            Similarity score between 0 and 1, or None if the response could
+            not be parsed. API errors are raised (and retried).
         """
         prompt = f"""You are an expert at comparing Product Manager interview questions.
 Compare the following two questions and determine their semantic similarity.
@@ -65,44 +145,79 @@ Examples:
 - "Design a product" and "Improve an existing product" → 0.50
 """
 
-        try:
-            response = self.client.chat.completions.create(
-                model=GPT_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are a precise similarity comparison expert. Always respond with valid JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=GPT_TEMPERATURE,
-                max_tokens=GPT_MAX_TOKENS
-            )
+        self.api_calls += 1
+        response = self.client.chat.completions.create(
+            model=GPT_MODEL,
+            messages=[
+                {"role": "system", "content": "You are a precise similarity comparison expert. Always respond with valid JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=GPT_TEMPERATURE,
+            max_tokens=GPT_MAX_TOKENS
+        )
 
-            content = response.choices[0].message.content.strip()
+        content = response.choices[0].message.content.strip()
 
+        try:
             # Parse JSON response
             result = json.loads(content)
             similarity = float(result['similarity_score'])
-
             logger.debug(f"Similarity: {similarity:.2f} - {result.get('reasoning', '')}")
-
             return similarity
 
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, KeyError, TypeError, ValueError):
             logger.error(f"Failed to parse GPT response as JSON: {content}")
             # Fallback: try to extract number
-            import re
             match = re.search(r'"similarity_score":\s*([0-9.]+)', content)
             if match:
                 return float(match.group(1))
-            return 0.0
+            return None
+
+    def calculate_similarity(self, question1: str, question2: str) -> float:
+        """
+        Calculate similarity between two questions using GPT.
+        Verdicts are served from / stored in the verdict cache.
+
+        Returns:
+            Similarity score between 0 and 1
+        """
+        pair_hash = None
+        if self.verdicts:
+            pair_hash = VerdictCache.pair_hash(question1, question2)
+            cached = self.verdicts.get(pair_hash)
+            if cached is not None:
+                return cached
 
+        try:
+            similarity = self._request_similarity(question1, question2)
         except Exception as e:
             logger.error(f"Error calculating similarity: {str(e)}")
             return 0.0
 
+        if similarity is None:
+            return 0.0
+        if self.verdicts:
+            self.verdicts.put(pair_hash, similarity)
+        return similarity
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return normalize_rows(self.embedder.generate_embeddings(texts), copy=False)
+
+    def _shortlist(self, sims: np.ndarray) -> List[int]:
+        """Indices of the top-k candidates by embedding similarity, best first"""
+        k = min(self.shortlist_k, sims.shape[0])
+        if k == 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind='stable')]
+        return [int(i) for i in top if sims[i] >= SHORTLIST_MIN_SIMILARITY]
+
     def find_similar_question(
         self,
         new_question: str,
-        existing_questions: List[Dict]
+        existing_questions: List[Dict],
+        existing_matrix: Optional[np.ndarray] = None,
+        new_vector: Optional[np.ndarray] = None,
     ) -> Optional[Tuple[str, float]]:
         """
         Find if new question is similar to any existing question
@@ -110,6 +225,8 @@ Examples:
         Args:
             new_question: New question content
             existing_questions: List of existing merged questions
+            existing_matrix: Optional normalized embeddings of existing_questions
+            new_vector: Optional normalized embedding of new_question
 
         Returns:
             Tuple of (merged_question_id, similarity_score) if found, else None
@@ -117,20 +234,21 @@ Examples:
         if not existing_questions:
             return None
 
-        logger.info(f"Comparing new question against {len(existing_questions)} existing questions")
-
-        # Simple optimization: only compare if question types match
-        # (implement later when we have reliable question types)
+        if existing_matrix is None:
+            existing_matrix = self._embed([q['canonical_content'] for q in existing_questions])
+        if new_vector is None:
+            new_vector = self._embed([new_question])[0]
 
-        for existing in existing_questions:
-            existing_content = existing['canonical_content']
+        # Stage 1: embedding shortlist; stage 2: GPT verdicts on the shortlist only
+        shortlist = self._shortlist(existing_matrix @ new_vector)
+        logger.info(
+            f"Comparing new question against {len(shortlist)} shortlisted "
+            f"of {len(existing_questions)} existing questions"
+        )
 
-            # Quick pre-filter: if questions are very different in length, skip
-            len_ratio = len(new_question) / max(len(existing_content), 1)
-            if len_ratio < 0.5 or len_ratio > 2.0:
-                continue
-
-            similarity = self.calculate_similarity(new_question, existing_content)
+        for idx in shortlist:
+            existing = existing_questions[idx]
+            similarity = self.calculate_similarity(new_question, existing['canonical_content'])
 
             if similarity >= self.threshold:
                 logger.info(f"Found similar question! Similarity: {similarity:.2f}")
@@ -145,21 +263,37 @@ Examples:
         existing_questions: List[Dict]
     ) -> Dict[str, Optional[Tuple[str, float]]]:
         """
-        Batch process multiple new questions
+        Batch process multiple new questions. Embeddings for both sides are
+        computed once, so each question costs at most shortlist_k GPT calls
+        (fewer when verdicts are cached).
 
         Returns:
             Dict mapping new_question_id -> (merged_question_id, similarity) or None
         """
         results = {}
+        if not new_questions:
+            return results
+
+        existing_matrix = None
+        if existing_questions:
+            existing_matrix = self._embed([q['canonical_content'] for q in existing_questions])
+        new_matrix = self._embed([q['content'] for q in new_questions])
 
         for i, new_q in enumerate(new_questions):
             logger.info(f"Processing question {i+1}/{len(new_questions)}")
 
             similar = self.find_similar_question(
                 new_q['content'],
-                existing_questions
+                existing_questions,
+                existing_matrix=existing_matrix,
+                new_vector=new_matrix[i],
             )
 
             results[new_q['id']] = similar
 
+        cache_stats = self.verdicts.stats() if self.verdicts else {}
+        logger.info(
+            f"Batch complete: {len(new_questions)} questions, {self.api_calls} GPT calls, "
+            f"verdict cache {cache_stats}"
+        )
         return results
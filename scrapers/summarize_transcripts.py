@@ -210,5 +210,13 @@ total_words = sum(len(s['summary'].split()) for s in all_summaries)
 print(f"\nTotal summary words: {total_words:,} (~{total_words * 4 // 3:,} tokens)")
 print(f"Saved {len(json_data)} summaries to video_summaries.json")
 
+# Per-channel summary counts on the admin page (database/admin_stats_schema.sql)
+try:
+    cur.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY admin_channel_stats')
+    conn.commit()
+except psycopg2.Error as e:
+    conn.rollback()
+    print(f"Could not refresh admin stats: {e}")
+
 cur.close()
 conn.close()
@@ -0,0 +1,213 @@
+"""
+AI Pulse — asyncio database operations (counterpart of youtube.db.VideoDB).
+
+Same methods and return shapes as VideoDB on an asyncpg pool, so
+transcript fetches and insight extraction can run concurrently and store
+each result as soon as it arrives:
+
+    async with AsyncVideoDB() as db:
+        async for video in db.iter_videos_without_insights():
+            ...
+"""
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from database.async_pool import create_async_pool, to_timestamp
+from database.stats import group_counters
+from youtube.config import DATABASE_URL
+from youtube.db import TRANSCRIPT_PAGE_SIZE
+
+
+class AsyncVideoDB:
+    """Async database operations for AI Pulse."""
+
+    def __init__(self, dsn: str = DATABASE_URL, **pool_kwargs):
+        self.dsn = dsn
+        self.pool_kwargs = pool_kwargs
+        self.pool = None
+
+    async def open(self) -> "AsyncVideoDB":
+        if self.pool is None:
+            self.pool = await create_async_pool(self.dsn, **self.pool_kwargs)
+        return self
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def __aenter__(self) -> "AsyncVideoDB":
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def get_existing_video_ids(self) -> Set[str]:
+        """Return set of YouTube video IDs already in DB."""
+        rows = await self.pool.fetch("SELECT video_id FROM youtube_videos")
+        return {r[0] for r in rows}
+
+    async def get_existing_channel_names(self) -> Set[str]:
+        """Return set of channel names already in DB."""
+        rows = await self.pool.fetch("SELECT DISTINCT channel_name FROM youtube_videos")
+        return {r[0] for r in rows}
+
+    async def upsert_videos(self, videos: List[Dict]) -> int:
+        """Insert or update videos. Returns count of affected rows."""
+        if not videos:
+            return 0
+
+        values = [
+            (
+                v["video_id"],
+                v["title"],
+                v.get("channel_name"),
+                v.get("channel_id"),
+                v["url"],
+                v.get("thumbnail_url"),
+                v.get("description", ""),
+                v.get("views", 0),
+                v.get("likes", 0),
+                v.get("comments", 0),
+                v.get("duration_seconds", 0),
+                to_timestamp(v.get("published_at")),
+            )
+            for v in videos
+        ]
+
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.executemany("""
+                    INSERT INTO youtube_videos
+                        (video_id, title, channel_name, channel_id, url,
+                         thumbnail_url, description, views, likes, comments,
+                         duration_seconds, published_at)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+                    ON CONFLICT (video_id) DO UPDATE SET
+                        title = EXCLUDED.title,
+                        description = EXCLUDED.description,
+                        views = EXCLUDED.views,
+                        likes = EXCLUDED.likes,
+                        comments = EXCLUDED.comments,
+                        duration_seconds = EXCLUDED.duration_seconds
+                """, values)
+        return len(values)
+
+    async def get_video_uuid(self, video_id: str) -> Optional[str]:
+        """Get the internal UUID for a YouTube video_id."""
+        return await self.pool.fetchval(
+            "SELECT id FROM youtube_videos WHERE video_id = $1", video_id
+        )
+
+    async def get_videos_without_transcripts(self) -> List[Dict]:
+        """Get videos that don't have transcripts yet."""
+        rows = await self.pool.fetch("""
+            SELECT yv.id, yv.video_id, yv.title, yv.channel_name
+            FROM youtube_videos yv
+            LEFT JOIN video_transcripts vt ON yv.id = vt.video_id
+            WHERE vt.id IS NULL
+            ORDER BY yv.views DESC
+        """)
+        return [dict(r) for r in rows]
+
+    async def insert_transcript(self, video_uuid: str, language: str, full_text: str,
+                                token_count: int):
+        """Insert a transcript for a video."""
+        await self.pool.execute("""
+            INSERT INTO video_transcripts (video_id, language, full_text, token_count)
+            VALUES ($1, $2, $3, $4)
+            ON CONFLICT (video_id, language) DO UPDATE SET
+                full_text = EXCLUDED.full_text,
+                token_count = EXCLUDED.token_count,
+                extracted_at = NOW()
+        """, video_uuid, language, full_text, token_count)
+
+    async def get_videos_without_insights(self) -> List[Dict]:
+        """Get videos without insights. Includes transcript if available."""
+        return [v async for v in self.iter_videos_without_insights()]
+
+    async def count_videos_without_insights(self) -> int:
+        """Number of videos without insights."""
+        return await self.pool.fetchval("""
+            SELECT COUNT(*) FROM youtube_videos yv
+            LEFT JOIN video_insights vi ON yv.id = vi.video_id
+            WHERE vi.id IS NULL
+        """)
+
+    async def iter_videos_without_insights(self, page_size: int = TRANSCRIPT_PAGE_SIZE) -> AsyncIterator[Dict]:
+        """Videos without insights in keyset pages (see
+        VideoDB.iter_videos_without_insights); no connection is held
+        while the caller works on a page."""
+        after = (None, None)
+        while True:
+            rows = await self.pool.fetch("""
+                SELECT yv.id, yv.video_id, yv.title, yv.channel_name,
+                       yv.description, yv.views,
+                       vt.full_text AS transcript_text
+                FROM youtube_videos yv
+                LEFT JOIN video_transcripts vt ON yv.id = vt.video_id
+                LEFT JOIN video_insights vi ON yv.id = vi.video_id
+                WHERE vi.id IS NULL
+                  AND ($1::BIGINT IS NULL OR (COALESCE(yv.views, 0), yv.id) < ($1, $2::uuid))
+                ORDER BY COALESCE(yv.views, 0) DESC, yv.id DESC
+                LIMIT $3
+            """, *after, page_size)
+            for r in rows:
+                yield dict(r)
+            if len(rows) < page_size:
+                return
+            after = (rows[-1]["views"] or 0, rows[-1]["id"])
+
+    async def insert_insight(self, video_uuid: str, topic_summary: str,
+                             insights: list, concepts: list, pm_relevance: float):
+        """Insert LLM-extracted insights for a video."""
+        await self.pool.execute("""
+            INSERT INTO video_insights
+                (video_id, topic_summary, insights, concepts, pm_relevance)
+            VALUES ($1, $2, $3, $4, $5)
+            ON CONFLICT (video_id) DO UPDATE SET
+                topic_summary = EXCLUDED.topic_summary,
+                insights = EXCLUDED.insights,
+                concepts = EXCLUDED.concepts,
+                pm_relevance = EXCLUDED.pm_relevance,
+                processed_at = NOW()
+        """, video_uuid, topic_summary, insights, concepts, pm_relevance)
+
+    async def get_all_videos_with_insights(self) -> List[Dict]:
+        """Get all videos joined with their insights (for the website)."""
+        rows = await self.pool.fetch("""
+            SELECT
+                yv.id, yv.video_id, yv.title, yv.channel_name,
+                yv.url, yv.thumbnail_url, yv.views, yv.likes,
+                yv.comments, yv.duration_seconds, yv.published_at,
+                vi.topic_summary, vi.insights, vi.concepts, vi.pm_relevance
+            FROM youtube_videos yv
+            LEFT JOIN video_insights vi ON yv.id = vi.video_id
+            WHERE yv.is_relevant = true
+            ORDER BY yv.views DESC
+        """)
+        return [dict(r) for r in rows]
+
+    async def get_stats(self) -> Dict:
+        """Get counts for logging (trigger-maintained, see database.stats)."""
+        tables = ["youtube_videos", "video_transcripts", "video_insights"]
+        async with self.pool.acquire() as conn:
+            rows = []
+            if await conn.fetchval("SELECT to_regclass('table_counters') IS NOT NULL"):
+                rows = await conn.fetch("""
+                    SELECT metric, key, SUM(value)::BIGINT FROM table_counters
+                    WHERE metric = ANY($1::TEXT[])
+                    GROUP BY metric, key
+                """, tables)
+            stats = {table: counts.get("") for table, counts in group_counters(rows, tables).items()}
+            for table, total in stats.items():
+                if total is None:
+                    stats[table] = await conn.fetchval(f"SELECT COUNT(*) FROM {table}")
+        return stats
+
+    async def refresh_admin_stats(self):
+        """Recompute the per-channel stats behind /api/admin/stats."""
+        await self.pool.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY admin_channel_stats")
+
+    async def compact_counters(self) -> int:
+        """Fold table_counters shards (see database.stats)."""
+        return await self.pool.fetchval("SELECT compact_table_counters()")
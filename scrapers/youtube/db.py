@@ -4,27 +4,37 @@ AI Pulse — Database operations for YouTube videos, transcripts, and insights.
 import json
 import logging
 from contextlib import contextmanager
-from typing import Dict, List, Set
+from typing import Dict, Iterator, List, Set
 
-import psycopg2
 from psycopg2.extras import RealDictCursor, execute_values
 
+from database.pool import get_pool
+from database.stats import compact_counters, refresh_admin_stats, table_totals
 from youtube.config import DATABASE_URL
 
 logger = logging.getLogger("youtube.db")
 
+# Videos (full transcripts included) fetched per keyset page
+TRANSCRIPT_PAGE_SIZE = 50
+
+# Videos without insights in (views, id) order; {keyset} resumes after a page
+NO_INSIGHTS_PAGE_QUERY = """
+    SELECT yv.id, yv.video_id, yv.title, yv.channel_name,
+           yv.description, yv.views,
+           vt.full_text AS transcript_text
+    FROM youtube_videos yv
+    LEFT JOIN video_transcripts vt ON yv.id = vt.video_id
+    LEFT JOIN video_insights vi ON yv.id = vi.video_id
+    WHERE vi.id IS NULL {keyset}
+    ORDER BY COALESCE(yv.views, 0) DESC, yv.id DESC
+    LIMIT %s
+"""
+
 
 @contextmanager
 def get_conn():
-    conn = psycopg2.connect(DATABASE_URL)
-    try:
+    with get_pool(DATABASE_URL).connection() as conn:
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
-    finally:
-        conn.close()
 
 
 class VideoDB:
@@ -144,21 +154,48 @@ class VideoDB:
     @staticmethod
     def get_videos_without_insights() -> List[Dict]:
         """Get videos without insights. Includes transcript if available."""
+        return list(VideoDB.iter_videos_without_insights())
+
+    @staticmethod
+    def count_videos_without_insights() -> int:
+        """Number of videos without insights."""
         with get_conn() as conn:
-            cur = conn.cursor(cursor_factory=RealDictCursor)
+            cur = conn.cursor()
             cur.execute("""
-                SELECT yv.id, yv.video_id, yv.title, yv.channel_name,
-                       yv.description, yv.views,
-                       vt.full_text AS transcript_text
-                FROM youtube_videos yv
-                LEFT JOIN video_transcripts vt ON yv.id = vt.video_id
+                SELECT COUNT(*) FROM youtube_videos yv
                 LEFT JOIN video_insights vi ON yv.id = vi.video_id
                 WHERE vi.id IS NULL
-                ORDER BY yv.views DESC
             """)
-            rows = cur.fetchall()
+            count = cur.fetchone()[0]
             cur.close()
-            return [dict(r) for r in rows]
+            return count
+
+    @staticmethod
+    def iter_videos_without_insights(page_size: int = TRANSCRIPT_PAGE_SIZE) -> Iterator[Dict]:
+        """Videos without insights, transcript included if available, in
+        keyset pages of `page_size`. Each page is read on a short pooled
+        connection that is returned before the rows are yielded, so the
+        caller's LLM calls never hold a connection or a transaction open."""
+        after = None
+        while True:
+            with get_conn() as conn:
+                cur = conn.cursor(cursor_factory=RealDictCursor)
+                if after is None:
+                    cur.execute(NO_INSIGHTS_PAGE_QUERY.format(keyset=""), (page_size,))
+                else:
+                    cur.execute(
+                        NO_INSIGHTS_PAGE_QUERY.format(
+                            keyset="AND (COALESCE(yv.views, 0), yv.id) < (%s, %s::uuid)"
+                        ),
+                        (*after, page_size),
+                    )
+                page = [dict(r) for r in cur.fetchall()]
+                cur.close()
+
+            yield from page
+            if len(page) < page_size:
+                return
+            after = (page[-1]["views"] or 0, str(page[-1]["id"]))
 
     @staticmethod
     def insert_insight(video_uuid: str, topic_summary: str,
@@ -202,12 +239,26 @@ class VideoDB:
 
     @staticmethod
     def get_stats() -> Dict:
-        """Get counts for logging."""
+        """Get counts for logging (trigger-maintained, see database.stats)."""
         with get_conn() as conn:
             cur = conn.cursor()
-            stats = {}
-            for table in ["youtube_videos", "video_transcripts", "video_insights"]:
-                cur.execute(f"SELECT COUNT(*) FROM {table}")
-                stats[table] = cur.fetchone()[0]
+            stats = table_totals(cur, ["youtube_videos", "video_transcripts", "video_insights"])
             cur.close()
             return stats
+
+    @staticmethod
+    def refresh_admin_stats():
+        """Recompute the per-channel stats behind /api/admin/stats."""
+        with get_conn() as conn:
+            cur = conn.cursor()
+            refresh_admin_stats(cur)
+            cur.close()
+
+    @staticmethod
+    def compact_counters() -> int:
+        """Fold table_counters shards (see database.stats)."""
+        with get_conn() as conn:
+            cur = conn.cursor()
+            folded = compact_counters(cur)
+            cur.close()
+            return folded
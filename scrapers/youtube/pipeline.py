@@ -14,6 +14,8 @@ from youtube.discovery import discover_videos
 from youtube.transcripts import fetch_transcript
 from youtube.insights import extract_insights
 from youtube.db import VideoDB
+from database.instrumentation import log_query_stats
+from database.pool import log_pool_stats
 
 logging.basicConfig(
     level=logging.INFO,
@@ -73,8 +75,8 @@ def run():
     # ── Step 4: Extract insights ─────────────────────────────
     if OPENAI_API_KEY:
         logger.info("\n[4/4] Extracting insights with LLM...")
-        need_insights = db.get_videos_without_insights()
-        logger.info(f"  {len(need_insights)} videos need insight extraction")
+        logger.info(f"  {db.count_videos_without_insights()} videos need insight extraction")
+        need_insights = db.iter_videos_without_insights()
 
         insight_count = 0
         from_transcript = 0
@@ -109,6 +111,15 @@ def run():
     else:
         logger.warning("  OPENAI_API_KEY not set -- skipping insight extraction")
 
+    try:
+        db.refresh_admin_stats()
+    except Exception as e:
+        logger.warning(f"  Could not refresh admin stats: {e}")
+    try:
+        db.compact_counters()
+    except Exception as e:
+        logger.warning(f"  Could not compact row counters: {e}")
+
     # ── Summary ──────────────────────────────────────────────
     stats = db.get_stats()
     duration = (datetime.now() - start).total_seconds()
@@ -120,6 +131,8 @@ def run():
     logger.info(f"  Transcripts: {stats.get('video_transcripts', 0)}")
     logger.info(f"  Insights:    {stats.get('video_insights', 0)}")
     logger.info(f"  Duration:    {duration:.1f}s")
+    log_pool_stats(logger)
+    log_query_stats(logger)
     logger.info("=" * 60)
 
 
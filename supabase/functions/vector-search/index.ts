@@ -7,6 +7,8 @@ const corsHeaders = {
 };
 
 const dbUrl = Deno.env.get("SUPABASE_DB_URL")!;
+// Width of transcript_chunks.embedding (see database/chunk_embedding_dims.sql)
+const dims = Number(Deno.env.get("CHUNK_EMBEDDING_DIMENSIONS") || 1536);
 
 serve(async (req) => {
   if (req.method === "OPTIONS") {
@@ -18,9 +20,9 @@ serve(async (req) => {
   try {
     const { embedding, match_count = 10, similarity_threshold = 0.1 } = await req.json();
 
-    if (!embedding || !Array.isArray(embedding) || embedding.length !== 1536) {
+    if (!embedding || !Array.isArray(embedding) || embedding.length !== dims) {
       return new Response(
-        JSON.stringify({ error: "embedding must be a 1536-dim array" }),
+        JSON.stringify({ error: `embedding must be a ${dims}-dim array` }),
         { status: 400, headers: { ...corsHeaders, "Content-Type": "application/json" } }
       );
     }
@@ -33,7 +35,7 @@ serve(async (req) => {
     const rows = await sql.unsafe(
       `SELECT * FROM (
         SELECT tc.id, tc.video_id, tc.chunk_index, tc.chunk_text, tc.token_count,
-               (1 - (tc.embedding <=> '${vecStr}'::vector(1536)))::double precision AS similarity,
+               (1 - (tc.embedding <=> '${vecStr}'::vector(${dims})))::double precision AS similarity,
                yv.title AS video_title, yv.channel_name, yv.url AS video_url
         FROM transcript_chunks tc
         JOIN youtube_videos yv ON tc.video_id = yv.id